@@ -0,0 +1,151 @@
+# benchmarks/datagen.py
+# Synthetic dataset generator for the reminder pipeline benchmarks.
+# Loads N teams, M companies, K requirements per company and years of
+# submissions / reminders_sent into a dedicated Postgres database via COPY.
+import io
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Sequence
+
+from bot.db.database import backfill_period_keys, ensure_partitions, ensure_tables
+
+FORMS = [
+    ("01/GTGT", "Giá trị gia tăng"),
+    ("05/KK-TNCN", "Khai khấu trừ TNCN"),
+    ("05/QTT-TNCN", "Quyết toán thu nhập cá nhân"),
+    ("TT200", "Thông tư 200"),
+    ("03/TNDN", "TNDN"),
+]
+# requirement profiles as created by /quick_add
+PROFILES = {
+    "monthly": [("01/GTGT", "monthly"), ("05/KK-TNCN", "monthly"), ("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")],
+    "quarterly": [("01/GTGT", "quarterly"), ("05/KK-TNCN", "quarterly"), ("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")],
+    "yearly": [("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")],
+}
+TABLES = ["reminder_outbox", "reminders_sent", "submissions", "requirements", "companies", "forms", "holidays", "teams"]
+
+
+@dataclass
+class DatasetSpec:
+    teams: int = 20
+    companies: int = 2000
+    reqs_per_company: int = 5
+    years: int = 3
+    submission_rate: float = 0.9      # share of past periods that have a submission
+    owner_rate: float = 0.7           # share of companies with an owner assigned
+    reminders_per_period: int = 3     # reminders_sent rows per (requirement, past period)
+    end_date: date = date(2026, 1, 1)
+    seed: int = 42
+
+
+def _periods(freq: str, start: date, end: date) -> List[tuple]:
+    """Past periods as (ky_thue, deadline) between start and end."""
+    out = []
+    if freq == "monthly":
+        y, m = start.year, start.month
+        while date(y, m, 1) < end:
+            ny, nm = (y + 1, 1) if m == 12 else (y, m + 1)
+            out.append((f"{m:02d}/{y}", date(ny, nm, 20)))
+            y, m = ny, nm
+    elif freq == "quarterly":
+        for y in range(start.year, end.year + 1):
+            for q in range(1, 5):
+                first = date(y, (q - 1) * 3 + 1, 1)
+                if start <= first < end:
+                    ny, nm = (y + 1, 1) if q == 4 else (y, q * 3 + 1)
+                    out.append((f"Q{q}/{y}", date(ny, nm, 28)))
+    else:
+        for y in range(start.year, end.year):
+            out.append((f"{y}", date(y + 1, 3, 31)))
+    return out
+
+
+def _copy(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence]):
+    """COPY rows (tab separated, \\N for NULL) into table."""
+    buf = io.StringIO()
+    n = 0
+    for row in rows:
+        buf.write("\t".join("\\N" if v is None else str(v).replace("\t", " ").replace("\n", " ") for v in row))
+        buf.write("\n")
+        n += 1
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+    return n
+
+
+def generate(conn, spec: DatasetSpec) -> dict:
+    """
+    Reset the benchmark database and load a synthetic dataset. Returns row counts per table.
+    DESTRUCTIVE: truncates every bot table — only point this at a dedicated database.
+    """
+    rnd = random.Random(spec.seed)
+    ensure_tables(conn)
+    cur = conn.cursor()
+    cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+    counts = {}
+    counts["teams"] = _copy(cur, "teams", ["id", "group_chat_id", "name"],
+                            ((t, -1000000000000 - t, f"Team {t}") for t in range(1, spec.teams + 1)))
+    counts["forms"] = _copy(cur, "forms", ["form_code", "display_name"], FORMS)
+
+    companies = []
+    for i in range(spec.companies):
+        tax = f"{1000000000 + i}"
+        team_id = 1 + i % spec.teams
+        owner = str(500000 + rnd.randrange(spec.companies // 3 + 1)) if rnd.random() < spec.owner_rate else None
+        companies.append((tax, f"Công ty TNHH Thương mại Dịch vụ {i}", team_id, f"user{owner}" if owner else None, owner, "active"))
+    counts["companies"] = _copy(cur, "companies",
+                                ["company_tax_id", "company_name", "team_id", "owner_username", "owner_telegram_id", "status"],
+                                companies)
+
+    reqs = []
+    rid = 0
+    for tax, *_ in companies:
+        profile = PROFILES[rnd.choice(["monthly", "monthly", "quarterly", "yearly"])]
+        for form_code, freq in profile[:spec.reqs_per_company]:
+            rid += 1
+            reqs.append((rid, tax, form_code, freq))
+    counts["requirements"] = _copy(cur, "requirements", ["id", "company_tax_id", "form_code", "period"], reqs)
+
+    start = date(spec.end_date.year - spec.years, 1, 1)
+    team_of = {c[0]: c[2] for c in companies}
+    chat_of = {t: -1000000000000 - t for t in range(1, spec.teams + 1)}
+
+    def submissions():
+        for _, tax, form_code, freq in reqs:
+            for ky, deadline in _periods(freq, start, spec.end_date):
+                if rnd.random() < spec.submission_rate:
+                    created = datetime.combine(deadline - timedelta(days=rnd.randrange(0, 15)), datetime.min.time()) + timedelta(hours=rnd.randrange(8, 18))
+                    yield (tax, f"Công ty {tax}", form_code, f"{form_code} - Tờ khai", ky, "0", "Tờ khai chính thức",
+                           "844", f"{rnd.randrange(10**6)}/TB-TĐT", created.date().isoformat(), f"GD{rnd.randrange(10**9)}", created.isoformat())
+
+    counts["submissions"] = _copy(cur, "submissions",
+                                  ["company_tax_id", "company_name", "form_code", "form_raw", "ky_thue", "lan_nop", "loai_to_khai",
+                                   "ma_tb", "so_thong_bao", "ngay_thong_bao", "ma_giaodich", "created_at"],
+                                  submissions())
+    backfill_period_keys(cur)
+
+    def reminders():
+        for req_id, tax, _, freq in reqs:
+            team_id = team_of[tax]
+            for _, deadline in _periods(freq, start, spec.end_date):
+                for k in range(spec.reminders_per_period):
+                    mode = "initial" if k == 0 else "hourly"
+                    sent = datetime.combine(deadline - timedelta(days=max(0, 3 - k)), datetime.min.time()) + timedelta(hours=8 + k)
+                    yield (team_id, req_id, deadline.isoformat(), mode, sent.isoformat(), str(rnd.randrange(10**6)), chat_of[team_id], "bench")
+
+    counts["reminders_sent"] = _copy(cur, "reminders_sent",
+                                     ["team_id", "requirement_id", "remind_for_date", "mode", "sent_at", "message_id", "chat_id", "note"],
+                                     reminders())
+
+    # explicit ids were loaded: move SERIAL sequences past them
+    for table in ("teams", "requirements"):
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))")
+    conn.commit()
+    # history rows older than the pre-created partitions landed in the default partition
+    ensure_partitions(conn)
+    cur.execute("ANALYZE")
+    conn.commit()
+    cur.close()
+    return counts
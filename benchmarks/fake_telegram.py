@@ -0,0 +1,379 @@
+# benchmarks/fake_telegram.py
+# Local stand-in for the Telegram Bot API, for end-to-end load tests (no network, no real bot).
+#
+#   python -m benchmarks.fake_telegram --port 8081 --latency-ms 40 --flood-rate 0.01
+#   TELEGRAM_BASE_URL=http://127.0.0.1:8081 BOT_TOKEN=123:fake python -m bot.main
+#
+# Speaks the subset of the Bot API the bot uses (getMe, getUpdates, sendMessage, sendDocument,
+# getFile + file downloads, getChatMember, getChatAdministrators, webhook calls) over plain
+# HTTP/1.1 on asyncio streams. Behaviour that AsyncMock cannot show is configurable:
+#   - latency (+ jitter) per API call and per file download
+#   - injected 429 "retry after" (flood_rate) and 500 (error_rate) responses
+#   - Telegram's send limits: per group per minute, per private chat per second, global per second;
+#     going over answers 429 with the retry_after the real window would need
+#   - chats the bot was removed from (403)
+# Updates for polling are queued with push_update(); files served by getFile with add_file().
+import argparse
+import asyncio
+import email.parser
+import email.policy
+import json
+import math
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_USER = {"id": 1000001, "is_bot": True, "first_name": "Fake Bot", "username": "fake_tax_bot",
+            "can_join_groups": True, "can_read_all_group_messages": True, "supports_inline_queries": False}
+SEND_METHODS = ("sendMessage", "sendDocument")
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 429: "Too Many Requests",
+           500: "Internal Server Error"}
+# getUpdates long polls are capped so a stopping bot is not held for Telegram's full timeout
+MAX_POLL_SECONDS = 5.0
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, description: str, retry_after: Optional[int] = None):
+        super().__init__(description)
+        self.status = status
+        self.description = description
+        self.retry_after = retry_after
+
+
+class _Window:
+    """Sliding-window send counter: at most `limit` sends per `seconds`."""
+
+    def __init__(self, limit: int, seconds: float):
+        self.limit = limit
+        self.seconds = seconds
+        self.sent: Deque[float] = deque()
+
+    def wait_time(self, now: float) -> float:
+        """0 when a send is allowed now, else seconds until the oldest send leaves the window."""
+        if self.limit <= 0:
+            return 0.0
+        while self.sent and now - self.sent[0] >= self.seconds:
+            self.sent.popleft()
+        if len(self.sent) < self.limit:
+            return 0.0
+        return self.seconds - (now - self.sent[0])
+
+    def add(self, now: float):
+        if self.limit > 0:
+            self.sent.append(now)
+
+
+class FakeTelegramServer:
+    """
+    In-process fake Bot API. start() returns the base URL to give the bot (TELEGRAM_BASE_URL);
+    every request is counted in `stats`, every delivered message kept in `messages`.
+    Limits of 0 disable that limit.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        flood_rate: float = 0.0,
+        flood_retry_after: int = 1,
+        error_rate: float = 0.0,
+        group_per_minute: int = 20,
+        private_per_second: int = 1,
+        global_per_second: int = 30,
+        forbidden_chats: Iterable[int] = (),
+        admins: Iterable[int] = (),
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_retry_after = flood_retry_after
+        self.error_rate = error_rate
+        self.group_per_minute = group_per_minute
+        self.private_per_second = private_per_second
+        self.forbidden_chats = set(forbidden_chats)
+        self.admins = set(admins)
+        self.stats: Counter = Counter()
+        self.messages: List[Dict[str, Any]] = []
+        self.files: Dict[str, bytes] = {}
+        self._rnd = random.Random(seed)
+        self._global = _Window(global_per_second, 1.0)
+        self._chats: Dict[int, _Window] = {}
+        self._updates: List[Dict[str, Any]] = []
+        self._update_id = 0
+        self._new_update = asyncio.Event()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.base_url = ""
+
+    # ---- control ----
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._serve, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def add_file(self, data: bytes, file_id: Optional[str] = None) -> str:
+        file_id = file_id or f"file{len(self.files) + 1}"
+        self.files[file_id] = data
+        return file_id
+
+    def push_update(self, update: Dict[str, Any]) -> int:
+        """Queue an update (without update_id) for getUpdates; returns its update_id."""
+        self._update_id += 1
+        self._updates.append(dict(update, update_id=self._update_id))
+        self._new_update.set()
+        return self._update_id
+
+    def summary(self) -> Dict[str, Any]:
+        sends = sum(self.stats[f"call:{m}"] for m in SEND_METHODS)
+        rejected = self.stats["429:flood"] + self.stats["429:limit"] + self.stats["500"] + self.stats["403"]
+        return {
+            "requests": sum(v for k, v in self.stats.items() if k.startswith("call:")),
+            "send_calls": sends,
+            "delivered": len(self.messages),
+            "flood_injected": self.stats["429:flood"],
+            "rate_limited": self.stats["429:limit"],
+            "server_errors": self.stats["500"],
+            "forbidden": self.stats["403"],
+            "send_error_rate": round(rejected / sends, 4) if sends else 0.0,
+            "downloads": self.stats["download"],
+            "by_method": {k[5:]: v for k, v in sorted(self.stats.items()) if k.startswith("call:")},
+        }
+
+    # ---- HTTP ----
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                verb, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = h.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                status, ctype, payload = await self._respond(verb, target, headers, body)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\nContent-Type: {ctype}\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, verb: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, str, bytes]:
+        path = urlsplit(target).path
+        # /bot<token>/<method>  or  /file/bot<token>/<file_path>
+        parts = path.strip("/").split("/")
+        if len(parts) >= 3 and parts[0] == "file" and parts[1].startswith("bot"):
+            return await self._download("/".join(parts[2:]))
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            return 404, "text/plain", b"not found"
+        method = parts[1]
+        self.stats[f"call:{method}"] += 1
+        params = _parse_params(headers.get("content-type", ""), body, urlsplit(target).query)
+        try:
+            if method != "getUpdates":
+                await self._delay()
+            result = await self._call(method, params)
+            payload: Dict[str, Any] = {"ok": True, "result": result}
+            status = 200
+        except ApiError as e:
+            status = e.status
+            payload = {"ok": False, "error_code": e.status, "description": e.description}
+            if e.retry_after is not None:
+                payload["parameters"] = {"retry_after": e.retry_after}
+        return status, "application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    async def _download(self, file_path: str) -> Tuple[int, str, bytes]:
+        data = self.files.get(file_path.rsplit("/", 1)[-1])
+        if data is None:
+            return 404, "text/plain", b"file not found"
+        self.stats["download"] += 1
+        await self._delay()
+        return 200, "application/octet-stream", data
+
+    async def _delay(self):
+        delay = self.latency + (self._rnd.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # ---- Bot API methods ----
+
+    async def _call(self, method: str, p: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return BOT_USER
+        if method in ("deleteWebhook", "setWebhook", "setMyCommands", "deleteMyCommands"):
+            return True
+        if method == "getUpdates":
+            return await self._get_updates(p)
+        if method in SEND_METHODS:
+            return self._send(method, p)
+        if method == "getFile":
+            file_id = p.get("file_id")
+            if file_id not in self.files:
+                raise ApiError(400, "Bad Request: invalid file_id")
+            return {"file_id": file_id, "file_unique_id": f"u{file_id}", "file_size": len(self.files[file_id]),
+                    "file_path": f"documents/{file_id}"}
+        if method == "getChatMember":
+            return self._member(_int(p.get("user_id")))
+        if method == "getChatAdministrators":
+            return [self._member(uid) for uid in sorted(self.admins)]
+        self.stats["unknown"] += 1
+        raise ApiError(404, "Not Found")
+
+    async def _get_updates(self, p: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = _int(p.get("offset")) or 0
+        # updates below the offset are confirmed: drop them, like Telegram does
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._new_update.clear()
+            timeout = min(float(p.get("timeout") or 0), MAX_POLL_SECONDS)
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = _int(p.get("limit")) or 100
+        return self._updates[:limit]
+
+    def _send(self, method: str, p: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = _int(p.get("chat_id"))
+        if chat_id is None:
+            raise ApiError(400, "Bad Request: chat_id is empty")
+        if chat_id in self.forbidden_chats:
+            self.stats["403"] += 1
+            raise ApiError(403, "Forbidden: bot was kicked from the group chat")
+        if self.flood_rate and self._rnd.random() < self.flood_rate:
+            self.stats["429:flood"] += 1
+            raise ApiError(429, f"Too Many Requests: retry after {self.flood_retry_after}", self.flood_retry_after)
+        if self.error_rate and self._rnd.random() < self.error_rate:
+            self.stats["500"] += 1
+            raise ApiError(500, "Internal Server Error")
+
+        now = time.monotonic()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = (_Window(self.group_per_minute, 60.0) if chat_id < 0
+                                           else _Window(self.private_per_second, 1.0))
+        wait = max(chat.wait_time(now), self._global.wait_time(now))
+        if wait > 0:
+            self.stats["429:limit"] += 1
+            retry_after = max(1, math.ceil(wait))
+            raise ApiError(429, f"Too Many Requests: retry after {retry_after}", retry_after)
+        chat.add(now)
+        self._global.add(now)
+
+        message = {
+            "message_id": len(self.messages) + 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            "from": BOT_USER,
+        }
+        if method == "sendDocument":
+            message["document"] = {"file_id": f"sent{message['message_id']}", "file_unique_id": f"s{message['message_id']}"}
+            message["caption"] = p.get("caption")
+        else:
+            message["text"] = p.get("text") or ""
+        reply_to = _int(p.get("reply_to_message_id"))
+        if reply_to is None and p.get("reply_parameters"):
+            reply_to = _int(json.loads(p["reply_parameters"]).get("message_id"))
+        self.messages.append({"chat_id": chat_id, "message_id": message["message_id"], "reply_to": reply_to,
+                              "text": message.get("text") or message.get("caption") or "", "at": now})
+        return message
+
+    def _member(self, user_id: Optional[int]) -> Dict[str, Any]:
+        user = {"id": user_id or 0, "is_bot": False, "first_name": f"User {user_id}"}
+        if user_id not in self.admins:
+            return {"status": "member", "user": user}
+        return {"status": "administrator", "user": user, "can_be_edited": False, "is_anonymous": False,
+                "can_manage_chat": True, "can_delete_messages": True, "can_manage_video_chats": True,
+                "can_restrict_members": True, "can_promote_members": False, "can_change_info": True,
+                "can_invite_users": True}
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_params(content_type: str, body: bytes, query: str) -> Dict[str, Any]:
+    """Bot API parameters from the query string, a form / JSON body or a multipart upload."""
+    params: Dict[str, Any] = dict(parse_qsl(query))
+    if not body:
+        return params
+    ctype = content_type.split(";")[0].strip().lower()
+    if ctype == "application/json":
+        params.update(json.loads(body))
+    elif ctype == "multipart/form-data":
+        msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            data = part.get_payload(decode=True) or b""
+            # file parts are only counted; the fake does not keep uploads
+            params[name] = data if part.get_filename() else data.decode("utf-8")
+    else:
+        params.update(parse_qsl(body.decode("utf-8")))
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="share of sends answered with 429")
+    parser.add_argument("--flood-retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of sends answered with 500")
+    parser.add_argument("--group-per-minute", type=int, default=20, help="0 = unlimited")
+    parser.add_argument("--private-per-second", type=int, default=1, help="0 = unlimited")
+    parser.add_argument("--global-per-second", type=int, default=30, help="0 = unlimited")
+    parser.add_argument("--admin", type=int, action="append", default=[], help="user id reported as chat admin")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = FakeTelegramServer(
+            latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, flood_rate=args.flood_rate,
+            flood_retry_after=args.flood_retry_after, error_rate=args.error_rate,
+            group_per_minute=args.group_per_minute, private_per_second=args.private_per_second,
+            global_per_second=args.global_per_second, admins=args.admin,
+        )
+        url = await server.start(args.host, args.port)
+        print(f"fake Bot API listening on {url} (set TELEGRAM_BASE_URL={url})")
+        try:
+            while True:
+                await asyncio.sleep(30)
+                print(json.dumps(server.summary()))
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
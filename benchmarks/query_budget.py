@@ -0,0 +1,230 @@
+# benchmarks/query_budget.py
+# SQL statement counts per handler invocation: a counter for budget assertions in tests and a
+# worst-offender report over the command modules, run against a synthetic dataset.
+#
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.query_budget --companies 500
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.query_budget --skip-load --out budget.json
+#
+# Statements are counted from the "sql" spans TracingCursor records in the current trace, so
+# everything a handler runs is included: its own queries, helpers, asyncio.to_thread workers.
+# PREPARE statements (once per pooled connection, see bot/db/queries.py) are reported but not
+# counted against a budget. BENCH_DATABASE_URL must be a dedicated database (it is truncated).
+import argparse
+import asyncio
+import json
+import os
+from collections import Counter
+from datetime import date
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence
+from unittest.mock import AsyncMock
+
+from bot.services.tracing import finish_trace, start_trace
+
+
+class QueryCounter:
+    """
+    Count the SQL statements run inside the block:
+
+        with QueryCounter("force_remind") as qc:
+            asyncio.run(force_remind(update, context))
+        qc.assert_budget(4)
+    """
+
+    def __init__(self, name: str = "query_budget"):
+        self.name = name
+        self.queries = 0
+        self.prepares = 0
+        self.total_ms = 0.0
+        self.statements: Counter = Counter()
+        self._trace = None
+        self._token = None
+
+    def __enter__(self) -> "QueryCounter":
+        self._trace, self._token = start_trace(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        data = finish_trace(self._trace, self._token)
+        for s in data["spans"]:
+            if s["kind"] != "sql":
+                continue
+            if s["name"].startswith("PREPARE "):
+                self.prepares += 1
+                continue
+            self.queries += 1
+            self.total_ms += s["duration_ms"]
+            self.statements[s["name"]] += 1
+        return False
+
+    def repeated(self, top_n: int = 3) -> List[tuple]:
+        """Statements run more than once, most frequent first (the usual N+1 suspects)."""
+        return [(sql, n) for sql, n in self.statements.most_common(top_n) if n > 1]
+
+    def assert_budget(self, max_queries: int):
+        if self.queries <= max_queries:
+            return
+        lines = [f"{self.name}: {self.queries} queries > budget {max_queries}"]
+        lines += [f"  {n}x {sql}" for sql, n in self.statements.most_common(10)]
+        raise AssertionError("\n".join(lines))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "prepares": self.prepares,
+            "sql_ms": round(self.total_ms, 1),
+            "repeated": [{"statement": sql, "count": n} for sql, n in self.repeated()],
+        }
+
+
+def fake_update(chat_id: int, user_id: int, text: str = "") -> SimpleNamespace:
+    """Minimal Update for calling a handler directly; replies are AsyncMocks."""
+    message = SimpleNamespace(
+        text=text,
+        reply_to_message=None,
+        document=None,
+        chat=SimpleNamespace(id=chat_id, title=f"chat {chat_id}"),
+        reply_text=AsyncMock(),
+        reply_document=AsyncMock(),
+    )
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id, type="supergroup"),
+        effective_user=SimpleNamespace(id=user_id, username=f"user{user_id}", full_name=f"User {user_id}"),
+        message=message,
+    )
+
+
+def fake_context(args: Sequence[str] = (), admins: Sequence[int] = ()) -> SimpleNamespace:
+    """
+    Context whose bot reports `admins` as chat admins and accepts every send.
+    application.create_task schedules the coroutine and keeps it in context.tasks.
+    """
+    bot = SimpleNamespace(
+        send_message=AsyncMock(return_value=SimpleNamespace(message_id=1)),
+        get_chat_administrators=AsyncMock(return_value=[SimpleNamespace(user=SimpleNamespace(id=u)) for u in admins]),
+        get_chat_member=AsyncMock(return_value=SimpleNamespace(status="member")),
+    )
+    tasks: List[asyncio.Future] = []
+
+    def create_task(coro, update=None):
+        tasks.append(asyncio.ensure_future(coro))
+        return tasks[-1]
+
+    return SimpleNamespace(args=list(args), bot=bot, tasks=tasks,
+                           application=SimpleNamespace(bot=bot, create_task=create_task))
+
+
+async def _invoke(callback, update, context):
+    """The handler, then the background tasks it started (e.g. /force_remind's dispatch)."""
+    await callback(update, context)
+    await asyncio.gather(*context.tasks)
+
+
+def count_handler(callback, update, context, name: Optional[str] = None) -> QueryCounter:
+    """Run one handler invocation and its background tasks (in a fresh event loop) and count their statements."""
+    with QueryCounter(name or getattr(callback, "__name__", "handler")) as qc:
+        asyncio.run(_invoke(callback, update, context))
+    return qc
+
+
+# (command, module, handler, args); run in this order, writes last
+SCENARIOS = [
+    ("/list_companies", "admin", "list_companies", []),
+    ("/list_requirements", "admin", "list_requirements", []),
+    ("/export", "admin", "export_team", ["csv"]),
+    ("/list_all_teams", "owner", "list_all_teams", []),
+    ("/deadline_rules", "owner", "list_deadline_rules", []),
+    ("/holidays", "owner", "list_holidays", []),
+    ("/outbox", "owner", "outbox_cmd", []),
+    ("/add_company", "admin", "add_company", ["{new_tax}", "Công ty Mới"]),
+    ("/quick_add", "admin", "quick_add_reqs", ["{new_tax}", "monthly"]),
+    ("/add_requirement", "admin", "add_requirement", ["{new_tax}", "03/TNDN", "yearly"]),
+    ("/edit_company_name", "admin", "edit_company_name", ["{tax}", "Tên", "mới"]),
+    ("/clear_owner", "admin", "clear_owner", ["{tax}"]),
+    ("/remove_requirement", "admin", "remove_requirement", ["{new_tax}", "03/TNDN"]),
+    ("/force_remind", "admin", "force_remind", ["all"]),
+]
+
+
+def run_report(chat_id: int, tax: str, user_id: int = 424242) -> List[Dict[str, Any]]:
+    """Run every scenario as an admin of `chat_id` (and owner) and return rows, worst first."""
+    import importlib
+
+    os.environ["OWNER_IDS"] = str(user_id)
+    values = {"tax": tax, "new_tax": "0999999999"}
+    rows = []
+    for command, module, handler, args in SCENARIOS:
+        callback = getattr(importlib.import_module(f"bot.commands.{module}"), handler)
+        update = fake_update(chat_id, user_id, text=command)
+        context = fake_context([a.format(**values) for a in args], admins=[user_id])
+        error = None
+        with QueryCounter(command) as qc:
+            try:
+                asyncio.run(_invoke(callback, update, context))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        rows.append(dict(command=command, module=module, sends=context.bot.send_message.await_count,
+                         error=error, **qc.as_dict()))
+    return sorted(rows, key=lambda r: (-r["queries"], -r["sql_ms"]))
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'command':<22} {'queries':>7} {'prepare':>7} {'sql ms':>8}  most repeated"]
+    for r in rows:
+        worst = r["repeated"][0] if r["repeated"] else None
+        note = f"{worst['count']}x {worst['statement'][:70]}" if worst else ""
+        if r["error"]:
+            note = f"ERROR {r['error'][:70]}"
+        lines.append(f"{r['command']:<22} {r['queries']:>7} {r['prepares']:>7} {r['sql_ms']:>8}  {note}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from benchmarks.datagen import DatasetSpec, generate
+    from bot.db.database import get_conn
+
+    parser = argparse.ArgumentParser(description="SQL statements per handler (worst offenders first)")
+    parser.add_argument("--teams", type=int, default=4)
+    parser.add_argument("--companies", type=int, default=2000, help="total; spread over the teams")
+    parser.add_argument("--reqs-per-company", type=int, default=3)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    db_url = os.getenv("BENCH_DATABASE_URL")
+    if not db_url:
+        raise SystemExit("Set BENCH_DATABASE_URL (a dedicated database, it will be truncated)")
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("TRACE_SLOW_MS", "1e12")
+    os.environ.setdefault("TRACE_SLOW_QUERY_MS", "1e12")
+    # /force_remind: no pacing or cooldown, so the report runs fast and can be repeated
+    os.environ.setdefault("FORCE_REMIND_INTERVAL", "0")
+    os.environ.setdefault("FORCE_REMIND_COOLDOWN_MINUTES", "0")
+
+    spec = DatasetSpec(teams=args.teams, companies=args.companies, reqs_per_company=args.reqs_per_company,
+                       years=args.years, seed=args.seed, end_date=date.today())
+    conn = get_conn()
+    try:
+        if not args.skip_load:
+            print(f"dataset: {generate(conn, spec)}")
+        cur = conn.cursor()
+        # the first team and one of its companies
+        cur.execute("SELECT t.group_chat_id, MIN(c.company_tax_id) FROM teams t JOIN companies c ON c.team_id = t.id "
+                    "GROUP BY t.id, t.group_chat_id ORDER BY t.id LIMIT 1")
+        chat_id, tax = cur.fetchone()
+        conn.rollback()
+    finally:
+        conn.close()
+
+    rows = run_report(chat_id, tax)
+    print(format_report(rows))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({"dataset": dict(vars(spec), end_date=spec.end_date.isoformat()), "results": rows},
+                      fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# benchmarks/reminder_pipeline.py
+# Benchmark _gather_reminder_payloads, send_daily_reminders and send_hourly_reminders
+# against a local Postgres loaded with a synthetic dataset and a fake bot.
+#
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.reminder_pipeline --out bench.json
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.reminder_pipeline --baseline bench.json
+#
+# BENCH_DATABASE_URL must point at a dedicated database: the dataset step truncates every table.
+# Exit code 1 when a metric regresses beyond --tolerance compared to the baseline.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, time as dtime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict
+
+from benchmarks.datagen import DatasetSpec, generate
+from bot.db.database import get_conn
+from bot.services import reminder_service
+from bot.services.tracing import start_trace, finish_trace
+
+
+class FakeBot:
+    """Stand-in for telegram.Bot: records sends, optional per-call latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id=None, text=None, parse_mode=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+        return SimpleNamespace(message_id=self.sent, chat_id=chat_id)
+
+
+def _measure(name: str, make_run: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Run a benchmark target `repeat` times for timing, then once more under tracemalloc for memory.
+    make_run() returns either a plain result or a coroutine (run in a fresh event loop).
+    """
+    def run_once():
+        trace, token = start_trace(f"bench:{name}")
+        t0 = time.perf_counter()
+        try:
+            res = make_run()
+            if asyncio.iscoroutine(res):
+                res = asyncio.run(res)
+        finally:
+            elapsed = time.perf_counter() - t0
+            finish_trace(trace, token)
+        return elapsed, trace.count("sql")
+
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        elapsed, queries = run_once()
+        timings.append(elapsed)
+
+    tracemalloc.start()
+    try:
+        run_once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "max_s": round(max(timings), 4),
+        "queries": queries,
+        "peak_mem_kib": round(peak / 1024, 1),
+    }
+
+
+def reset_reminders(since: datetime):
+    """Undo what reminder runs wrote since `since` (reminders_sent rows and outbox runs)."""
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM reminders_sent WHERE sent_at >= %s AND note <> 'bench'", (since,))
+        # runs are idempotent per day / hour: drop their outbox rows so the next repetition sends again
+        cur.execute("DELETE FROM reminder_outbox WHERE created_at >= %s", (since,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_suite(ref_date: date, repeat: int, latency: float) -> Dict[str, Any]:
+    results = {}
+    results["gather"] = _measure("gather", lambda: reminder_service._gather_reminder_payloads(ref_date), repeat)
+
+    # send_* write reminders_sent; roll those rows back after each target so runs stay comparable
+    bot = FakeBot(latency)
+    app = SimpleNamespace(bot=bot)
+    since = datetime.now()
+
+    def daily():
+        reset_reminders(since)
+        return reminder_service.send_daily_reminders(app, ref_date)
+
+    results["send_daily"] = _measure("send_daily", daily, repeat)
+    results["send_daily"]["messages"] = bot.sent // (repeat + 1)
+    reset_reminders(since)
+
+    # hourly: pin "now" to the morning of the reference (deadline) day
+    bot = FakeBot(latency)
+    app = SimpleNamespace(bot=bot)
+    now = reminder_service.TIMEZONE.localize(datetime.combine(ref_date, dtime(9, 0)))
+    since = datetime.now()
+
+    def hourly():
+        # each repetition starts with no hourly rows so the same messages are sent every time
+        reset_reminders(since)
+        return reminder_service.send_hourly_reminders(app, ref_date, now=now)
+
+    results["send_hourly"] = _measure("send_hourly", hourly, repeat)
+    results["send_hourly"]["messages"] = bot.sent // (repeat + 1)
+    reset_reminders(since)
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float):
+    """Return a list of human-readable regressions (empty when none)."""
+    problems = []
+    for target, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(target)
+        if not base:
+            continue
+        for key in ("median_s", "peak_mem_kib"):
+            if base.get(key) and metrics[key] > base[key] * (1 + tolerance):
+                problems.append(f"{target}.{key}: {metrics[key]} > baseline {base[key]} (+{tolerance:.0%})")
+        if metrics["queries"] > base.get("queries", metrics["queries"]):
+            problems.append(f"{target}.queries: {metrics['queries']} > baseline {base['queries']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reminder pipeline benchmark")
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--reqs-per-company", type=int, default=5)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ref-date", type=date.fromisoformat, default=date(2026, 1, 20),
+                        help="reference day; default is a monthly deadline so every stage has work")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake bot latency per send (seconds)")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    args = parser.parse_args(argv)
+
+    db_url = os.getenv("BENCH_DATABASE_URL")
+    if not db_url:
+        raise SystemExit("Set BENCH_DATABASE_URL (a dedicated database, it will be truncated)")
+    # everything in the bot reads DATABASE_URL
+    os.environ["DATABASE_URL"] = db_url
+    # benchmark runs are "slow handlers" by design; keep the output readable
+    os.environ.setdefault("TRACE_SLOW_MS", "1e12")
+    os.environ.setdefault("TRACE_SLOW_QUERY_MS", "1e12")
+
+    spec = DatasetSpec(teams=args.teams, companies=args.companies, reqs_per_company=args.reqs_per_company,
+                       years=args.years, seed=args.seed, end_date=args.ref_date)
+    counts = None
+    if not args.skip_load:
+        conn = get_conn()
+        try:
+            t0 = time.perf_counter()
+            counts = generate(conn, spec)
+            print(f"dataset loaded in {time.perf_counter() - t0:.1f}s: {counts}")
+        finally:
+            conn.close()
+
+    current = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "dataset": dict(vars(spec), end_date=spec.end_date.isoformat(), rows=counts),
+        "ref_date": args.ref_date.isoformat(),
+        "repeat": args.repeat,
+        "results": run_suite(args.ref_date, args.repeat, args.latency),
+    }
+    print(json.dumps(current["results"], indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("dataset", {}).get("companies") != spec.companies:
+            print("WARNING: baseline was recorded with a different dataset size")
+        problems = compare(current, baseline, args.tolerance)
+        if problems:
+            print("REGRESSIONS:\n  " + "\n  ".join(problems))
+            sys.exit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/scan_memory.py
+# Memory / time of the reminder scan and rendering stages on a synthetic in-memory dataset
+# (no database: a fake cursor hands out fresh row tuples the way psycopg2 does).
+#
+#   python -m benchmarks.scan_memory --companies 20000 --reqs-per-company 5
+#   python -m benchmarks.scan_memory --out scan.json
+#   SCAN_NUMPY=0 python -m benchmarks.scan_memory --simulate-days 365   # pure-Python deadline path
+#
+# Stages: load (_load_scan_rows), scan (_due_payloads), render (_build_daily_messages +
+# outbox rows). "retained_kib" is what a stage keeps alive, "peak_kib" its high-water mark.
+# --simulate-days N also times simulation.simulate() over N days of the same dataset.
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import date
+from typing import Any, Dict
+
+from benchmarks.datagen import PROFILES
+from bot.services import reminder_service, simulation
+from bot.services.deadline_rules import DeadlineRules, numpy_enabled
+
+
+def _fresh(s: str) -> str:
+    """A new str object with the same value (psycopg2 builds one per row and column)."""
+    return (s + "!")[:-1]
+
+
+class FakeScanCursor:
+    """Serves SCAN_TEAMS / SCAN_REQUIREMENTS rows, built lazily on fetch."""
+
+    connection = None
+
+    def __init__(self, teams: int, companies: int, reqs_per_company: int, owner_rate: float, seed: int):
+        self.spec = (teams, companies, reqs_per_company, owner_rate, seed)
+        self._rows = iter(())
+
+    def _team_rows(self):
+        for t in range(1, self.spec[0] + 1):
+            yield (t, -1000000000000 - t, _fresh(f"Team {t}"))
+
+    def _req_rows(self):
+        teams, companies, per_company, owner_rate, seed = self.spec
+        rnd = random.Random(seed)
+        profiles = list(PROFILES.values())
+        rid = 0
+        for c in range(companies):
+            team_id = c % teams + 1
+            owner = str(100000 + c % 500) if rnd.random() < owner_rate else None
+            for form_code, freq in rnd.choice(profiles)[:per_company]:
+                rid += 1
+                yield (team_id, rid, _fresh(f"{c:010d}"), _fresh(form_code), _fresh(freq),
+                       _fresh(f"Công ty TNHH Thương mại {c}"), _fresh(owner) if owner else None)
+
+    def execute(self, sql, params=None):
+        self._rows = self._req_rows() if "FROM requirements" in sql else self._team_rows()
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchmany(self, size=1):
+        return [row for _, row in zip(range(size), self._rows)]
+
+    def close(self):
+        pass
+
+
+def run(args) -> Dict[str, Any]:
+    def stages():
+        cur = FakeScanCursor(args.teams, args.companies, args.reqs_per_company, args.owner_rate, args.seed)
+        teams, reqs = reminder_service._load_scan_rows(cur)
+        yield "load", (teams, reqs)
+        payloads = reminder_service._due_payloads(teams, reqs, [], args.ref_date)
+        yield "scan", payloads
+        batches = reminder_service._build_daily_messages(payloads, args.ref_date)
+        messages = reminder_service._daily_outbox_messages(batches)
+        yield "render", (batches, messages)
+
+    # timing pass (tracemalloc slows allocation-heavy code down a lot)
+    timings = {}
+    t0 = time.perf_counter()
+    for name, _ in stages():
+        t1 = time.perf_counter()
+        timings[name] = round((t1 - t0) * 1000, 1)
+        t0 = t1
+
+    results: Dict[str, Any] = {}
+    kept = []
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        previous = base
+        for name, value in stages():
+            current, peak = tracemalloc.get_traced_memory()
+            kept.append(value)
+            results[name] = {
+                "ms": timings[name],
+                "retained_kib": round((current - previous) / 1024, 1),
+                "peak_kib": round((peak - previous) / 1024, 1),
+            }
+            previous = current
+            tracemalloc.reset_peak()
+        total = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+
+    payloads = kept[1]
+    results["total_retained_kib"] = round(total / 1024, 1)
+    results["items"] = sum(len(p["items"]) for p in payloads)
+    results["messages"] = len(kept[2][1])
+
+    if args.simulate_days:
+        teams, reqs = kept[0]
+        snapshot = {"teams": teams, "reqs": reqs, "holidays": [], "rules": DeadlineRules(), "submissions": {}}
+        end = date.fromordinal(args.ref_date.toordinal() + args.simulate_days - 1)
+        t0 = time.perf_counter()
+        report = simulation.simulate(args.ref_date, end, snapshot)
+        results["simulate"] = {
+            "days": args.simulate_days,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "daily_messages": report["totals"]["daily_messages"],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reminder scan memory benchmark (no database)")
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--companies", type=int, default=20000)
+    parser.add_argument("--reqs-per-company", type=int, default=5)
+    parser.add_argument("--owner-rate", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ref-date", type=date.fromisoformat, default=date(2026, 1, 16),
+                        help="reference day; default is inside the monthly reminder window so most rows are due")
+    parser.add_argument("--simulate-days", type=int, default=0, help="also time a simulation over this many days")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "requirements": args.companies * args.reqs_per_company,
+        "ref_date": args.ref_date.isoformat(),
+        "numpy": numpy_enabled(),
+        "results": run(args),
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
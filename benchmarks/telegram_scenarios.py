@@ -0,0 +1,264 @@
+# benchmarks/telegram_scenarios.py
+# End-to-end load scenarios: the real Application (handlers, update processor, outbox) talking
+# HTTP to benchmarks/fake_telegram.py, against a local Postgres loaded with a synthetic dataset.
+#
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.telegram_scenarios uploads --uploads 500
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.telegram_scenarios daily --flood-rate 0.02
+#   BENCH_DATABASE_URL=postgresql://... python -m benchmarks.telegram_scenarios all --skip-load --out e2e.json
+#
+# uploads: XML notifications (benchmarks/xml_corpus.py) posted as documents into the team groups
+#          and fetched by polling; the bot downloads each file, parses it and replies.
+#          Reports uploads/s, reply latency and the outcome of every upload (by reply text).
+# daily / hourly: one reminder run through the outbox; reports messages/s, flood waits, failures.
+# Both include the fake server's view (429s injected / from limits, 500s, requests per method).
+# BENCH_DATABASE_URL must point at a dedicated database: the dataset step truncates every table.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import time
+from collections import Counter
+from datetime import date, datetime, time as dtime
+from typing import Any, Dict, List
+
+from benchmarks.datagen import DatasetSpec, generate
+from benchmarks.fake_telegram import FakeTelegramServer
+from benchmarks.reminder_pipeline import reset_reminders
+from benchmarks.xml_corpus import generate_corpus
+from bot.db.database import get_conn
+from bot.services import reminder_service
+
+FAKE_TOKEN = "123456:fake-token"
+SCENARIOS = ("uploads", "daily", "hourly")
+# reply prefixes of document_handler, for the outcome breakdown
+OUTCOMES = [
+    ("🙏", "recorded"),
+    ("Tệp thông báo không thuộc", "not_844"),
+    ("Lỗi khi parse", "parse_error"),
+    ("Không tải được", "download_error"),
+    # sent when the success reply itself fails (e.g. 429): the submission is saved nonetheless
+    ("Có lỗi khi lưu", "save_error"),
+    ("Công ty này thuộc", "other_team"),
+    ("Group này chưa", "unregistered"),
+]
+
+
+def _outcome(text: str) -> str:
+    for prefix, name in OUTCOMES:
+        if text.startswith(prefix):
+            return name
+    return "other"
+
+
+def _ms(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    data = sorted(values)
+    return round(data[min(len(data) - 1, int(p / 100 * len(data)))] * 1000, 1)
+
+
+def _server(args) -> FakeTelegramServer:
+    return FakeTelegramServer(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, flood_rate=args.flood_rate,
+        flood_retry_after=args.flood_retry_after, error_rate=args.error_rate,
+        group_per_minute=args.group_per_minute, private_per_second=args.private_per_second,
+        global_per_second=args.global_per_second, seed=args.seed,
+    )
+
+
+async def _with_app(server: FakeTelegramServer, run):
+    """Start the fake server, build the bot's Application against it and run `run(app, errors)`."""
+    from bot.main import build_application
+
+    os.environ["TELEGRAM_BASE_URL"] = await server.start()
+    app = build_application(FAKE_TOKEN)
+    errors: Counter = Counter()
+
+    async def on_error(update, context):
+        errors[type(context.error).__name__] += 1
+
+    app.add_error_handler(on_error)
+    try:
+        async with app:
+            return await run(app, errors)
+    finally:
+        await server.stop()
+
+
+def _team_chats() -> List[int]:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT group_chat_id FROM teams WHERE group_chat_id IS NOT NULL ORDER BY id")
+        return [r[0] for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+async def run_uploads(args) -> Dict[str, Any]:
+    server = _server(args)
+    chats = _team_chats()
+    if not chats:
+        raise SystemExit("no team groups in the database (load a dataset first)")
+    corpus = generate_corpus(args.uploads, seed=args.seed)
+
+    async def run(app, errors):
+        await app.updater.start_polling(poll_interval=0.0, timeout=1)
+        await app.start()
+        processor = app.update_processor
+        pushed: Dict[int, tuple] = {}  # message_id -> (chat_id, pushed at)
+        t0 = time.monotonic()
+        for i, (_, data) in enumerate(corpus):
+            file_id = server.add_file(data)
+            chat_id = chats[i % len(chats)]
+            message_id = i + 1
+            server.push_update({"message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup", "title": f"Team {chat_id}"},
+                "from": {"id": 700000 + i % 50, "is_bot": False, "first_name": "Kế toán"},
+                "document": {"file_id": file_id, "file_unique_id": f"u{file_id}", "file_name": f"TB{message_id}.xml",
+                             "mime_type": "text/xml", "file_size": len(data)},
+            }})
+            pushed[message_id] = (chat_id, time.monotonic())
+            if args.upload_rate:
+                await asyncio.sleep(1 / args.upload_rate)
+
+        # done when every upload reached a handler and nothing is running or queued
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            s = processor.stats
+            if s.processed >= len(corpus) and not s.running and not s.waiting:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.monotonic() - t0
+        await app.updater.stop()
+        await app.stop()
+
+        latencies = []
+        outcomes: Counter = Counter()
+        for m in server.messages:
+            sent = pushed.get(m["reply_to"])
+            if sent and sent[0] == m["chat_id"]:
+                latencies.append(m["at"] - sent[1])
+                outcomes[_outcome(m["text"])] += 1
+        outcomes["no_reply"] = len(corpus) - len(latencies)
+        return {
+            "uploads": len(corpus),
+            "handled": processor.stats.processed,
+            "seconds": round(elapsed, 2),
+            "uploads_per_s": round(len(corpus) / elapsed, 1) if elapsed else 0.0,
+            "reply_p50_ms": _ms(latencies, 50),
+            "reply_p95_ms": _ms(latencies, 95),
+            "reply_max_ms": _ms(latencies, 100),
+            "outcomes": dict(outcomes),
+            "handler_errors": dict(errors),
+            "queue": processor.stats.snapshot(),
+            "server": server.summary(),
+        }
+
+    return await _with_app(server, run)
+
+
+async def run_reminders(args, mode: str) -> Dict[str, Any]:
+    server = _server(args)
+    since = datetime.now()
+
+    async def run(app, errors):
+        t0 = time.monotonic()
+        if mode == "daily":
+            counts = await reminder_service.send_daily_reminders(app, args.ref_date)
+        else:
+            now = reminder_service.TIMEZONE.localize(datetime.combine(args.ref_date, dtime(9, 0)))
+            counts = await reminder_service.send_hourly_reminders(app, args.ref_date, now=now)
+        elapsed = time.monotonic() - t0
+        sends = [m["at"] for m in server.messages]
+        return {
+            "seconds": round(elapsed, 2),
+            "counts": counts,
+            "messages_per_s": round(len(sends) / elapsed, 1) if elapsed else 0.0,
+            "error_rate": round(counts.get("failed", 0) / counts["claimed"], 4) if counts.get("claimed") else 0.0,
+            "send_gap_median_ms": round(statistics.median(b - a for a, b in zip(sends, sends[1:])) * 1000, 1)
+            if len(sends) > 1 else 0.0,
+            "server": server.summary(),
+        }
+
+    try:
+        return await _with_app(server, run)
+    finally:
+        # leave the dataset as it was so the next run sends the same messages
+        reset_reminders(since)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end scenarios against a fake Bot API server")
+    parser.add_argument("scenario", choices=SCENARIOS + ("all",))
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--reqs-per-company", type=int, default=5)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ref-date", type=date.fromisoformat, default=date(2026, 1, 20),
+                        help="reference day of the reminder runs; default is a monthly deadline")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--upload-rate", type=float, default=0.0, help="uploads per second (0 = all at once)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="max seconds to wait for the uploads")
+    # fake server behaviour (see benchmarks/fake_telegram.py)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--flood-rate", type=float, default=0.0)
+    parser.add_argument("--flood-retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--group-per-minute", type=int, default=20, help="0 = unlimited")
+    parser.add_argument("--private-per-second", type=int, default=1, help="0 = unlimited")
+    parser.add_argument("--global-per-second", type=int, default=30, help="0 = unlimited")
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    db_url = os.getenv("BENCH_DATABASE_URL")
+    if not db_url:
+        raise SystemExit("Set BENCH_DATABASE_URL (a dedicated database, it will be truncated)")
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("TRACE_SLOW_MS", "1e12")
+    os.environ.setdefault("TRACE_SLOW_QUERY_MS", "1e12")
+
+    spec = DatasetSpec(teams=args.teams, companies=args.companies, reqs_per_company=args.reqs_per_company,
+                       years=args.years, seed=args.seed, end_date=args.ref_date)
+    if not args.skip_load:
+        conn = get_conn()
+        try:
+            t0 = time.perf_counter()
+            counts = generate(conn, spec)
+            print(f"dataset loaded in {time.perf_counter() - t0:.1f}s: {counts}")
+        finally:
+            conn.close()
+
+    results = {}
+    # reminders first: uploads add submissions that change what is due
+    for name in ("daily", "hourly", "uploads"):
+        if args.scenario not in (name, "all"):
+            continue
+        if name == "uploads":
+            results[name] = asyncio.run(run_uploads(args))
+        else:
+            results[name] = asyncio.run(run_reminders(args, name))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "dataset": dict(vars(spec), end_date=spec.end_date.isoformat()),
+        "server": {k: getattr(args, k) for k in ("latency_ms", "jitter_ms", "flood_rate", "error_rate",
+                                                 "group_per_minute", "private_per_second", "global_per_second")},
+        "results": results,
+    }
+    print(json.dumps(report["results"], indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
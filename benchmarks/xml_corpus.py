@@ -0,0 +1,134 @@
+# benchmarks/xml_corpus.py
+# Synthetic GDT "TBaoThue" notification XMLs for parser tests and benchmarks.
+import base64
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+NS_URI = "http://kekhaithue.gdt.gov.vn/TBaoThue"
+
+# (form_code, description as it appears in tokhai-phuluc)
+FORMS = [
+    ("01/GTGT", "01/GTGT - Tờ khai thuế giá trị gia tăng (TT80/2021)"),
+    ("05/KK-TNCN", "05/KK-TNCN - Tờ khai khấu trừ thuế thu nhập cá nhân (TT80/2021)"),
+    ("05/QTT-TNCN", "05/QTT-TNCN - Tờ khai quyết toán thuế thu nhập cá nhân (TT80/2021)"),
+    ("03/TNDN", "03/TNDN - Tờ khai quyết toán thuế thu nhập doanh nghiệp (TT80/2021)"),
+    ("TT200", "BCTC theo TT200 - Bộ báo cáo tài chính (TT200/2014)"),
+]
+KNOWN_CODES = [code for code, _ in FORMS]
+NAME_WORDS = ["Công ty", "TNHH", "Cổ phần", "Thương mại", "Dịch vụ", "Xây dựng", "Sản xuất", "Đầu tư",
+              "Phát triển", "Việt Nam", "Hà Nội", "Đà Nẵng", "Sài Gòn", "Hưng Thịnh", "Phúc Lộc", "Ánh Dương"]
+STREETS = ["Nguyễn Trãi", "Lê Lợi", "Trần Hưng Đạo", "Điện Biên Phủ", "Hoàng Quốc Việt", "Phạm Văn Đồng"]
+NON_844_CODES = ["843", "845", "846", "451"]
+NAMESPACE_STYLES = ("default", "prefixed", "none")
+# nodes that real notifications sometimes omit
+OPTIONAL_NODES = ("tenNNhan", "diaChiNNhan", "soTBao", "ngayTBao", "maGiaoDichDTu", "loaiToKhai", "kyTinhThue", "lanNop", "tokhai-phuluc")
+
+
+def _company_name(rnd: random.Random) -> str:
+    return " ".join(rnd.sample(NAME_WORDS, 5))
+
+
+def _ky_thue(rnd: random.Random, form_code: str) -> str:
+    year = rnd.randrange(2020, 2027)
+    if form_code in ("05/QTT-TNCN", "03/TNDN", "TT200"):
+        return f"{year}"
+    if rnd.random() < 0.3:
+        return f"Q{rnd.randrange(1, 5)}/{year}"
+    return f"{rnd.randrange(1, 13):02d}/{year}"
+
+
+def make_notification(
+    rnd: random.Random,
+    *,
+    ma_tb: str = "844",
+    form: Optional[Tuple[str, str]] = None,
+    namespace: str = "default",
+    drop: Sequence[str] = (),
+    pad_kb: int = 0,
+) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Build one notification. Returns (expected, xml_bytes) where expected holds the values
+    the parser should extract (None for dropped nodes).
+    namespace: "default" (xmlns=...), "prefixed" (xmlns:ns0=...) or "none" (no namespace).
+    pad_kb: size of the signature blob appended, to emulate large signed files.
+    """
+    form_code, form_desc = form or rnd.choice(FORMS)
+    values = {
+        "maNNhan": f"{rnd.randrange(10**9, 10**10)}",
+        "tenNNhan": _company_name(rnd),
+        "diaChiNNhan": f"Số {rnd.randrange(1, 500)} đường {rnd.choice(STREETS)}, Quận {rnd.randrange(1, 13)}",
+        "maTBao": ma_tb,
+        "soTBao": f"{rnd.randrange(10**6)}/TB-TĐT",
+        "ngayTBao": f"{rnd.randrange(1, 29):02d}/{rnd.randrange(1, 13):02d}/{rnd.randrange(2020, 2027)}",
+        "maGiaoDichDTu": f"{rnd.randrange(10**15, 10**16)}",
+        "tokhai-phuluc": form_desc,
+        "loaiToKhai": rnd.choice(["Tờ khai chính thức", "Tờ khai bổ sung"]),
+        "kyTinhThue": _ky_thue(rnd, form_code),
+        "lanNop": str(rnd.randrange(0, 3)),
+    }
+    for name in drop:
+        values[name] = None
+
+    if namespace == "default":
+        p, root_attrs = "", f' xmlns="{NS_URI}"'
+    elif namespace == "prefixed":
+        p, root_attrs = "ns0:", f' xmlns:ns0="{NS_URI}"'
+    else:
+        p, root_attrs = "", ""
+
+    def node(name: str) -> str:
+        v = values.get(name)
+        return "" if v is None else f"<{p}{name}>{escape(v)}</{p}{name}>"
+
+    signature = ""
+    if pad_kb:
+        blob = base64.b64encode(rnd.randbytes(pad_kb * 768)).decode("ascii")
+        signature = f"<{p}CKyDTu><Signature><SignatureValue>{blob}</SignatureValue></Signature></{p}CKyDTu>"
+
+    xml = (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f"<{p}TBaoThue{root_attrs}>"
+        f"<{p}TTinTBaoThue>{node('maTBao')}{node('soTBao')}{node('ngayTBao')}</{p}TTinTBaoThue>"
+        f"<{p}NNhanTBaoThue>{node('maNNhan')}{node('tenNNhan')}{node('diaChiNNhan')}</{p}NNhanTBaoThue>"
+        f"<{p}NDungTBao>{node('maGiaoDichDTu')}"
+        f"<{p}HoSoThue><{p}CTietHoSoThue>{node('tokhai-phuluc')}{node('loaiToKhai')}{node('kyTinhThue')}{node('lanNop')}"
+        f"</{p}CTietHoSoThue></{p}HoSoThue></{p}NDungTBao>"
+        f"{signature}</{p}TBaoThue>"
+    )
+
+    namespaced = namespace != "none"
+    expected = {
+        "company_tax_id": values["maNNhan"] if namespaced else None,
+        "company_name": values["tenNNhan"] if namespaced else None,
+        "ma_tb": values["maTBao"] if namespaced else None,
+        "ky_thue": values["kyTinhThue"] if namespaced else None,
+        "form_code": form_code if (namespaced and values["tokhai-phuluc"]) else None,
+        "accepted": namespaced and ma_tb == "844",
+    }
+    return expected, xml.encode("utf-8")
+
+
+def generate_corpus(
+    n: int,
+    seed: int = 0,
+    *,
+    non_844_rate: float = 0.2,
+    missing_rate: float = 0.2,
+    namespace_mix: Sequence[str] = ("default", "default", "default", "prefixed", "none"),
+    pad_kb_choices: Sequence[int] = (0, 0, 4, 16, 64),
+) -> List[Tuple[Dict[str, Any], bytes]]:
+    """A reproducible mix of notification variants: sizes, namespaces, missing nodes, non-844 codes."""
+    rnd = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        ma_tb = rnd.choice(NON_844_CODES) if rnd.random() < non_844_rate else "844"
+        drop = rnd.sample(OPTIONAL_NODES, rnd.randrange(1, 3)) if rnd.random() < missing_rate else ()
+        corpus.append(make_notification(
+            rnd,
+            ma_tb=ma_tb,
+            namespace=rnd.choice(namespace_mix),
+            drop=drop,
+            pad_kb=rnd.choice(pad_kb_choices),
+        ))
+    return corpus
@@ -0,0 +1,105 @@
+# benchmarks/xml_parser_bench.py
+# Throughput / memory harness for bot/services/xml_parser.py.
+#
+#   python -m benchmarks.xml_parser_bench --files 2000 --workers 4 --out xml_bench.json
+import argparse
+import json
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.xml_corpus import KNOWN_CODES, FORMS, generate_corpus
+from bot.services.xml_parser import parse_submission_from_bytes, detect_form_code_from_known
+
+
+def _parse_one(data: bytes) -> bool:
+    return bool(parse_submission_from_bytes(data, known_codes=KNOWN_CODES).get("accepted"))
+
+
+def _parse_batch(batch: List[bytes]) -> int:
+    return sum(1 for data in batch if _parse_one(data))
+
+
+def bench_parse_single(files: List[bytes]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    accepted = sum(1 for data in files if _parse_one(data))
+    elapsed = time.perf_counter() - t0
+
+    # memory: separate pass, tracemalloc slows parsing down. tracemalloc only sees Python
+    # allocations (libxml2 uses its own malloc), so the process peak RSS is reported too.
+    tracemalloc.start()
+    for data in files:
+        _parse_one(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "files": len(files),
+        "accepted": accepted,
+        "seconds": round(elapsed, 4),
+        "files_per_s": round(len(files) / elapsed, 1) if elapsed else None,
+        "peak_mem_kib": round(peak / 1024, 1),
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def bench_parse_pool(files: List[bytes], workers: int, batch_size: int) -> Dict[str, Any]:
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # warm up the workers (process start + lxml import) outside the timed section
+        list(pool.map(_parse_batch, [files[:1]] * workers))
+        t0 = time.perf_counter()
+        accepted = sum(pool.map(_parse_batch, batches))
+        elapsed = time.perf_counter() - t0
+    # ru_maxrss of children is in KiB on Linux: the largest worker's peak RSS
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "files": len(files),
+        "workers": workers,
+        "accepted": accepted,
+        "seconds": round(elapsed, 4),
+        "files_per_s": round(len(files) / elapsed, 1) if elapsed else None,
+        "worker_peak_rss_kib": peak_rss,
+    }
+
+
+def bench_detect(n: int) -> Dict[str, Any]:
+    raws = [desc for _, desc in FORMS] + ["Tờ khai 01/GTGT (mẫu mới)", "05/KK-TNCN-TT80", "to khai khong ro ma"]
+    t0 = time.perf_counter()
+    hits = 0
+    for i in range(n):
+        if detect_form_code_from_known(raws[i % len(raws)], KNOWN_CODES):
+            hits += 1
+    elapsed = time.perf_counter() - t0
+    return {"calls": n, "hits": hits, "seconds": round(elapsed, 4), "calls_per_s": round(n / elapsed, 1) if elapsed else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="XML parser throughput benchmark")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--detect-calls", type=int, default=20000)
+    parser.add_argument("--out", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.files, args.seed)
+    files = [data for _, data in corpus]
+    results = {
+        "corpus": {"files": len(files), "total_kib": round(sum(map(len, files)) / 1024, 1), "seed": args.seed},
+        "parse_single": bench_parse_single(files),
+        "parse_pool": bench_parse_pool(files, args.workers, args.batch_size),
+        "detect_form_code": bench_detect(args.detect_calls),
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,19 @@
 # bot/commands/admin.py
 from telegram import Update, MessageEntity
-from telegram.ext import ContextTypes, CommandHandler, Application
-from bot.db.database import get_conn
-from typing import List, Dict
+from telegram.ext import ContextTypes, ChatMemberHandler, CommandHandler, MessageHandler, Application, filters
+from psycopg2.extras import execute_values
+from bot.db import queries
+from bot.db.database import get_conn, get_read_conn
 
 import asyncio
+import math
 from datetime import datetime
 
-from bot.services.reminder_service import _insert_reminder_sent  # updated signature
+from bot.services import admin_cache, bulk_import, export, outbox, reminder_service
 
 async def _is_chat_admin(bot, chat_id: int, user_id: int) -> bool:
-    try:
-        member = await bot.get_chat_member(chat_id, user_id)
-        return member.status in ("administrator", "creator")
-    except Exception:
-        return False
+    # cached per chat (ADMIN_CACHE_TTL), refreshed on chat member updates
+    return await admin_cache.is_chat_admin(bot, chat_id, user_id)
 
 async def add_company(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
@@ -33,17 +32,14 @@ async def add_company(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group này chưa được đăng ký làm team. Owner cần /register_team trước.")
             return
         team_id = t[0]
         # upsert company by unique company_tax_id
-        cur.execute(
-            "INSERT INTO companies(company_tax_id, company_name, team_id) VALUES (%s, %s, %s) ON CONFLICT (company_tax_id) DO UPDATE SET company_name = EXCLUDED.company_name, team_id = EXCLUDED.team_id",
-            (tax, name, team_id),
-        )
+        queries.execute(cur, queries.UPSERT_COMPANY, (tax, name, team_id))
         conn.commit()
         await update.message.reply_text(f"Đã thêm/gán công ty {tax} vào team.")
     finally:
@@ -64,13 +60,13 @@ async def remove_company(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa được đăng ký.")
             return
         team_id = t[0]
-        cur.execute("DELETE FROM companies WHERE company_tax_id=%s AND team_id=%s", (tax, team_id))
+        queries.execute(cur, queries.DELETE_TEAM_COMPANY, (tax, team_id))
         conn.commit()
         await update.message.reply_text(f"Đã xoá công ty {tax} khỏi team.")
     finally:
@@ -85,16 +81,16 @@ async def list_companies(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Chỉ admin nhóm mới được xem danh sách công ty.")
         return
 
-    conn = get_conn()
+    conn = get_read_conn(chat.id)
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa được đăng ký làm team. Owner cần /register_team.")
             return
         team_id = t[0]
-        cur.execute("SELECT company_tax_id, company_name, owner_username, owner_telegram_id, status FROM companies WHERE team_id = %s ORDER BY company_tax_id", (team_id,))
+        queries.execute(cur, queries.TEAM_COMPANIES, (team_id,))
         rows = cur.fetchall()
         if not rows:
             await update.message.reply_text("Chưa có công ty nào trong team này.")
@@ -154,23 +150,23 @@ async def set_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT company_tax_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         if not cur.fetchone():
             await update.message.reply_text("Không tìm thấy công ty với MST đó trong DB. Hãy thêm công ty trước bằng /add_company hoặc upload XML.")
             return
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa được đăng ký làm team.")
             return
         team_id = t[0]
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         row = cur.fetchone()
         if row and row[0] is not None and row[0] != team_id:
             await update.message.reply_text("Công ty này không thuộc team hiện tại. Chỉ admin team chủ quản có thể gán owner.")
             return
 
-        cur.execute("UPDATE companies SET owner_telegram_id = %s, owner_username = %s WHERE company_tax_id = %s", (str(owner_id), owner_username, mst))
+        queries.execute(cur, queries.SET_COMPANY_OWNER, (str(owner_id), owner_username, mst))
         conn.commit()
         await update.message.reply_text(f"Đã gán {owner_username} (id:{owner_id}) làm người phụ trách cho {mst}.")
     finally:
@@ -192,13 +188,13 @@ async def clear_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa được đăng ký.")
             return
         team_id = t[0]
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         row = cur.fetchone()
         if not row:
             await update.message.reply_text("Không tìm thấy công ty.")
@@ -206,7 +202,7 @@ async def clear_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if row[0] != team_id:
             await update.message.reply_text("Công ty này không thuộc team hiện tại.")
             return
-        cur.execute("UPDATE companies SET owner_telegram_id = NULL, owner_username = NULL WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.SET_COMPANY_OWNER, (None, None, mst))
         conn.commit()
         await update.message.reply_text(f"Đã xoá người phụ trách cho {mst}.")
     finally:
@@ -229,12 +225,12 @@ async def edit_company_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         row = cur.fetchone()
         if not row:
             await update.message.reply_text("Không tìm thấy công ty.")
             return
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa đăng ký.")
@@ -243,7 +239,7 @@ async def edit_company_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if row[0] != team_id:
             await update.message.reply_text("Công ty này không thuộc team hiện tại.")
             return
-        cur.execute("UPDATE companies SET company_name = %s WHERE company_tax_id = %s", (newname, mst))
+        queries.execute(cur, queries.SET_COMPANY_NAME, (newname, mst))
         conn.commit()
         await update.message.reply_text(f"Đã cập nhật tên công ty {mst} -> {newname}.")
     finally:
@@ -260,8 +256,7 @@ def _ensure_forms_exist():
             ("TT200", "Thông tư 200"),
             ("03/TNDN", "TNDN")
         ]
-        for code, name in common:
-            cur.execute("INSERT INTO forms(form_code, display_name) VALUES (%s, %s) ON CONFLICT (form_code) DO NOTHING", (code, name))
+        execute_values(cur, "INSERT INTO forms(form_code, display_name) VALUES %s ON CONFLICT (form_code) DO NOTHING", common)
         conn.commit()
     finally:
         conn.close()
@@ -275,22 +270,16 @@ async def list_requirements(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Chỉ admin nhóm mới được xem danh sách yêu cầu.")
         return
 
-    conn = get_conn()
+    conn = get_read_conn(chat.id)
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa được đăng ký làm team.")
             return
         team_id = t[0]
-        cur.execute("""
-            SELECT r.id, r.company_tax_id, r.form_code, r.period
-            FROM requirements r
-            JOIN companies c ON c.company_tax_id = r.company_tax_id
-            WHERE c.team_id = %s
-            ORDER BY r.company_tax_id, r.form_code
-        """, (team_id,))
+        queries.execute(cur, queries.TEAM_REQUIREMENTS, (team_id,))
         rows = cur.fetchall()
         if not rows:
             await update.message.reply_text("Chưa có requirement nào trong team này.")
@@ -330,14 +319,14 @@ async def add_requirement(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa đăng ký làm team.")
             return
         team_id = t[0]
 
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         row = cur.fetchone()
         if not row:
             await update.message.reply_text("Không tìm thấy công ty trong DB. Thêm công ty trước.")
@@ -346,9 +335,9 @@ async def add_requirement(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Công ty không thuộc team này. Không được phép thêm.")
             return
 
-        cur.execute("INSERT INTO forms(form_code, display_name) VALUES (%s, %s) ON CONFLICT (form_code) DO NOTHING", (form_code, form_code))
+        queries.execute(cur, queries.ENSURE_FORM, (form_code, form_code))
         try:
-            cur.execute("INSERT INTO requirements(company_tax_id, form_code, period) VALUES (%s, %s, %s)", (mst, form_code, period))
+            queries.execute(cur, queries.INSERT_REQUIREMENT, (mst, form_code, period))
             conn.commit()
             await update.message.reply_text(f"Đã thêm requirement: {mst} — {form_code} — {period}")
         except Exception as e:
@@ -375,21 +364,21 @@ async def remove_requirement(update: Update, context: ContextTypes.DEFAULT_TYPE)
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa đăng ký.")
             return
         team_id = t[0]
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         row = cur.fetchone()
         if not row or row[0] != team_id:
             await update.message.reply_text("Công ty không thuộc team này hoặc không tồn tại.")
             return
         if period:
-            cur.execute("DELETE FROM requirements WHERE company_tax_id = %s AND form_code = %s AND period = %s", (mst, form_code, period))
+            queries.execute(cur, queries.DELETE_REQUIREMENT, (mst, form_code, period))
         else:
-            cur.execute("DELETE FROM requirements WHERE company_tax_id = %s AND form_code = %s", (mst, form_code))
+            queries.execute(cur, queries.DELETE_REQUIREMENT_ALL_PERIODS, (mst, form_code))
         conn.commit()
         await update.message.reply_text("Đã xoá requirement (nếu tồn tại).")
     finally:
@@ -415,26 +404,18 @@ async def quick_add_reqs(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     _ensure_forms_exist()
 
-    to_add = []
-    if period == "monthly":
-        to_add += [("01/GTGT", "monthly"), ("05/KK-TNCN", "monthly")]
-        to_add += [("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")]
-    elif period == "quarterly":
-        to_add += [("01/GTGT", "quarterly"), ("05/KK-TNCN", "quarterly")]
-        to_add += [("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")]
-    else:
-        to_add += [("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")]
+    to_add = bulk_import.PROFILE_REQUIREMENTS[period]
 
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id,))
         t = cur.fetchone()
         if not t:
             await update.message.reply_text("Group chưa đăng ký.")
             return
         team_id = t[0]
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (mst,))
+        queries.execute(cur, queries.COMPANY_TEAM, (mst,))
         row = cur.fetchone()
         if not row:
             await update.message.reply_text("Không tìm thấy công ty. Thêm công ty trước.")
@@ -443,16 +424,16 @@ async def quick_add_reqs(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Công ty không thuộc team này.")
             return
 
-        added = []
-        skipped = []
-        for form_code, p in to_add:
-            cur.execute("INSERT INTO forms(form_code, display_name) VALUES (%s, %s) ON CONFLICT (form_code) DO NOTHING", (form_code, form_code))
-            cur.execute("SELECT 1 FROM requirements WHERE company_tax_id = %s AND form_code = %s AND period = %s", (mst, form_code, p))
-            if cur.fetchone():
-                skipped.append((form_code, p))
-            else:
-                cur.execute("INSERT INTO requirements(company_tax_id, form_code, period) VALUES (%s, %s, %s)", (mst, form_code, p))
-                added.append((form_code, p))
+        # the profile's forms are all in _ensure_forms_exist; one insert, existing rows are skipped
+        inserted = set(execute_values(
+            cur,
+            """INSERT INTO requirements(company_tax_id, form_code, period) VALUES %s
+               ON CONFLICT (company_tax_id, form_code, period) DO NOTHING RETURNING form_code, period""",
+            [(mst, form_code, p) for form_code, p in to_add],
+            fetch=True,
+        ))
+        added = [fp for fp in to_add if fp in inserted]
+        skipped = [fp for fp in to_add if fp not in inserted]
         conn.commit()
         resp_lines = []
         if added:
@@ -466,11 +447,92 @@ async def quick_add_reqs(update: Update, context: ContextTypes.DEFAULT_TYPE):
         conn.close()
 
 
+# ========================
+# Bulk import (CSV/XLSX)
+# ========================
+
+async def import_sheet(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Document with caption "/import [preview]": load companies/owners/requirements from a sheet."""
+    msg = update.message
+    chat = update.effective_chat
+    user = update.effective_user
+    if not await _is_chat_admin(context.bot, chat.id, user.id):
+        await msg.reply_text("Chỉ admin nhóm mới dùng lệnh này.")
+        return
+    doc = msg.document
+    if doc.file_size and doc.file_size > 5 * 1024 * 1024:
+        await msg.reply_text("File quá lớn (tối đa 5MB).")
+        return
+    dry_run = "preview" in (msg.caption or "").lower().split()[1:]
+
+    f = await doc.get_file()
+    data = bytes(await f.download_as_bytearray())
+    try:
+        rows = await asyncio.to_thread(bulk_import.read_rows, doc.file_name, data)
+        result = await asyncio.to_thread(bulk_import.apply_import, chat.id, rows, dry_run)
+    except ValueError as e:
+        await msg.reply_text(f"Không import được: {e}")
+        return
+    except Exception as e:
+        print("import error:", e)
+        await msg.reply_text("Có lỗi khi import, không có dữ liệu nào được ghi. Kiểm tra logs.")
+        return
+    await msg.reply_text(bulk_import.format_summary(result))
+
+
+async def export_team(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export [csv|xlsx]: companies, requirements, latest submissions and outstanding items as a file."""
+    chat = update.effective_chat
+    user = update.effective_user
+    if not await _is_chat_admin(context.bot, chat.id, user.id):
+        await update.message.reply_text("Chỉ admin nhóm mới dùng lệnh này.")
+        return
+    fmt = (context.args[0].lower() if context.args else "csv").lstrip(".")
+    if fmt not in ("csv", "xlsx"):
+        await update.message.reply_text("Cú pháp: /export [csv|xlsx]")
+        return
+    try:
+        f, stats = await asyncio.to_thread(export.export_team, chat.id, fmt)
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+        return
+    try:
+        await update.message.reply_document(
+            document=f,
+            filename=export.export_filename(fmt),
+            caption=f"{stats['companies']} công ty, {stats['requirements']} requirement, {stats['outstanding']} chưa nộp kỳ hiện tại.",
+        )
+    finally:
+        f.close()
+
+
 # ========================
 # Force Remind
 # ========================
 
+async def _dispatch_forced(bot, chat_id: int, run_key: str, interval: float):
+    """Background part of /force_remind: paced dispatch of the run, then a summary in the group."""
+    try:
+        counts = await outbox.dispatch(bot, run_key, min_interval=interval)
+    except Exception as e:
+        print("force_remind dispatch error:", run_key, e)
+        return
+    text = f"✅ /force_remind xong: đã gửi {counts['sent']}/{counts['claimed']} tin."
+    if counts["failed"]:
+        text += f" {counts['failed']} tin gửi lỗi."
+    try:
+        await bot.send_message(chat_id=chat_id, text=text)
+    except Exception as e:
+        print("force_remind summary error:", run_key, e)
+
+
 async def force_remind(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /force_remind [preview] [all]: send the team's reminders now, through the daily engine
+    (deadlines, thresholds, submissions) and the outbox, paced by FORCE_REMIND_INTERVAL.
+    preview: only report what would be sent. all: every deadline not yet passed, not just
+    those within the reminder threshold.
+    """
     chat = update.effective_chat
     user = update.effective_user
     bot = context.bot
@@ -478,96 +540,66 @@ async def force_remind(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await _is_chat_admin(bot, chat.id, user.id):
         await update.message.reply_text("Chỉ admin nhóm mới được dùng lệnh này.")
         return
+    args = [a.lower() for a in context.args or []]
+    if set(args) - {"preview", "all"}:
+        await update.message.reply_text("Cú pháp: /force_remind [preview] [all]")
+        return
+    preview = "preview" in args
+    window = "all" not in args
 
-    conn = get_conn()
+    conn = get_read_conn(chat.id)
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id, name FROM teams WHERE group_chat_id = %s", (chat.id,))
+        queries.execute(cur, queries.TEAM_WITH_NAME_BY_CHAT, (chat.id,))
         t = cur.fetchone()
-        if not t:
-            await update.message.reply_text("Group này chưa được đăng ký làm team.")
+    finally:
+        conn.close()
+    if not t:
+        await update.message.reply_text("Group này chưa được đăng ký làm team.")
+        return
+    team_id, team_name = t
+
+    if not preview:
+        left = await asyncio.to_thread(outbox.cooldown_left, reminder_service.force_run_prefix(team_id),
+                                       reminder_service.force_remind_cooldown_minutes())
+        if left > 0:
+            await update.message.reply_text(
+                f"⏳ Team vừa chạy /force_remind, thử lại sau {math.ceil(left / 60)} phút "
+                "(dùng /force_remind preview để xem trước)."
+            )
             return
-        team_id, team_name = t
 
-        cur.execute("SELECT company_tax_id, company_name, owner_telegram_id FROM companies WHERE team_id = %s", (team_id,))
-        comps = cur.fetchall()
-        if not comps:
-            await update.message.reply_text("Team hiện chưa có công ty nào.")
-            return
-        company_ids = [c[0] for c in comps]
-
-        # fetch requirements for these companies
-        placeholders = ",".join(["%s"] * len(company_ids))
-        cur.execute(f"SELECT id, company_tax_id, form_code, period FROM requirements WHERE company_tax_id IN ({placeholders})", tuple(company_ids))
-        reqs = cur.fetchall()
-        if not reqs:
-            await update.message.reply_text("Chưa có requirement nào để gửi reminder (team này).")
-            return
+    now = datetime.now(reminder_service.TIMEZONE)
+    summary = await asyncio.to_thread(reminder_service.prepare_forced_run, team_id, now, window, not preview)
+    if not summary["messages"]:
+        hint = "" if not window else " Dùng /force_remind all để nhắc mọi tờ khai chưa đến hạn."
+        await update.message.reply_text(f"Không có tờ khai nào cần nhắc (đã nộp hoặc chưa đến kỳ nhắc).{hint}")
+        return
 
-        owner_map: Dict[str, List[tuple]] = {}
-        group_items: List[tuple] = []
-
-        for rid, cid, form_code, period in reqs:
-            cur.execute("SELECT company_name, owner_telegram_id FROM companies WHERE company_tax_id = %s", (cid,))
-            cr = cur.fetchone()
-            comp_name = cr[0] if cr and cr[0] else cid
-            owner_id = cr[1] if cr and len(cr) > 1 else None
-            text = f"• {comp_name} ({cid}) — {form_code} — kỳ {period}"
-            remind_for_date = datetime.now().date().isoformat()
-            if owner_id:
-                owner_map.setdefault(str(owner_id), []).append((rid, text, remind_for_date))
-            else:
-                group_items.append((rid, text, remind_for_date))
-
-        sent_count = 0
-
-        for owner_id, items in owner_map.items():
-            lines = [f"🔔 (Thử) Nhắc nộp — {datetime.now().date().isoformat()}"]
-            for rid, text, dl in items:
-                lines.append(text)
-            msg_text = "\n".join(lines)
-            try:
-                await bot.send_message(chat_id=chat.id, text=f"<a href=\"tg://user?id={owner_id}\">Người phụ trách</a>\n{msg_text}", parse_mode="HTML")
-            except Exception:
-                try:
-                    await bot.send_message(chat_id=chat.id, text=msg_text)
-                except Exception:
-                    pass
-            for rid, text, dl in items:
-                await asyncio.to_thread(_insert_reminder_sent, rid, dl, "forced", "force_remind test")
-                sent_count += 1
-
-        if group_items:
-            lines = [f"🔔 (Thử) Danh sách tờ khai (không owner) — {datetime.now().date().isoformat()}"]
-            lines += [t for (_, t, _) in group_items]
-            CHUNK = 12
-            chunk = []
-            for ln in lines:
-                chunk.append(ln)
-                if len(chunk) >= CHUNK:
-                    try:
-                        await bot.send_message(chat_id=chat.id, text="\n".join(chunk))
-                    except Exception:
-                        pass
-                    chunk = []
-            if chunk:
-                try:
-                    await bot.send_message(chat_id=chat.id, text="\n".join(chunk))
-                except Exception:
-                    pass
-            for rid, text, dl in group_items:
-                await asyncio.to_thread(_insert_reminder_sent, rid, dl, "forced", "force_remind test")
-                sent_count += 1
-
-        await update.message.reply_text(f"Đã gửi thử {sent_count} thông báo (mode=forced).")
-    finally:
-        conn.close()
+    interval = reminder_service.force_remind_interval()
+    eta = math.ceil((summary["messages"] - 1) * interval / 60)
+    lines = [
+        f"{summary['items']} tờ khai của {summary['companies']} công ty",
+        f"{summary['messages']} tin: {summary['owner_messages']} tin cho người phụ trách, {summary['group_messages']} tin chung",
+        f"gửi cách nhau {interval:g} giây, khoảng {eta} phút",
+    ]
+    if preview:
+        await update.message.reply_text(f"👀 Xem trước /force_remind{' all' if not window else ''} ({team_name}):\n"
+                                        + "\n".join(f"• {ln}" for ln in lines))
+        return
+    if not summary["enqueued"]:
+        await update.message.reply_text("⏳ Đang có một lượt /force_remind khác, thử lại sau.")
+        return
+    await update.message.reply_text("🔔 Đã xếp hàng gửi nhắc (mode=forced):\n" + "\n".join(f"• {ln}" for ln in lines))
+    # sent in the background: a long paced run must not hold this group's update queue
+    context.application.create_task(_dispatch_forced(bot, chat.id, summary["run_key"], interval))
 
 # ========================
 # End Force Remind
 # ========================
 
 def register_admin_handlers(app: Application):
+    app.add_handler(ChatMemberHandler(admin_cache.on_chat_member, ChatMemberHandler.ANY_CHAT_MEMBER))
     app.add_handler(CommandHandler("add_company", add_company))
     app.add_handler(CommandHandler("remove_company", remove_company))
     app.add_handler(CommandHandler("list_companies", list_companies))
@@ -579,3 +611,6 @@ def register_admin_handlers(app: Application):
     app.add_handler(CommandHandler("remove_requirement", remove_requirement))
     app.add_handler(CommandHandler("quick_add", quick_add_reqs))
     app.add_handler(CommandHandler("force_remind", force_remind))
+    app.add_handler(CommandHandler("export", export_team))
+    # must be registered before the public XML document handler (same group, first match wins)
+    app.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?(\s|$)"), import_sheet))
@@ -2,7 +2,8 @@
 import os
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler, Application
-from bot.db.database import get_conn
+from bot.db import queries
+from bot.db.database import get_conn, get_pool, get_read_conn, mark_chat_write
 from typing import List
 
 def get_owner_ids():
@@ -84,7 +85,7 @@ async def list_all_teams(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_owner(uid):
         await update.message.reply_text("Chỉ Owner mới xem được.")
         return
-    conn = get_conn()
+    conn = get_read_conn()
     try:
         rows = _list_teams(conn)
         if not rows:
@@ -124,11 +125,23 @@ async def assign_company(update: Update, context: ContextTypes.DEFAULT_TYPE):
         cur.execute("INSERT INTO companies(company_tax_id, company_name, team_id) VALUES (%s, %s, %s) ON CONFLICT (company_tax_id) DO UPDATE SET team_id = EXCLUDED.team_id", (tax, tax, team_id))
         cur.execute("UPDATE companies SET team_id = %s WHERE company_tax_id = %s", (team_id, tax))
         conn.commit()
+        # the target group is not the chat of this command
+        mark_chat_write(team_chat_id_int)
         await update.message.reply_text(f"Đã gán MST {tax} vào team {team_chat_id_int}.")
     finally:
         conn.close()
 
-from bot.services.reminder_service import send_daily_reminders
+import asyncio
+from datetime import datetime
+
+from bot.services.reminder_service import send_daily_reminders, dry_run_daily, dry_run_hourly, manual_run_key, TIMEZONE, THRESHOLDS
+from bot.services.profiling import profile_call, format_report, DEFAULT_TOP_N
+from bot.services.simulation import simulate, format_summary
+from bot.services import backup as backup_service
+from bot.services import deadline_rules
+from bot.services import holiday_service
+from bot.services import outbox
+from bot.services.update_processor import ChatOrderedUpdateProcessor, format_stats
 
 async def test_daily(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
@@ -136,10 +149,239 @@ async def test_daily(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Bạn không phải Owner.")
         return
 
-    # run reminder immediately
-    await send_daily_reminders(context.application)
+    # a run of its own: the scheduled daily:<date> run is neither resumed nor blocked by it
+    run_key = manual_run_key(datetime.now(TIMEZONE))
+    counts = await send_daily_reminders(context.application, run_key=run_key)
+
+    await update.message.reply_text(
+        f"Đã chạy send_daily_reminders() xong ({run_key}): {counts['enqueued']} tin mới vào outbox, "
+        f"đã gửi {counts['sent']}, lỗi {counts['failed']}."
+    )
+
+def _parse_profile_args(args: List[str]):
+    """[YYYY-MM-DD] [top_n] in any order; returns (date|None, top_n)."""
+    ref = None
+    top_n = DEFAULT_TOP_N
+    for a in args:
+        if a.isdigit():
+            top_n = max(1, min(int(a), 30))
+        else:
+            ref = datetime.strptime(a, "%Y-%m-%d").date()
+    return ref, top_n
+
+async def profile_daily(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    try:
+        ref_date, top_n = _parse_profile_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text("Cú pháp: /profile_daily [YYYY-MM-DD] [top_n]")
+        return
+
+    await update.message.reply_text("Đang profile daily (dry-run, không gửi tin)...")
+    report = await asyncio.to_thread(profile_call, dry_run_daily, ref_date, top_n=top_n)
+    await update.message.reply_text(format_report("Profile daily (dry-run)", report), parse_mode="HTML")
 
-    await update.message.reply_text("Đã chạy send_daily_reminders() xong.")
+async def profile_hourly(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    try:
+        ref_date, top_n = _parse_profile_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text("Cú pháp: /profile_hourly [YYYY-MM-DD] [top_n]")
+        return
+    now = datetime.now(TIMEZONE)
+    if ref_date is not None:
+        # same wall-clock time on the requested day
+        now = TIMEZONE.localize(datetime.combine(ref_date, now.time().replace(tzinfo=None)))
+
+    await update.message.reply_text("Đang profile hourly (dry-run, không gửi tin)...")
+    report = await asyncio.to_thread(profile_call, dry_run_hourly, now, top_n=top_n)
+    await update.message.reply_text(format_report("Profile hourly (dry-run)", report), parse_mode="HTML")
+
+async def simulate_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    args = context.args or []
+    try:
+        start = datetime.strptime(args[0], "%Y-%m-%d").date()
+        end = datetime.strptime(args[1], "%Y-%m-%d").date()
+    except (IndexError, ValueError):
+        await update.message.reply_text("Cú pháp: /simulate <YYYY-MM-DD> <YYYY-MM-DD>")
+        return
+    if end < start or (end - start).days > 366:
+        await update.message.reply_text("Khoảng ngày không hợp lệ (tối đa 1 năm).")
+        return
+
+    report = await asyncio.to_thread(simulate, start, end)
+    await update.message.reply_text(format_summary(report))
+
+async def backup_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    args = context.args or []
+    incremental = bool(args) and args[0].lower() in ("incr", "incremental")
+
+    await update.message.reply_text("Đang backup " + ("incremental" if incremental else "full") + "...")
+    try:
+        manifest = await asyncio.to_thread(backup_service.export_backup, incremental)
+    except Exception as e:
+        await update.message.reply_text(f"Backup thất bại: {e}")
+        return
+    await update.message.reply_text(backup_service.format_summary(manifest))
+
+async def list_deadline_rules(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    rules = await asyncio.to_thread(deadline_rules.get_rules)
+    await update.message.reply_text(deadline_rules.format_rules(rules, THRESHOLDS))
+
+async def set_deadline_rule(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    try:
+        rule = deadline_rules.parse_rule(context.args or [])
+    except ValueError as e:
+        await update.message.reply_text(
+            f"Lỗi: {e}\nCú pháp: /set_deadline_rule <form_code|*> <monthly|quarterly|yearly> <số tháng sau kỳ> <ngày|last> [roll|noroll] [số ngày nhắc trước]\n"
+            "Ví dụ: /set_deadline_rule 01/GTGT monthly 1 20 roll 3"
+        )
+        return
+    await asyncio.to_thread(deadline_rules.save_rule, rule)
+    rules = await asyncio.to_thread(deadline_rules.get_rules)
+    await update.message.reply_text("Đã lưu quy tắc.\n\n" + deadline_rules.format_rules(rules, THRESHOLDS))
+
+async def del_deadline_rule(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    args = context.args or []
+    if len(args) != 2:
+        await update.message.reply_text("Cú pháp: /del_deadline_rule <form_code|*> <monthly|quarterly|yearly>")
+        return
+    deleted = await asyncio.to_thread(deadline_rules.delete_rule, args[0], args[1].lower())
+    if not deleted:
+        await update.message.reply_text("Không có quy tắc tùy chỉnh nào khớp (quy tắc mặc định không xóa được).")
+        return
+    await update.message.reply_text("Đã xóa quy tắc tùy chỉnh, áp dụng lại quy tắc mặc định.")
+
+async def import_holidays(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    # first line: /import_holidays [YYYY]; following lines: one date or date range per line
+    first, _, body = (update.message.text or "").partition("\n")
+    parts = first.split()[1:]
+    year = None
+    if parts:
+        if not (parts[0].isdigit() and len(parts[0]) == 4):
+            await update.message.reply_text("Năm không hợp lệ. Cú pháp: /import_holidays [YYYY] rồi mỗi dòng một ngày.")
+            return
+        year = int(parts[0])
+    entries, errors = holiday_service.parse_holiday_lines(body)
+    if not entries:
+        await update.message.reply_text(
+            "Cú pháp (mỗi dòng một ngày hoặc khoảng ngày):\n"
+            "/import_holidays 2026\n"
+            "01/01/2026 Tết Dương lịch\n"
+            "16/02/2026 - 20/02/2026 Tết Nguyên đán\n"
+            "Có năm: thay toàn bộ ngày nghỉ của năm đó."
+            + ("\n\n" + "\n".join(errors) if errors else "")
+        )
+        return
+    if errors:
+        await update.message.reply_text("Không nhập vì có dòng lỗi:\n" + "\n".join(errors))
+        return
+    if year is not None and any(d.year != year for d, _ in entries):
+        await update.message.reply_text(f"Có ngày không thuộc năm {year}.")
+        return
+    count = await asyncio.to_thread(holiday_service.import_holidays, entries, year)
+    msg = f"Đã nhập {count} ngày nghỉ lễ" + (f" (thay toàn bộ năm {year})." if year else ".")
+    await update.message.reply_text(msg)
+
+async def list_holidays(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    args = context.args or []
+    try:
+        year = int(args[0]) if args else datetime.now(TIMEZONE).year
+    except ValueError:
+        await update.message.reply_text("Cú pháp: /holidays [YYYY]")
+        return
+    rows = await asyncio.to_thread(holiday_service.list_year, year)
+    await update.message.reply_text(holiday_service.format_year(year, rows))
+
+async def clear_holidays(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    args = context.args or []
+    if len(args) != 1 or not args[0].isdigit():
+        await update.message.reply_text("Cú pháp: /clear_holidays <YYYY>")
+        return
+    deleted = await asyncio.to_thread(holiday_service.clear_year, int(args[0]))
+    await update.message.reply_text(f"Đã xóa {deleted} ngày nghỉ lễ của năm {args[0]}.")
+
+async def update_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    processor = context.application.update_processor
+    if not isinstance(processor, ChatOrderedUpdateProcessor):
+        await update.message.reply_text("Bot không chạy với ChatOrderedUpdateProcessor, không có số liệu hàng đợi.")
+        return
+    await update.message.reply_text(format_stats(processor.stats.snapshot(), processor.max_concurrent_updates))
+
+async def query_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/query_stats [reset]: timing of the registered statements (bot/db/queries.py) and pool reuse."""
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    text = queries.format_stats(queries.stats())
+    pool = get_pool()
+    if pool is not None:
+        text += f"\nPool: {pool.opened} kết nối đã mở, {pool.reused} lần dùng lại."
+    if (context.args or [""])[0].lower() == "reset":
+        queries.reset_stats()
+        text += "\nĐã reset bộ đếm."
+    await update.message.reply_text(text)
+
+async def outbox_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/outbox: state of the recent reminder runs; /outbox retry <run_key>: resend its failed messages."""
+    uid = update.effective_user.id
+    if not is_owner(uid):
+        await update.message.reply_text("Bạn không phải Owner.")
+        return
+    args = context.args or []
+    if args and args[0].lower() == "retry":
+        if len(args) != 2:
+            await update.message.reply_text("Cú pháp: /outbox retry <run_key> (vd: daily:2026-06-18)")
+            return
+        reset = await asyncio.to_thread(outbox.retry_failed, args[1])
+        counts = await outbox.dispatch(context.application.bot, args[1])
+        await update.message.reply_text(f"Gửi lại {reset} tin lỗi của {args[1]}: thành công {counts['sent']}, lỗi {counts['failed']}.")
+        return
+    runs = await asyncio.to_thread(outbox.run_summary)
+    await update.message.reply_text(outbox.format_summary(runs))
 
 def register_owner_handlers(app: Application):
     app.add_handler(CommandHandler("register_team", register_team))
@@ -147,3 +389,16 @@ def register_owner_handlers(app: Application):
     app.add_handler(CommandHandler("list_all_teams", list_all_teams))
     app.add_handler(CommandHandler("assign_company", assign_company))
     app.add_handler(CommandHandler("test_daily", test_daily))
+    app.add_handler(CommandHandler("profile_daily", profile_daily))
+    app.add_handler(CommandHandler("profile_hourly", profile_hourly))
+    app.add_handler(CommandHandler("simulate", simulate_cmd))
+    app.add_handler(CommandHandler("backup", backup_cmd))
+    app.add_handler(CommandHandler("deadline_rules", list_deadline_rules))
+    app.add_handler(CommandHandler("set_deadline_rule", set_deadline_rule))
+    app.add_handler(CommandHandler("del_deadline_rule", del_deadline_rule))
+    app.add_handler(CommandHandler("import_holidays", import_holidays))
+    app.add_handler(CommandHandler("holidays", list_holidays))
+    app.add_handler(CommandHandler("clear_holidays", clear_holidays))
+    app.add_handler(CommandHandler("update_stats", update_stats))
+    app.add_handler(CommandHandler("query_stats", query_stats))
+    app.add_handler(CommandHandler("outbox", outbox_cmd))
@@ -3,8 +3,9 @@ import traceback
 
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, Application, filters
-from bot.db.database import get_conn
-from bot.services.xml_parser import parse_submission_from_bytes
+from bot.db import queries
+from bot.db.database import get_conn, period_columns
+from bot.services.tracing import span
 
 async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Bot Remind - sẵn sàng.")
@@ -35,7 +36,7 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat.id if chat else None,))
+        queries.execute(cur, queries.TEAM_BY_CHAT, (chat.id if chat else None,))
         trow = cur.fetchone()
         if not trow:
             await msg.reply_text("Group này chưa được đăng ký làm team. Owner cần chạy /register_team trước.")
@@ -49,7 +50,7 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         cur = conn.cursor()
         try:
-            cur.execute("SELECT form_code FROM forms")
+            queries.execute(cur, queries.FORM_CODES)
             rows = cur.fetchall()
             known_codes = [r[0] for r in rows if r and r[0]]
         except Exception:
@@ -58,7 +59,10 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         conn.close()
 
     try:
-        parsed = parse_submission_from_bytes(data_bytes, known_codes=known_codes)
+        with span("parse", "xml_submission", size=len(data_bytes)):
+            # lxml is loaded on the first upload rather than at boot
+            from bot.services.xml_parser import parse_submission_from_bytes
+            parsed = parse_submission_from_bytes(data_bytes, known_codes=known_codes)
     except Exception as e:
         await msg.reply_text("Lỗi khi parse file XML.")
         print("parse error:", e)
@@ -87,29 +91,30 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     conn = get_conn()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (company_tax,))
+        queries.execute(cur, queries.COMPANY_TEAM, (company_tax,))
         prow = cur.fetchone()
         if prow:
             existing_team_id = prow[0]
             if existing_team_id is None:
-                cur.execute("UPDATE companies SET team_id = %s WHERE company_tax_id = %s", (team_id, company_tax))
+                queries.execute(cur, queries.SET_COMPANY_TEAM, (team_id, company_tax))
             elif existing_team_id != team_id:
                 await msg.reply_text("Công ty này thuộc quản lý của nhóm khác — bạn không có quyền cập nhật ở đây. Submission không được ghi nhận.")
                 return
         else:
-            cur.execute("INSERT INTO companies(company_tax_id, company_name, team_id, owner_telegram_id, owner_username) VALUES (%s, %s, %s, %s, %s)", (company_tax, company_name, team_id, sender_id, sender_username))
+            queries.execute(cur, queries.INSERT_COMPANY, (company_tax, company_name, team_id, sender_id, sender_username))
             conn.commit()
 
-        cur.execute("SELECT team_id FROM companies WHERE company_tax_id = %s", (company_tax,))
+        queries.execute(cur, queries.COMPANY_TEAM, (company_tax,))
         team_check = cur.fetchone()
         if team_check and team_check[0] == team_id:
-            cur.execute("UPDATE companies SET company_name = %s, owner_telegram_id = %s, owner_username = %s WHERE company_tax_id = %s", (company_name, sender_id, sender_username, company_tax))
-
-        cur.execute(
-            """INSERT INTO submissions(company_tax_id, company_name, form_code, form_raw, ky_thue, lan_nop, loai_to_khai,
-                                      ma_tb, so_thong_bao, ngay_thong_bao, ma_giaodich)
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-            (company_tax, company_name, form_code, form_raw, ky_thue, lan_nop, loai_to_khai, ma_tb, so_thong_bao, ngay_thong_bao, ma_giaodich),
+            queries.execute(cur, queries.UPDATE_COMPANY_FROM_SUBMISSION, (company_name, sender_id, sender_username, company_tax))
+
+        period_type, period_year, period_index, period_key = period_columns(ky_thue)
+        queries.execute(
+            cur,
+            queries.INSERT_SUBMISSION,
+            (company_tax, company_name, form_code, form_raw, ky_thue, lan_nop, loai_to_khai, ma_tb, so_thong_bao, ngay_thong_bao, ma_giaodich,
+             period_type, period_year, period_index, period_key),
         )
         conn.commit()
 
@@ -125,6 +130,8 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lines.append(f"• Mã TB: {_safe(ma_tb)}")
         lines.append(f"• Mã tờ khai (form): {_safe(form_code)}")
         lines.append(f"• Kỳ thuế: {_safe(ky_thue)}")
+        if period_key is None:
+            lines.append("  ⚠️ Không nhận dạng được kỳ thuế — hệ thống sẽ không tự đánh dấu kỳ này là đã nộp.")
         lines.append(f"• Lần nộp: {_safe(lan_nop)}")
         lines.append(f"• Loại tờ khai: {_safe(loai_to_khai)}")
         lines.append(f"• Số TB: {_safe(so_thong_bao)} — Ngày TB: {_safe(ngay_thong_bao)}")
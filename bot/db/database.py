@@ -1,23 +1,386 @@
 # bot/db/database.py
+import logging
 import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, execute_values
+
+from bot.services.tracing import current_trace, span, redact_sql
+from bot.utils import parse_ky_thue, period_key
+
+logger = logging.getLogger(__name__)
+
+# bump whenever ensure_tables() changes, so running bots migrate on their next start
+SCHEMA_VERSION = 2
+# pg_advisory_lock key serialising migrations between instances of a rolling deploy
+_MIGRATION_LOCK = 0x7461786274  # "taxbt"
+
+# append-only history tables, range-partitioned by month on this column
+PARTITIONED_TABLES = {
+    "submissions": "created_at",
+    "reminders_sent": "sent_at",
+}
+
+_HISTORY_DDL = {
+    "submissions": """
+    CREATE TABLE {name} (
+        id INTEGER NOT NULL DEFAULT nextval('submissions_id_seq'),
+        company_tax_id TEXT REFERENCES companies(company_tax_id),
+        company_name TEXT,
+        form_code TEXT,
+        form_raw TEXT,
+        ky_thue TEXT,
+        lan_nop TEXT,
+        loai_to_khai TEXT,
+        ma_tb TEXT,
+        so_thong_bao TEXT,
+        ngay_thong_bao TEXT,
+        ma_giaodich TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        period_type TEXT,
+        period_year SMALLINT,
+        period_index SMALLINT,
+        period_key INTEGER,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    """,
+    "reminders_sent": """
+    CREATE TABLE {name} (
+        id INTEGER NOT NULL DEFAULT nextval('reminders_sent_id_seq'),
+        team_id INTEGER REFERENCES teams(id),
+        requirement_id INTEGER REFERENCES requirements(id),
+        remind_for_date DATE NOT NULL,
+        mode TEXT NOT NULL,
+        sent_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        message_id TEXT,
+        chat_id BIGINT,
+        note TEXT,
+        PRIMARY KEY (id, sent_at)
+    ) PARTITION BY RANGE (sent_at);
+    """,
+}
+
+# indexes for the hot lookups; created on the parent, so every partition gets them
+_HISTORY_INDEXES = {
+    "submissions": "CREATE INDEX IF NOT EXISTS submissions_period_idx ON submissions (company_tax_id, form_code, period_key)",
+    "reminders_sent": "CREATE INDEX IF NOT EXISTS reminders_sent_lookup_idx ON reminders_sent (requirement_id, remind_for_date, mode, sent_at)",
+}
+
+
+# command tags (cursor.statusmessage) of statements that change nothing; EXECUTE of a
+# prepared statement reports the tag of the statement itself (INSERT 0 1, SELECT 3, ...)
+_READ_ONLY_TAGS = {"SELECT", "PREPARE", "SHOW", "SET", "DECLARE", "FETCH", "MOVE", "CLOSE", "BEGIN", "EXPLAIN"}
+
+
+class TracingCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that records a "sql" span per statement (text only, parameters redacted)
+    and logs statements slower than TRACE_SLOW_QUERY_MS. On a PrimaryConnection it also
+    notes whether the current transaction wrote anything.
+    """
+
+    def execute(self, query, vars=None):
+        with span("sql", redact_sql(query), params=len(vars) if vars else 0):
+            result = super().execute(query, vars)
+        self._note_write()
+        return result
+
+    def executemany(self, query, vars_list):
+        with span("sql", redact_sql(query), batch=True):
+            result = super().executemany(query, vars_list)
+        self._note_write()
+        return result
+
+    def _note_write(self):
+        conn = self.connection
+        tag = (self.statusmessage or "").split(" ", 1)[0]
+        if tag and tag not in _READ_ONLY_TAGS and isinstance(conn, PrimaryConnection):
+            conn.wrote = True
+
+
+class PrimaryConnection(psycopg2.extensions.connection):
+    """
+    Connection to the primary (pooled replica connections use it too, read-only). A commit of a
+    transaction that wrote (see TracingCursor) inside a handler marks its chat as recently
+    written; read-only transactions leave the chat on the replica. close() on a pooled
+    connection hands it back to the pool instead of disconnecting.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool: Optional["ConnectionPool"] = None  # set while checked out of a pool
+        self.pooled = False
+        # time.monotonic() when it was last handed back to the pool
+        self.idle_since = 0.0
+        # names of the bot.db.queries statements prepared on this session
+        self.prepared = set()
+        # the current transaction ran a statement that writes
+        self.wrote = False
+
+    def commit(self):
+        wrote, self.wrote = self.wrote, False
+        super().commit()
+        trace = current_trace()
+        if wrote and trace is not None and trace.chat_id is not None:
+            mark_chat_write(trace.chat_id)
+
+    def rollback(self):
+        self.wrote = False
+        super().rollback()
+
+    def close(self):
+        if not self.pooled:
+            super().close()
+            return
+        # a second close() must not touch a connection that may already be reused
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.release(self)
+
+
+class ConnectionPool:
+    """
+    Keeps up to `size` idle connections (and their prepared statements) for reuse.
+    readonly=True pools replica connections: every session is kept read-only.
+    Never blocks: when every pooled connection is busy a new one is opened and closed again
+    on release, so a handler holding a connection across an await cannot starve the others.
+    Connections idle for more than max_idle seconds are dropped instead of reused: a server or
+    proxy may have closed them meanwhile, which conn.closed does not show.
+    """
+
+    def __init__(self, dsn: str, size: int, max_idle: float = 300.0, readonly: bool = False, **connect_args):
+        self.dsn = dsn
+        self.size = size
+        self.max_idle = max_idle
+        self.readonly = readonly
+        self._connect_args = connect_args
+        self._idle: List[PrimaryConnection] = []
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def acquire(self) -> PrimaryConnection:
+        stale = []
+        conn = None
+        with self._lock:
+            horizon = time.monotonic() - self.max_idle
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.closed or candidate.idle_since < horizon:
+                    stale.append(candidate)
+                else:
+                    conn = candidate
+                    break
+            if conn is not None:
+                self.reused += 1
+        for old in stale:
+            _disconnect(old)
+        if conn is None:
+            conn = psycopg2.connect(
+                self.dsn, connection_factory=PrimaryConnection, cursor_factory=TracingCursor, **self._connect_args
+            )
+            if self.readonly:
+                conn.set_session(readonly=True)
+            with self._lock:
+                self.opened += 1
+        conn.pool = self
+        conn.pooled = True
+        return conn
+
+    def release(self, conn: PrimaryConnection):
+        try:
+            if conn.closed:
+                return
+            # conn.reset() would DISCARD ALL and drop the prepared statements
+            conn.rollback()
+            # undo set_session()/autocommit of the previous user (client-side flags, no round trip)
+            conn.set_session(
+                isolation_level="DEFAULT", readonly=True if self.readonly else "DEFAULT", deferrable="DEFAULT", autocommit=False
+            )
+            with self._lock:
+                if len(self._idle) < self.size:
+                    conn.idle_since = time.monotonic()
+                    self._idle.append(conn)
+                    return
+        except psycopg2.Error:
+            pass
+        _disconnect(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _disconnect(conn)
+
+
+def _disconnect(conn):
+    """Really close a pooled connection (PrimaryConnection.close would hand it back)."""
+    if not conn.closed:
+        psycopg2.extensions.connection.close(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> Optional[ConnectionPool]:
+    """Pool for DATABASE_URL; DB_POOL_SIZE=0 disables pooling, DB_POOL_MAX_IDLE_SECONDS bounds reuse."""
+    global _pool
+    dsn = os.getenv("DATABASE_URL")
+    size = int(os.getenv("DB_POOL_SIZE", "10"))
+    if not dsn or size <= 0:
+        return None
+    if _pool is None or _pool.dsn != dsn:
+        with _pool_lock:
+            if _pool is None or _pool.dsn != dsn:
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(dsn, size, float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")))
+    return _pool
+
+
+_replica_pool: Optional[ConnectionPool] = None
+
+
+def get_replica_pool(dsn: str) -> Optional[ConnectionPool]:
+    """Read-only pool for DATABASE_READ_URL, sized and expired like the primary pool (get_pool)."""
+    global _replica_pool
+    size = int(os.getenv("DB_POOL_SIZE", "10"))
+    if size <= 0:
+        return None
+    if _replica_pool is None or _replica_pool.dsn != dsn:
+        with _pool_lock:
+            if _replica_pool is None or _replica_pool.dsn != dsn:
+                if _replica_pool is not None:
+                    _replica_pool.close_all()
+                _replica_pool = ConnectionPool(
+                    dsn, size, float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")), readonly=True,
+                    connect_timeout=_REPLICA_CONNECT_TIMEOUT,
+                )
+    return _replica_pool
+
 
 def get_conn(DATABASE_URL: str | None = None):
     """
     Always connect to PostgreSQL using DATABASE_URL from environment.
-    No sqlite, no db_path.
+    No sqlite, no db_path. Connections for DATABASE_URL come from the pool (see get_pool);
+    an explicit DATABASE_URL (scripts, restore) always opens a dedicated connection.
     """
     if DATABASE_URL is None:
+        pool = get_pool()
+        if pool is not None:
+            return pool.acquire()
         DATABASE_URL = os.getenv("DATABASE_URL")
 
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL is not set")
 
-    conn = psycopg2.connect(DATABASE_URL)
+    conn = psycopg2.connect(DATABASE_URL, connection_factory=PrimaryConnection, cursor_factory=TracingCursor)
     return conn
 
 
+# ---------------------------------------------------------------------------
+# Read replica (DATABASE_READ_URL)
+# ---------------------------------------------------------------------------
+# Explicitly read-only work (listings, exports, reminder scans) uses get_read_conn(). It goes
+# to the primary when no replica is configured, when the replica is down or lagging more than
+# READ_REPLICA_MAX_LAG_SECONDS, and for READ_AFTER_WRITE_SECONDS after a write in the same chat
+# (a group listing its companies right after /add_company must see the new row).
+_chat_writes: dict = {}
+_replica_state = {"down_until": 0.0, "lag_checked": 0.0, "lag_ok": True}
+_replica_lock = threading.Lock()
+_REPLICA_RETRY_SECONDS = 30.0
+_REPLICA_CONNECT_TIMEOUT = 3
+_LAG_CHECK_SECONDS = 5.0
+
+_REPLICA_LAG_SQL = """
+SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+
+def read_after_write_seconds() -> float:
+    return float(os.getenv("READ_AFTER_WRITE_SECONDS", "10"))
+
+
+def replica_max_lag_seconds() -> float:
+    return float(os.getenv("READ_REPLICA_MAX_LAG_SECONDS", "30"))
+
+
+def mark_chat_write(chat_id: int):
+    now = time.monotonic()
+    with _replica_lock:
+        _chat_writes[chat_id] = now
+        if len(_chat_writes) > 1000:
+            horizon = now - read_after_write_seconds()
+            for k in [k for k, t in _chat_writes.items() if t < horizon]:
+                del _chat_writes[k]
+
+
+def _recently_written(chat_id: Optional[int]) -> bool:
+    if chat_id is None:
+        return False
+    t = _chat_writes.get(chat_id)
+    return t is not None and time.monotonic() - t < read_after_write_seconds()
+
+
+def _replica_fresh(conn) -> bool:
+    """Replication lag check, cached for _LAG_CHECK_SECONDS."""
+    now = time.monotonic()
+    if now - _replica_state["lag_checked"] < _LAG_CHECK_SECONDS:
+        return _replica_state["lag_ok"]
+    cur = conn.cursor()
+    cur.execute(_REPLICA_LAG_SQL)
+    lag = float(cur.fetchone()[0])
+    cur.close()
+    conn.rollback()
+    ok = lag <= replica_max_lag_seconds()
+    if not ok:
+        logger.warning("read replica lags %.1fs, reading from primary", lag)
+    with _replica_lock:
+        _replica_state.update(lag_checked=now, lag_ok=ok)
+    return ok
+
+
+def get_read_conn(chat_id: Optional[int] = None):
+    """
+    Connection for read-only work: the replica when DATABASE_READ_URL is set and safe to use,
+    otherwise the primary. chat_id defaults to the chat of the current handler.
+    """
+    url = os.getenv("DATABASE_READ_URL")
+    if not url or url == os.getenv("DATABASE_URL"):
+        return get_conn()
+    if chat_id is None:
+        trace = current_trace()
+        chat_id = trace.chat_id if trace is not None else None
+    if _recently_written(chat_id) or time.monotonic() < _replica_state["down_until"]:
+        return get_conn()
+    conn = None
+    try:
+        pool = get_replica_pool(url)
+        if pool is not None:
+            conn = pool.acquire()
+        else:
+            conn = psycopg2.connect(url, cursor_factory=TracingCursor, connect_timeout=_REPLICA_CONNECT_TIMEOUT)
+            conn.set_session(readonly=True)
+        if _replica_fresh(conn):
+            return conn
+    except psycopg2.Error as e:
+        logger.warning("read replica unavailable (%s), reading from primary for %.0fs", e, _REPLICA_RETRY_SECONDS)
+        with _replica_lock:
+            _replica_state["down_until"] = time.monotonic() + _REPLICA_RETRY_SECONDS
+    if conn is not None:
+        conn.close()
+    return get_conn()
+
+
 def ensure_tables(conn):
     """
     Create all tables using PostgreSQL syntax (Option A: Simple & Stable).
@@ -62,6 +425,11 @@ def ensure_tables(conn):
         note TEXT
     );
     """)
+    # one row per date (older databases may hold duplicates: keep the first)
+    cur.execute("SELECT to_regclass('holidays_date_key')")
+    if cur.fetchone()[0] is None:
+        cur.execute("DELETE FROM holidays a USING holidays b WHERE a.date = b.date AND a.id > b.id")
+        cur.execute("CREATE UNIQUE INDEX holidays_date_key ON holidays (date)")
 
     # requirements
     cur.execute("""
@@ -74,39 +442,295 @@ def ensure_tables(conn):
     );
     """)
 
-    # submissions
+    # deadline_rules: overrides of the built-in deadline rules (bot/services/deadline_rules.py)
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS submissions (
-        id SERIAL PRIMARY KEY,
-        company_tax_id TEXT REFERENCES companies(company_tax_id),
-        company_name TEXT,
-        form_code TEXT,
-        form_raw TEXT,
-        ky_thue TEXT,
-        lan_nop TEXT,
-        loai_to_khai TEXT,
-        ma_tb TEXT,
-        so_thong_bao TEXT,
-        ngay_thong_bao TEXT,
-        ma_giaodich TEXT,
-        created_at TIMESTAMP DEFAULT NOW()
+    CREATE TABLE IF NOT EXISTS deadline_rules (
+        form_code TEXT NOT NULL,
+        frequency TEXT NOT NULL,
+        offset_months INTEGER NOT NULL,
+        due_day INTEGER,
+        roll_forward BOOLEAN NOT NULL DEFAULT TRUE,
+        threshold_days INTEGER,
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (form_code, frequency)
     );
     """)
 
-    # reminders_sent
+    # history tables (submissions, reminders_sent): partitioned by month
+    converted = [table for table in PARTITIONED_TABLES if _ensure_history_table(cur, table)]
+
+    # typed tax period of submissions (parsed from ky_thue)
+    if _ensure_period_columns(cur) or "submissions" in converted:
+        backfill_period_keys(cur)
+
+    for ddl in _HISTORY_INDEXES.values():
+        cur.execute(ddl)
+
+    # reminder_outbox: rendered reminder messages of one run (daily / hourly), drained by
+    # bot/services/outbox.py; (run_key, seq) makes enqueueing a run idempotent
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS reminders_sent (
-        id SERIAL PRIMARY KEY,
-        team_id INTEGER REFERENCES teams(id),
-        requirement_id INTEGER REFERENCES requirements(id),
-        remind_for_date DATE NOT NULL,
-        mode TEXT NOT NULL,
-        sent_at TIMESTAMP DEFAULT NOW(),
-        message_id TEXT,
+    CREATE TABLE IF NOT EXISTS reminder_outbox (
+        id BIGSERIAL PRIMARY KEY,
+        run_key TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        team_id INTEGER,
         chat_id BIGINT,
-        note TEXT
+        mode TEXT NOT NULL,
+        note TEXT,
+        text TEXT NOT NULL,
+        parse_mode TEXT,
+        requirement_ids INTEGER[] NOT NULL DEFAULT '{}',
+        remind_for_dates DATE[] NOT NULL DEFAULT '{}',
+        state TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        claimed_at TIMESTAMP,
+        sent_at TIMESTAMP,
+        message_id BIGINT,
+        error TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        UNIQUE (run_key, seq)
+    );
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        applied_at TIMESTAMP DEFAULT NOW()
     );
     """)
+    cur.execute("INSERT INTO schema_version(version) VALUES (%s) ON CONFLICT (version) DO NOTHING", (SCHEMA_VERSION,))
+
+    conn.commit()
+    cur.close()
+
+    ensure_partitions(conn)
+
+
+def current_schema_version(conn) -> int:
+    """Applied schema version in one query; 0 for a database that predates schema_version."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cur.fetchone()[0]
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return 0
+    finally:
+        cur.close()
+
+
+def ensure_schema(conn) -> bool:
+    """
+    Boot-time schema check: one SELECT when the database is current, ensure_tables() only
+    when SCHEMA_VERSION is newer. Returns True when migrations ran.
+    """
+    if current_schema_version(conn) >= SCHEMA_VERSION:
+        conn.rollback()
+        return False
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s)", (_MIGRATION_LOCK,))
+    try:
+        # another instance may have migrated while we waited for the lock
+        if current_schema_version(conn) >= SCHEMA_VERSION:
+            return False
+        logger.info("migrating schema to version %s", SCHEMA_VERSION)
+        ensure_tables(conn)
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATION_LOCK,))
+        conn.commit()
+
+
+def _relkind(cur, name: str) -> Optional[str]:
+    """'r' regular table, 'p' partitioned table, None when it does not exist."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (name,))
+    r = cur.fetchone()
+    return r[0] if r else None
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 + n, 12)
+    return date(y, m + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def _create_partition(cur, table: str, month: date) -> bool:
+    """
+    Create the partition of `table` for the month starting at `month` (no-op when it exists).
+    Rows of that month already sitting in the default partition are moved into it.
+    """
+    name = partition_name(table, month)
+    if _relkind(cur, name):
+        return False
+    column = PARTITIONED_TABLES[table]
+    end = add_months(month, 1)
+    bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+    default = f"{table}_default"
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= %s AND {column} < %s)", (month, end))
+    if not cur.fetchone()[0]:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF {table} {bounds}")
+        return True
+    # Postgres refuses a new partition whose range overlaps rows in the default partition:
+    # build it standalone, move the rows, then attach
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cur.execute(
+        f"WITH moved AS (DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        (month, end),
+    )
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}")
+    return True
+
+
+def _ensure_history_table(cur, table: str):
+    """
+    Create `table` as a monthly partitioned table. A pre-existing non-partitioned table
+    (older deployments) is converted in place, keeping ids and its sequence.
+    Returns True when such a conversion happened.
+    """
+    column = PARTITIONED_TABLES[table]
+    kind = _relkind(cur, table)
+    if kind == "p":
+        return False
+
+    cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id_seq")
+    legacy = f"{table}_legacy"
+    if kind == "r":
+        logger.info("converting %s to a partitioned table", table)
+        cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cur.execute(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {legacy}_pkey")
+        # keep the sequence alive when the legacy table is dropped
+        cur.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+
+    cur.execute(_HISTORY_DDL[table].format(name=table))
+    cur.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    if kind == "r":
+        cur.execute(f"SELECT DISTINCT date_trunc('month', COALESCE({column}, NOW()))::date FROM {legacy}")
+        for (month,) in cur.fetchall():
+            _create_partition(cur, table, month)
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s",
+            (table,),
+        )
+        target = {r[0] for r in cur.fetchall()}
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+            (legacy,),
+        )
+        cols = [r[0] for r in cur.fetchall() if r[0] in target]
+        select = ", ".join(f"COALESCE({c}, NOW())" if c == column else c for c in cols)
+        cur.execute(f"INSERT INTO {table} ({', '.join(cols)}) SELECT {select} FROM {legacy}")
+        cur.execute(f"DROP TABLE {legacy}")
+        cur.execute(f"SELECT setval('{table}_id_seq', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+    return kind == "r"
+
+
+def _ensure_period_columns(cur) -> bool:
+    """Add the typed period columns to an older submissions table; True when they were missing."""
+    cur.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = 'submissions' AND column_name = 'period_key'"
+    )
+    if cur.fetchone():
+        return False
+    cur.execute("""
+    ALTER TABLE submissions
+        ADD COLUMN period_type TEXT,
+        ADD COLUMN period_year SMALLINT,
+        ADD COLUMN period_index SMALLINT,
+        ADD COLUMN period_key INTEGER;
+    """)
+    cur.execute("DROP INDEX IF EXISTS submissions_lookup_idx")
+    return True
+
+
+def period_columns(ky_thue):
+    """(period_type, period_year, period_index, period_key) for a raw ky_thue; all None when unparseable."""
+    parsed = parse_ky_thue(ky_thue)
+    if not parsed:
+        return None, None, None, None
+    return parsed + (period_key(*parsed),)
+
+
+def backfill_period_keys(cur) -> int:
+    """
+    Fill the typed period columns of rows that only have ky_thue. Parses each distinct
+    ky_thue once and updates set-wise; unparseable values stay NULL. Returns rows updated.
+    """
+    cur.execute("SELECT DISTINCT ky_thue FROM submissions WHERE period_key IS NULL AND ky_thue IS NOT NULL")
+    values = [(raw,) + period_columns(raw) for (raw,) in cur.fetchall()]
+    values = [v for v in values if v[4] is not None]
+    if not values:
+        return 0
+    execute_values(
+        cur,
+        """UPDATE submissions AS s
+              SET period_type = v.period_type, period_year = v.period_year,
+                  period_index = v.period_index, period_key = v.period_key
+             FROM (VALUES %s) AS v(ky_thue, period_type, period_year, period_index, period_key)
+            WHERE s.ky_thue = v.ky_thue AND s.period_key IS NULL""",
+        values,
+        template="(%s, %s, %s::smallint, %s::smallint, %s::integer)",
+        page_size=len(values),
+    )
+    return cur.rowcount
 
+
+def list_partitions(cur, table: str) -> List[Tuple[str, date]]:
+    """Monthly partitions of `table` as (name, month start), oldest first; the default partition is skipped."""
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+        (table,),
+    )
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+    out = []
+    for (name,) in cur.fetchall():
+        m = pattern.match(name)
+        if m:
+            out.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(out, key=lambda p: p[1])
+
+
+def ensure_partitions(conn, months_ahead: Optional[int] = None, today: Optional[date] = None) -> List[str]:
+    """
+    Create monthly partitions from the current month up to `months_ahead` months ahead
+    (PARTITION_MONTHS_AHEAD, default 3), plus one for every month that has rows stranded in
+    the default partition (restores, migrations, clock skew). Returns the created partition names.
+    """
+    if months_ahead is None:
+        months_ahead = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    if today is None:
+        from bot.services.reminder_service import TIMEZONE  # reminder_service imports this module
+
+        today = datetime.now(TIMEZONE).date()
+    current = month_start(today)
+    created = []
+    cur = conn.cursor()
+    for table, column in PARTITIONED_TABLES.items():
+        if _relkind(cur, table) != "p":
+            continue
+        months = {add_months(current, i) for i in range(months_ahead + 1)}
+        cur.execute(f"SELECT DISTINCT date_trunc('month', {column})::date FROM {table}_default")
+        months.update(r[0] for r in cur.fetchall())
+        for month in sorted(months):
+            if _create_partition(cur, table, month):
+                created.append(partition_name(table, month))
     conn.commit()
     cur.close()
+    return created
+
+
+def detach_partition(cur, table: str, partition: str):
+    """Detach a partition: it becomes a standalone table outside every query on `table`."""
+    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
@@ -0,0 +1,245 @@
+# bot/db/queries.py
+# Registry of hot SQL statements: declared once here (psycopg2 %s placeholders), prepared
+# lazily on each pooled connection (PREPARE name AS ... $1) and run with EXECUTE, so Postgres
+# parses and plans them once per session instead of once per call. Per-statement timing
+# counters are kept for /query_stats.
+#
+# Connections without a `prepared` set (read replica, plain psycopg2 connections) run the
+# same SQL as ordinary statements.
+import re
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class Query(NamedTuple):
+    name: str
+    sql: str
+    prepare_sql: str
+    execute_sql: str
+
+
+_registry: Dict[str, Query] = {}
+_stats: Dict[str, List[float]] = {}  # name -> [calls, total_ms, max_ms, prepares]
+_stats_lock = threading.Lock()
+
+
+def query(name: str, sql: str) -> str:
+    """Declare a statement; returns its name (the handle used by execute/fetchone/fetchall)."""
+    if name in _registry:
+        raise ValueError(f"duplicate query name: {name}")
+    sql = " ".join(sql.split())
+    n = 0
+
+    def numbered(_):
+        nonlocal n
+        n += 1
+        return f"${n}"
+
+    body = _PLACEHOLDER.sub(numbered, sql)
+    execute_sql = f"EXECUTE {name}" + (" (" + ", ".join(["%s"] * n) + ")" if n else "")
+    _registry[name] = Query(name, sql, f"PREPARE {name} AS {body}", execute_sql)
+    return name
+
+
+def get(name: str) -> Query:
+    return _registry[name]
+
+
+def execute(cur, name: str, params: Sequence[Any] = ()):
+    """Run a registered statement on `cur`; returns the cursor."""
+    q = _registry[name]
+    prepared = getattr(cur.connection, "prepared", None)
+    t0 = time.perf_counter()
+    prepares = 0
+    if prepared is None:
+        cur.execute(q.sql, params)
+    else:
+        if name not in prepared:
+            # PREPARE is not transactional: it survives rollbacks for the life of the session
+            cur.execute(q.prepare_sql)
+            prepared.add(name)
+            prepares = 1
+        cur.execute(q.execute_sql, params)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    with _stats_lock:
+        rec = _stats.setdefault(name, [0, 0.0, 0.0, 0])
+        rec[0] += 1
+        rec[1] += elapsed_ms
+        rec[2] = max(rec[2], elapsed_ms)
+        rec[3] += prepares
+    return cur
+
+
+def fetchone(cur, name: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+    return execute(cur, name, params).fetchone()
+
+
+def fetchall(cur, name: str, params: Sequence[Any] = ()) -> List[tuple]:
+    return execute(cur, name, params).fetchall()
+
+
+def stats() -> List[Dict[str, Any]]:
+    """Per-statement counters, most total time first."""
+    with _stats_lock:
+        items = [(name, list(rec)) for name, rec in _stats.items()]
+    out = [
+        {"name": name, "calls": int(calls), "total_ms": round(total, 2), "avg_ms": round(total / calls, 3) if calls else 0.0,
+         "max_ms": round(mx, 2), "prepares": int(prep)}
+        for name, (calls, total, mx, prep) in items
+    ]
+    return sorted(out, key=lambda r: r["total_ms"], reverse=True)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def format_stats(rows: List[Dict[str, Any]], top_n: int = 20) -> str:
+    if not rows:
+        return "Chưa có truy vấn nào được ghi nhận."
+    lines = ["📊 Thống kê truy vấn (theo tổng thời gian):"]
+    for r in rows[:top_n]:
+        lines.append(f"• {r['name']}: {r['calls']} lần, TB {r['avg_ms']} ms, max {r['max_ms']} ms, tổng {r['total_ms']} ms, prepare {r['prepares']}")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Statements
+# ---------------------------------------------------------------------------
+# teams / companies
+TEAM_BY_CHAT = query("team_by_chat", "SELECT id FROM teams WHERE group_chat_id = %s")
+TEAM_WITH_NAME_BY_CHAT = query("team_with_name_by_chat", "SELECT id, name FROM teams WHERE group_chat_id = %s")
+COMPANY_TEAM = query("company_team", "SELECT team_id FROM companies WHERE company_tax_id = %s")
+TEAM_COMPANIES = query(
+    "team_companies",
+    "SELECT company_tax_id, company_name, owner_username, owner_telegram_id, status FROM companies WHERE team_id = %s ORDER BY company_tax_id",
+)
+UPSERT_COMPANY = query(
+    "upsert_company",
+    """INSERT INTO companies(company_tax_id, company_name, team_id) VALUES (%s, %s, %s)
+       ON CONFLICT (company_tax_id) DO UPDATE SET company_name = EXCLUDED.company_name, team_id = EXCLUDED.team_id""",
+)
+INSERT_COMPANY = query(
+    "insert_company",
+    "INSERT INTO companies(company_tax_id, company_name, team_id, owner_telegram_id, owner_username) VALUES (%s, %s, %s, %s, %s)",
+)
+DELETE_TEAM_COMPANY = query("delete_team_company", "DELETE FROM companies WHERE company_tax_id = %s AND team_id = %s")
+SET_COMPANY_TEAM = query("set_company_team", "UPDATE companies SET team_id = %s WHERE company_tax_id = %s")
+SET_COMPANY_OWNER = query("set_company_owner", "UPDATE companies SET owner_telegram_id = %s, owner_username = %s WHERE company_tax_id = %s")
+SET_COMPANY_NAME = query("set_company_name", "UPDATE companies SET company_name = %s WHERE company_tax_id = %s")
+UPDATE_COMPANY_FROM_SUBMISSION = query(
+    "update_company_from_submission",
+    "UPDATE companies SET company_name = %s, owner_telegram_id = %s, owner_username = %s WHERE company_tax_id = %s",
+)
+
+# forms / requirements
+FORM_CODES = query("form_codes", "SELECT form_code FROM forms")
+ENSURE_FORM = query("ensure_form", "INSERT INTO forms(form_code, display_name) VALUES (%s, %s) ON CONFLICT (form_code) DO NOTHING")
+TEAM_REQUIREMENTS = query(
+    "team_requirements",
+    """SELECT r.id, r.company_tax_id, r.form_code, r.period
+       FROM requirements r
+       JOIN companies c ON c.company_tax_id = r.company_tax_id
+       WHERE c.team_id = %s
+       ORDER BY r.company_tax_id, r.form_code""",
+)
+INSERT_REQUIREMENT = query("insert_requirement", "INSERT INTO requirements(company_tax_id, form_code, period) VALUES (%s, %s, %s)")
+DELETE_REQUIREMENT = query("delete_requirement", "DELETE FROM requirements WHERE company_tax_id = %s AND form_code = %s AND period = %s")
+DELETE_REQUIREMENT_ALL_PERIODS = query("delete_requirement_all_periods", "DELETE FROM requirements WHERE company_tax_id = %s AND form_code = %s")
+
+# submissions
+INSERT_SUBMISSION = query(
+    "insert_submission",
+    """INSERT INTO submissions(company_tax_id, company_name, form_code, form_raw, ky_thue, lan_nop, loai_to_khai,
+                               ma_tb, so_thong_bao, ngay_thong_bao, ma_giaodich,
+                               period_type, period_year, period_index, period_key)
+       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+)
+SUBMITTED_KEYS = query(
+    "submitted_keys",
+    "SELECT company_tax_id, form_code, period_key FROM submissions WHERE company_tax_id = ANY(%s) AND period_key = ANY(%s) AND created_at >= %s",
+)
+
+# reminder scan / reminders_sent
+SCAN_TEAMS = query("scan_teams", "SELECT id, group_chat_id, name FROM teams WHERE group_chat_id IS NOT NULL ORDER BY id")
+SCAN_REQUIREMENTS = query(
+    "scan_requirements",
+    """SELECT c.team_id, r.id, r.company_tax_id, r.form_code, r.period, c.company_name, c.owner_telegram_id
+       FROM requirements r
+       JOIN companies c ON c.company_tax_id = r.company_tax_id
+       JOIN teams t ON t.id = c.team_id
+       WHERE t.group_chat_id IS NOT NULL
+       ORDER BY c.team_id, r.id""",
+)
+# the same scan for one team (/force_remind)
+SCAN_TEAM = query("scan_team", "SELECT id, group_chat_id, name FROM teams WHERE id = %s AND group_chat_id IS NOT NULL")
+SCAN_TEAM_REQUIREMENTS = query(
+    "scan_team_requirements",
+    """SELECT c.team_id, r.id, r.company_tax_id, r.form_code, r.period, c.company_name, c.owner_telegram_id
+       FROM requirements r
+       JOIN companies c ON c.company_tax_id = r.company_tax_id
+       WHERE c.team_id = %s
+       ORDER BY r.id""",
+)
+# latest hourly reminder per (requirement, deadline) for every candidate of an hourly run;
+# only the last hour matters, the sent_at bound keeps the scan on the newest partitions
+LAST_HOURLY_SENT = query(
+    "last_hourly_sent",
+    """SELECT DISTINCT ON (requirement_id, remind_for_date) requirement_id, remind_for_date, sent_at
+       FROM reminders_sent
+       WHERE requirement_id = ANY(%s) AND mode = 'hourly' AND sent_at >= NOW() - INTERVAL '2 days'
+       ORDER BY requirement_id, remind_for_date, sent_at DESC""",
+)
+
+# reminder outbox (bot/services/outbox.py)
+OUTBOX_RUN_EXISTS = query("outbox_run_exists", "SELECT 1 FROM reminder_outbox WHERE run_key = %s LIMIT 1")
+# pending rows, plus rows whose sender died before recording the outcome (claim older than the
+# lease) while they have claims left (attempts < OUTBOX_MAX_ATTEMPTS). Expired rows without claims
+# left (the send keeps killing the worker) are marked failed in the same statement; both sets are
+# disjoint, so the two updates never touch the same row.
+OUTBOX_CLAIM = query(
+    "outbox_claim",
+    """WITH params AS (
+           SELECT %s::text AS run_key, NOW() - make_interval(secs => %s) AS expired_before, %s::int AS max_attempts
+       ), exhausted AS (
+           UPDATE reminder_outbox o SET state = 'failed', error = 'lease expired on every attempt'
+           FROM params p
+           WHERE o.run_key = p.run_key AND o.state = 'sending'
+             AND o.claimed_at < p.expired_before AND o.attempts >= p.max_attempts
+       )
+       UPDATE reminder_outbox SET state = 'sending', claimed_at = NOW(), attempts = attempts + 1
+       WHERE id IN (
+           SELECT o.id FROM reminder_outbox o, params p
+           WHERE o.run_key = p.run_key
+             AND (o.state = 'pending'
+                  OR (o.state = 'sending' AND o.claimed_at < p.expired_before AND o.attempts < p.max_attempts))
+           ORDER BY o.seq LIMIT %s
+           FOR UPDATE OF o SKIP LOCKED)
+       RETURNING id, seq, chat_id, text, parse_mode""",
+)
+# reminders_sent rows for outbox rows just marked sent; requirements deleted since the run was
+# enqueued are skipped instead of failing the batch on the foreign key
+OUTBOX_RECORD_SENT = query(
+    "outbox_record_sent",
+    """INSERT INTO reminders_sent(team_id, requirement_id, remind_for_date, mode, sent_at, message_id, chat_id, note)
+       SELECT t.id, r.requirement_id, r.remind_for_date, o.mode, NOW(), o.message_id::text, o.chat_id, o.note
+       FROM reminder_outbox o
+       CROSS JOIN LATERAL unnest(o.requirement_ids, o.remind_for_dates) AS r(requirement_id, remind_for_date)
+       JOIN requirements q ON q.id = r.requirement_id
+       LEFT JOIN teams t ON t.id = o.team_id
+       WHERE o.id = ANY(%s)""",
+)
+# seconds until the cooldown after the latest run with this key prefix ends (NULL: no such run)
+OUTBOX_COOLDOWN_LEFT = query(
+    "outbox_cooldown_left",
+    """SELECT EXTRACT(EPOCH FROM MAX(created_at) + make_interval(mins => %s) - NOW())
+       FROM reminder_outbox WHERE run_key LIKE %s""",
+)
+OUTBOX_RETRY_FAILED = query(
+    "outbox_retry_failed",
+    "UPDATE reminder_outbox SET state = 'pending', error = NULL WHERE run_key = %s AND state = 'failed'",
+)
@@ -4,7 +4,12 @@ from datetime import time as dtime
 import pytz
 import asyncio
 
+import os
+from datetime import datetime
+
 from bot.services.reminder_service import send_daily_reminders, send_hourly_reminders
+from bot.services.backup import export_backup
+from bot.services.retention import run_maintenance
 
 TIMEZONE = pytz.timezone("Asia/Bangkok")
 
@@ -29,7 +34,32 @@ def setup_schedulers(app: Application):
     # schedule daily at 08:30 (Asia/Bangkok)
     jq.run_daily(daily_job, time=dtime(hour=8, minute=30, tzinfo=TIMEZONE))
 
-    # schedule hourly repeating every hour
-    jq.run_repeating(hourly_job, interval=3600, first=0)
+    # schedule hourly repeating every hour; the first run waits a little so a restart
+    # serves pending updates before the reminder scan
+    jq.run_repeating(hourly_job, interval=3600, first=30)
 
     print("Schedulers set: daily 08:30 (Asia/Bangkok) and hourly repeating every 60 minutes.")
+
+    async def partition_job(context):
+        # upcoming monthly partitions + retention of old ones (RETENTION_MONTHS_*)
+        try:
+            result = await asyncio.to_thread(run_maintenance)
+            if result["created"] or result["retired"]:
+                print(f"Partition maintenance: created {result['created']}, retired {[r['partition'] for r in result['retired']]}")
+        except Exception as e:
+            print("Exception in partition_job:", e)
+
+    jq.run_daily(partition_job, time=dtime(hour=3, minute=0, tzinfo=TIMEZONE))
+
+    if os.getenv("BACKUP_ENABLED", "").lower() in ("1", "true", "yes"):
+        async def backup_job(context):
+            # full backup on the 1st and 15th (same cadence as scripts/backup_postgres.sh), incremental otherwise
+            incremental = datetime.now(TIMEZONE).day not in (1, 15)
+            try:
+                manifest = await asyncio.to_thread(export_backup, incremental)
+                print(f"Backup {manifest['kind']} written: {manifest['_path']}")
+            except Exception as e:
+                print("Exception in backup_job:", e)
+
+        jq.run_daily(backup_job, time=dtime(hour=2, minute=0, tzinfo=TIMEZONE))
+        print("Scheduler set: table backup daily 02:00 (full on 1st/15th, incremental otherwise).")
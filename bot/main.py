@@ -1,14 +1,20 @@
 # main.py (or run.py entrypoint)
+import asyncio
 import os
 from dotenv import load_dotenv
+from telegram import Update
 from telegram.ext import ApplicationBuilder
 from pathlib import Path
 
-from bot.db.database import get_conn, ensure_tables
+from bot.db.database import get_conn, ensure_schema, ensure_partitions
 from bot.commands.owner import register_owner_handlers
 from bot.commands.admin import register_admin_handlers
 from bot.commands.public import register_public_handlers
 from bot.jobs.scheduler import setup_schedulers
+from bot.services.tracing import TracingRequest, instrument_handlers
+from bot.services.deadline_rules import get_rules
+from bot.services.holiday_service import get_holidays
+from bot.services.update_processor import ChatOrderedUpdateProcessor
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -27,25 +33,103 @@ def start_bot():
     if not db_url:
         raise RuntimeError("DATABASE_URL not set in environment")
 
-    # create tables (connects to Postgres)
+    # one SELECT on schema_version; DDL only when migrations are pending
     conn = get_conn()
     try:
-        ensure_tables(conn)
+        if ensure_schema(conn):
+            print("Database schema migrated.")
     finally:
         conn.close()
 
-    app = ApplicationBuilder().token(token).build()
+    app = build_application(token, post_init=_post_init)
+
+    mode = os.getenv("BOT_MODE", "polling").lower()
+    print(f"Bot started ({mode}).")
+    # chat_member updates are not sent by default; they keep the admin cache fresh
+    if mode == "webhook":
+        _run_webhook(app, token)
+    else:
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
+
+
+def build_application(token: str, post_init=None):
+    """
+    The bot's Application with every handler registered. TELEGRAM_BASE_URL points it at another
+    Bot API server (a self-hosted one, or benchmarks/fake_telegram.py for load tests).
+    """
+    # TracingRequest records a span per Bot API call (same pool size as PTB's default request)
+    # CONCURRENT_UPDATES: handlers run for up to N updates at once, different groups in parallel;
+    # updates of the same chat are still processed one at a time, in order
+    concurrent = max(int(os.getenv("CONCURRENT_UPDATES", "32")), 1)
+    builder = (
+        ApplicationBuilder()
+        .token(token)
+        .request(TracingRequest(connection_pool_size=256))
+        .concurrent_updates(ChatOrderedUpdateProcessor(concurrent))
+    )
+    api_url = os.getenv("TELEGRAM_BASE_URL")
+    if api_url:
+        api_url = api_url.rstrip("/")
+        builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+    if post_init is not None:
+        builder = builder.post_init(post_init)
+    app = builder.build()
 
     # register command handlers
     register_owner_handlers(app)
     register_admin_handlers(app)
     register_public_handlers(app)
 
-    # scheduler (daily/hourly)
+    # per-handler latency tracing (TRACE_SLOW_MS / TRACE_SAMPLE_RATE / TRACE_FILE)
+    instrument_handlers(app)
+    return app
+
+
+async def _post_init(app):
+    # scheduler (daily/hourly); jobs start together with the application
     setup_schedulers(app)
+    # warm caches in the background: updates are served meanwhile (handlers load lazily anyway)
+    app.create_task(asyncio.to_thread(_warm_up), name="warm_up")
+
+
+def _warm_up():
+    # XML parser (lxml) used by the first upload
+    import bot.services.xml_parser  # noqa: F401
+    try:
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            # deadline rules and holidays (reloaded after /set_deadline_rule, /import_holidays)
+            get_rules(cur)
+            get_holidays(cur)
+            # upcoming monthly partitions (also created daily by partition_job)
+            ensure_partitions(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        print("warm-up failed:", e)
+
 
-    print("Bot started.")
-    app.run_polling()
+def _run_webhook(app, token: str):
+    """
+    Serve updates on a local HTTP server (PTB's tornado webhook), usually behind a TLS proxy.
+    WEBHOOK_URL is the public base URL Telegram posts to; the path defaults to "telegram"
+    rather than the bot token, so the token never appears in proxy access logs.
+    """
+    base_url = os.getenv("WEBHOOK_URL")
+    if not base_url:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_URL")
+    path = os.getenv("WEBHOOK_PATH", "telegram").strip("/")
+    app.run_webhook(
+        listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+        port=int(os.getenv("WEBHOOK_PORT") or os.getenv("PORT") or "8443"),
+        url_path=path,
+        webhook_url=f"{base_url.rstrip('/')}/{path}",
+        # Telegram sends it in X-Telegram-Bot-Api-Secret-Token; other requests get 403
+        secret_token=os.getenv("WEBHOOK_SECRET_TOKEN") or None,
+        max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40")),
+        allowed_updates=Update.ALL_TYPES,
+    )
 
 if __name__ == "__main__":
     start_bot()
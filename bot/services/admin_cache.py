@@ -0,0 +1,97 @@
+# bot/services/admin_cache.py
+# Chat-admin checks without a Bot API round trip per command.
+#
+# The first check in a chat loads all its admins with one get_chat_administrators call;
+# results are kept for ADMIN_CACHE_TTL seconds and dropped as soon as a ChatMemberUpdated
+# event for that chat arrives (needs allowed_updates to include "chat_member").
+import logging
+import os
+import threading
+from typing import FrozenSet, Optional
+
+from cachetools import TTLCache
+from telegram.error import TelegramError
+
+logger = logging.getLogger(__name__)
+
+ADMIN_STATUSES = ("administrator", "creator")
+
+_admins: Optional[TTLCache] = None  # chat_id -> frozenset of admin user ids
+_members: Optional[TTLCache] = None  # (chat_id, user_id) -> bool, when the admin list is unavailable
+_lock = threading.Lock()
+
+
+def cache_ttl() -> float:
+    return float(os.getenv("ADMIN_CACHE_TTL", "300"))
+
+
+def _caches():
+    global _admins, _members
+    if _admins is None:
+        with _lock:
+            if _admins is None:
+                ttl = cache_ttl()
+                _members = TTLCache(maxsize=10000, ttl=ttl)
+                _admins = TTLCache(maxsize=2000, ttl=ttl)
+    return _admins, _members
+
+
+async def warm_chat(bot, chat_id: int) -> Optional[FrozenSet[int]]:
+    """Load (and cache) the admin ids of a chat; None when Telegram refuses (e.g. private chats)."""
+    admins, _ = _caches()
+    try:
+        members = await bot.get_chat_administrators(chat_id)
+    except TelegramError as e:
+        logger.debug("get_chat_administrators(%s) failed: %s", chat_id, e)
+        return None
+    ids = frozenset(m.user.id for m in members)
+    admins[chat_id] = ids
+    return ids
+
+
+async def is_chat_admin(bot, chat_id: int, user_id: int) -> bool:
+    admins, members = _caches()
+    ids = admins.get(chat_id)
+    if ids is None:
+        hit = members.get((chat_id, user_id))
+        if hit is not None:
+            return hit
+        ids = await warm_chat(bot, chat_id)
+    if ids is not None:
+        return user_id in ids
+
+    try:
+        member = await bot.get_chat_member(chat_id, user_id)
+        result = member.status in ADMIN_STATUSES
+    except Exception:
+        # not cached: a transient API error must not lock an admin out for the whole TTL
+        return False
+    members[(chat_id, user_id)] = result
+    return result
+
+
+def invalidate(chat_id: int, user_id: Optional[int] = None):
+    admins, members = _caches()
+    admins.pop(chat_id, None)
+    if user_id is not None:
+        members.pop((chat_id, user_id), None)
+    else:
+        for key in [k for k in list(members.keys()) if k[0] == chat_id]:
+            members.pop(key, None)
+
+
+def clear():
+    global _admins, _members
+    with _lock:
+        _admins = _members = None
+
+
+async def on_chat_member(update, context):
+    """ChatMemberHandler callback: promotions, demotions, joins and leaves reset the chat's entry."""
+    change = update.chat_member or update.my_chat_member
+    if change is None:
+        return
+    user_id = change.new_chat_member.user.id
+    invalidate(change.chat.id, user_id)
+    _, members = _caches()
+    members[(change.chat.id, user_id)] = change.new_chat_member.status in ADMIN_STATUSES
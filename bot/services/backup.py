@@ -0,0 +1,438 @@
+# bot/services/backup.py
+# Table-level backups: COPY TO STDOUT streamed into compressed, chunked, checksummed files,
+# incremental exports of the history tables and parallel per-table restore.
+#
+#   python -m bot.services.backup export [--incremental]
+#   python -m bot.services.backup verify backups/<name>/manifest.json
+#   python -m bot.services.backup restore backups/<name>/manifest.json [--truncate] [--workers 4]
+#
+# Incremental exports take the history rows with an id above the previous backup's watermark,
+# plus every row stamped (created_at / sent_at) within BACKUP_INCREMENTAL_OVERLAP_MINUTES before
+# the previous snapshot: ids are handed out before commit, so a row can get a lower id than one
+# the previous snapshot already saw and still commit after it. The overlap re-exports such
+# rows; restore de-duplicates on the primary key. A transaction open longer than the overlap
+# across a backup can still be missed.
+#
+# Restore replays history (submissions, reminders_sent) from the full backup and every
+# incremental, but the small tables from the newest backup only. History rows whose company /
+# requirement / team was deleted in between are skipped (counted as "orphans" in the result).
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bot.db.database import PARTITIONED_TABLES, backfill_period_keys, ensure_partitions, get_conn
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is used when zstandard is not installed
+    zstandard = None
+
+# restore waves: every table only references tables of earlier waves
+RESTORE_WAVES = [
+    ["teams", "forms", "holidays", "deadline_rules"],
+    ["companies"],
+    ["requirements", "submissions"],
+    # reminder_outbox: pending rows of an in-flight run survive a restore (no FK, restored last)
+    ["reminders_sent", "reminder_outbox"],
+]
+TABLES = [t for wave in RESTORE_WAVES for t in wave]
+# append-mostly history tables exported incrementally by id
+INCREMENTAL_TABLES = ("submissions", "reminders_sent")
+# foreign keys of the history tables: (column, parent table, parent column)
+HISTORY_REFERENCES = {
+    "submissions": [("company_tax_id", "companies", "company_tax_id")],
+    "reminders_sent": [("requirement_id", "requirements", "id"), ("team_id", "teams", "id")],
+}
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024  # uncompressed bytes per chunk file
+
+
+def backup_dir() -> Path:
+    return Path(os.getenv("BACKUP_DIR", Path(__file__).resolve().parents[2] / "backups"))
+
+
+def incremental_overlap_minutes() -> int:
+    return max(0, int(os.getenv("BACKUP_INCREMENTAL_OVERLAP_MINUTES", "60")))
+
+
+class _HashingFile:
+    """Write-through file wrapper computing sha256 and size of what reaches the disk."""
+
+    def __init__(self, path: Path):
+        self._fh = open(path, "wb")
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data: bytes):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self._fh.write(data)
+
+    def flush(self):
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class _ChunkWriter:
+    """
+    File-like sink for cursor.copy_expert(COPY ... TO STDOUT). psycopg2 writes one row per
+    write() call, so rotating between writes always splits chunks on row boundaries.
+    """
+
+    def __init__(self, directory: Path, table: str, compression: str, chunk_bytes: int):
+        self.directory = directory
+        self.table = table
+        self.compression = compression
+        self.chunk_bytes = chunk_bytes
+        self.chunks: List[Dict[str, Any]] = []
+        self._raw: Optional[_HashingFile] = None
+        self._stream = None
+        self._rows = 0
+        self._written = 0
+
+    def _open(self):
+        ext = "zst" if self.compression == "zstd" else "gz"
+        name = f"{self.table}.{len(self.chunks) + 1:04d}.tsv.{ext}"
+        self._raw = _HashingFile(self.directory / name)
+        if self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=6).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6)
+        self.chunks.append({"file": name, "rows": 0, "sha256": None, "bytes": 0})
+        self._rows = 0
+        self._written = 0
+
+    def _close_chunk(self):
+        if self._stream is None:
+            return
+        self._stream.close()
+        self._raw.close()
+        self.chunks[-1].update(rows=self._rows, sha256=self._raw.sha256.hexdigest(), bytes=self._raw.bytes)
+        self._stream = None
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self._stream is None or self._written >= self.chunk_bytes:
+            self._close_chunk()
+            self._open()
+        self._stream.write(data)
+        self._written += len(data)
+        self._rows += 1
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._close_chunk()
+        return self.chunks
+
+
+def _open_chunk(path: Path):
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"{path.name} is zstd-compressed but the zstandard module is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return gzip.open(path, "rb")
+
+
+def _table_columns(cur, table: str) -> List[str]:
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+        (table,),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def _latest_manifest(root: Path) -> Optional[Dict[str, Any]]:
+    manifests = sorted(root.glob("taxbot_*/manifest.json"))
+    if not manifests:
+        return None
+    with open(manifests[-1], encoding="utf-8") as fh:
+        data = json.load(fh)
+    data["_path"] = str(manifests[-1])
+    return data
+
+
+def export_backup(incremental: bool = False, out_root: Optional[Path] = None,
+                  chunk_bytes: int = DEFAULT_CHUNK_BYTES, compression: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Export every table from one REPEATABLE READ snapshot (point-in-time consistent).
+    incremental=True: submissions/reminders_sent only export rows with id above the previous
+    backup's watermark or stamped within the overlap window (see module comment); the small
+    tables are always exported in full.
+    Returns the manifest (also written as manifest.json next to the chunk files).
+    """
+    root = Path(out_root) if out_root else backup_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    if compression is None:
+        compression = "zstd" if zstandard is not None else "gzip"
+    previous = _latest_manifest(root) if incremental else None
+    if incremental and previous is None:
+        # nothing to be incremental against
+        incremental = False
+
+    # microseconds: a scheduled backup and /backup in the same second get their own directory
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    kind = "incremental" if incremental else "full"
+    directory = root / f"taxbot_{stamp}_{kind}"
+    directory.mkdir()
+
+    manifest: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "kind": kind,
+        "base": previous["_path"] if previous else None,
+        "compression": compression,
+        "tables": {},
+    }
+    t0 = time.perf_counter()
+    conn = get_conn()
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        cur = conn.cursor()
+        # the snapshot is taken by the first statement; now() is the transaction start, just before
+        cur.execute("SELECT now()")
+        manifest["snapshot_at"] = cur.fetchone()[0].isoformat()
+        overlap_since = None
+        if incremental and previous.get("snapshot_at"):
+            overlap_since = datetime.fromisoformat(previous["snapshot_at"]) - timedelta(minutes=incremental_overlap_minutes())
+            manifest["overlap_since"] = overlap_since.isoformat()
+        for table in TABLES:
+            columns = _table_columns(cur, table)
+            if not columns:
+                continue
+            col_list = ", ".join(columns)
+            since_id = None
+            if incremental and table in INCREMENTAL_TABLES:
+                since_id = previous["tables"].get(table, {}).get("max_id") or 0
+                where = f"id > {int(since_id)}"
+                if overlap_since is not None:
+                    where += cur.mogrify(f" OR {PARTITIONED_TABLES[table]} >= %s", (overlap_since,)).decode()
+                query = f"SELECT {col_list} FROM {table} WHERE {where} ORDER BY id"
+            else:
+                query = f"SELECT {col_list} FROM {table}" + (" ORDER BY id" if "id" in columns else "")
+            writer = _ChunkWriter(directory, table, compression, chunk_bytes)
+            try:
+                cur.copy_expert(f"COPY ({query}) TO STDOUT", writer)
+            finally:
+                chunks = writer.close()
+            entry: Dict[str, Any] = {
+                "columns": columns,
+                "mode": "incremental" if since_id is not None else "full",
+                "chunks": chunks,
+                "rows": sum(c["rows"] for c in chunks),
+            }
+            if "id" in columns:
+                cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+                entry["max_id"] = max(cur.fetchone()[0], since_id or 0)
+            if since_id is not None:
+                entry["since_id"] = since_id
+            manifest["tables"][table] = entry
+        conn.rollback()
+    finally:
+        conn.close()
+
+    manifest["seconds"] = round(time.perf_counter() - t0, 2)
+    manifest["bytes"] = sum(c["bytes"] for t in manifest["tables"].values() for c in t["chunks"])
+    with open(directory / "manifest.json", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+    manifest["_path"] = str(directory / "manifest.json")
+    return manifest
+
+
+def _load_chain(manifest_path: str) -> List[Dict[str, Any]]:
+    """[full, incr1, incr2, ...] ending at manifest_path."""
+    chain = []
+    path = manifest_path
+    while path:
+        with open(path, encoding="utf-8") as fh:
+            m = json.load(fh)
+        m["_dir"] = str(Path(path).parent)
+        chain.append(m)
+        path = m.get("base") if m["kind"] == "incremental" else None
+    chain.reverse()
+    if chain[0]["kind"] != "full":
+        raise RuntimeError("backup chain does not start with a full backup")
+    return chain
+
+
+def _restore_plan(chain: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per table: columns + ordered chunk paths. History tables replay the full backup
+    plus every incremental; the small tables come from the newest backup only.
+    """
+    latest = chain[-1]
+    plan: Dict[str, Dict[str, Any]] = {}
+    for table, entry in latest["tables"].items():
+        parts = chain if table in INCREMENTAL_TABLES else [latest]
+        files = []
+        for m in parts:
+            t = m["tables"].get(table)
+            if t:
+                files += [(Path(m["_dir"]) / c["file"], c["sha256"]) for c in t["chunks"]]
+        plan[table] = {"columns": entry["columns"], "files": files}
+    return plan
+
+
+def verify_backup(manifest_path: str) -> List[str]:
+    """Check every chunk of the chain against its sha256; returns a list of problems."""
+    problems = []
+    for table, item in _restore_plan(_load_chain(manifest_path)).items():
+        for path, expected in item["files"]:
+            if not path.exists():
+                problems.append(f"{table}: missing {path.name}")
+                continue
+            h = hashlib.sha256()
+            with open(path, "rb") as fh:
+                for block in iter(lambda: fh.read(1024 * 1024), b""):
+                    h.update(block)
+            if h.hexdigest() != expected:
+                problems.append(f"{table}: checksum mismatch {path.name}")
+    return problems
+
+
+def _restore_history(cur, table: str, item: Dict[str, Any]) -> int:
+    """
+    Load history chunks through a staging table: rows exported twice (incremental overlap)
+    are inserted once, rows whose parent is gone are skipped. Returns the number skipped.
+    """
+    columns = ", ".join(item["columns"])
+    staging = f"_restore_{table}"
+    cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    refs = [r for r in HISTORY_REFERENCES.get(table, []) if r[0] in item["columns"]]
+    keep = " AND ".join(
+        f"(s.{col} IS NULL OR EXISTS (SELECT 1 FROM {parent} p WHERE p.{pcol} = s.{col}))" for col, parent, pcol in refs
+    ) or "TRUE"
+    orphans = 0
+    for path, _ in item["files"]:
+        with _open_chunk(path) as stream:
+            cur.copy_expert(f"COPY {staging} ({columns}) FROM STDIN", stream)
+        cur.execute(f"SELECT COUNT(*) FROM {staging} s WHERE NOT ({keep})")
+        orphans += cur.fetchone()[0]
+        cur.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {', '.join('s.' + c for c in item['columns'])} "
+            f"FROM {staging} s WHERE {keep} ON CONFLICT DO NOTHING"
+        )
+        cur.execute(f"TRUNCATE {staging}")
+    return orphans
+
+
+def _restore_table(table: str, item: Dict[str, Any], conn_factory: Callable) -> int:
+    """Load one table; returns the number of history rows skipped as orphans."""
+    conn = conn_factory()
+    try:
+        cur = conn.cursor()
+        orphans = 0
+        if table in INCREMENTAL_TABLES:
+            orphans = _restore_history(cur, table, item)
+        else:
+            copy_sql = f"COPY {table} ({', '.join(item['columns'])}) FROM STDIN"
+            for path, _ in item["files"]:
+                with _open_chunk(path) as stream:
+                    cur.copy_expert(copy_sql, stream)
+        if "id" in item["columns"]:
+            cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+            seq = cur.fetchone()[0]
+            if seq:
+                cur.execute(f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)", (seq,))
+        conn.commit()
+        if orphans:
+            print(f"{table}: skipped {orphans} row(s) whose parent row is not in the backup")
+        return orphans
+    finally:
+        conn.close()
+
+
+def restore_backup(manifest_path: str, workers: int = 4, truncate: bool = False,
+                   conn_factory: Callable = get_conn) -> Dict[str, Any]:
+    """
+    Restore a backup chain. Checksums are verified first; tables are then loaded in FK waves,
+    tables of the same wave in parallel (one connection and transaction per table).
+    truncate=True empties every bot table first; otherwise the target must be empty.
+    The result counts, per history table, the orphan rows skipped (see module comment).
+    """
+    problems = verify_backup(manifest_path)
+    if problems:
+        raise RuntimeError("backup verification failed: " + "; ".join(problems))
+    plan = _restore_plan(_load_chain(manifest_path))
+
+    if truncate:
+        conn = conn_factory()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"TRUNCATE {', '.join(reversed(TABLES))} RESTART IDENTITY CASCADE")
+            conn.commit()
+        finally:
+            conn.close()
+
+    t0 = time.perf_counter()
+    orphans: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for wave in RESTORE_WAVES:
+            futures = {t: pool.submit(_restore_table, t, plan[t], conn_factory) for t in wave if t in plan}
+            for t, f in futures.items():
+                skipped = f.result()
+                if skipped:
+                    orphans[t] = skipped
+    # restored history rows outside the existing monthly partitions sit in the default partition;
+    # backups taken before the typed period columns existed restore them as NULL
+    conn = conn_factory()
+    try:
+        backfill_period_keys(conn.cursor())
+        conn.commit()
+        ensure_partitions(conn)
+    finally:
+        conn.close()
+    return {"tables": len(plan), "orphans": orphans, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def format_summary(manifest: Dict[str, Any]) -> str:
+    lines = [
+        f"🗄️ Backup {manifest['kind']} — {manifest['created_at']} ({manifest['compression']})",
+        f"• Dung lượng: {manifest['bytes'] / 1024 / 1024:.2f} MiB — {manifest['seconds']}s",
+    ]
+    for table, t in manifest["tables"].items():
+        lines.append(f"• {table}: {t['rows']} dòng, {len(t['chunks'])} file")
+    lines.append(f"📁 {manifest['_path']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tax bot table backups")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("--incremental", action="store_true")
+    p_exp.add_argument("--out", help="backup root directory (default: $BACKUP_DIR or ./backups)")
+    p_exp.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_BYTES // 1024 // 1024)
+    p_exp.add_argument("--compression", choices=["gzip", "zstd"])
+    p_ver = sub.add_parser("verify")
+    p_ver.add_argument("manifest")
+    p_res = sub.add_parser("restore")
+    p_res.add_argument("manifest")
+    p_res.add_argument("--workers", type=int, default=4)
+    p_res.add_argument("--truncate", action="store_true", help="empty the target tables first")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    env_path = Path(__file__).resolve().parents[2] / "config" / "config.env"
+    if env_path.exists():
+        load_dotenv(env_path)
+
+    if args.cmd == "export":
+        manifest = export_backup(args.incremental, args.out, args.chunk_mb * 1024 * 1024, args.compression)
+        print(format_summary(manifest))
+    elif args.cmd == "verify":
+        problems = verify_backup(args.manifest)
+        print("\n".join(problems) if problems else "OK")
+        raise SystemExit(1 if problems else 0)
+    else:
+        print(restore_backup(args.manifest, args.workers, args.truncate))
+
+
+if __name__ == "__main__":
+    main()
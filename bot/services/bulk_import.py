@@ -0,0 +1,253 @@
+# bot/services/bulk_import.py
+# Team onboarding from a CSV/XLSX sheet: companies, owners and requirement profiles,
+# validated in one pass and written with batched upserts in a single transaction.
+#
+# Columns (header row, case/accents ignored; only "mst" is required):
+#   mst | ten_cong_ty | owner_username | owner_telegram_id | profile | forms
+#   profile: monthly / quarterly / yearly (same sets as /quick_add)
+#   forms:   explicit requirements "01/GTGT:monthly; 03/TNDN:yearly"
+import csv
+import io
+import re
+import unicodedata
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from psycopg2.extras import execute_values
+
+from bot.db.database import get_conn
+
+
+FREQUENCIES = ("monthly", "quarterly", "yearly")
+YEARLY_FORMS = [("05/QTT-TNCN", "yearly"), ("TT200", "yearly"), ("03/TNDN", "yearly")]
+# requirement sets per filing profile (used by /quick_add and the "profile" column)
+PROFILE_REQUIREMENTS = {
+    "monthly": [("01/GTGT", "monthly"), ("05/KK-TNCN", "monthly")] + YEARLY_FORMS,
+    "quarterly": [("01/GTGT", "quarterly"), ("05/KK-TNCN", "quarterly")] + YEARLY_FORMS,
+    "yearly": list(YEARLY_FORMS),
+}
+MAX_ROWS = 5000
+MAX_ERRORS_SHOWN = 20
+
+# header aliases -> canonical column
+COLUMNS = {
+    "mst": "mst", "ma_so_thue": "mst", "company_tax_id": "mst", "tax_id": "mst",
+    "ten_cong_ty": "company_name", "ten": "company_name", "company_name": "company_name",
+    "owner_username": "owner_username", "owner": "owner_username", "nguoi_phu_trach": "owner_username",
+    "owner_telegram_id": "owner_telegram_id", "telegram_id": "owner_telegram_id",
+    "profile": "profile", "tan_suat": "profile", "ky_khai": "profile",
+    "forms": "forms", "to_khai": "forms", "requirements": "forms",
+}
+_MST_RE = re.compile(r"^\d{10}(-\d{3})?$")
+
+
+def _fold(text: str) -> str:
+    s = unicodedata.normalize("NFD", str(text).strip().lower()).replace("đ", "d")
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return re.sub(r"[^a-z0-9]+", "_", s).strip("_")
+
+
+def _cell(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        # Excel stores numeric MSTs / Telegram ids as floats
+        v = int(v)
+    return str(v).strip()
+
+
+def read_rows(filename: str, data: bytes) -> List[Dict[str, str]]:
+    """Rows of the first sheet as {canonical column: text}. Raises ValueError for unusable files."""
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        try:
+            import openpyxl  # optional and slow to import: only loaded for .xlsx
+        except ImportError:
+            raise ValueError("Máy chủ chưa cài openpyxl nên chưa đọc được .xlsx — hãy gửi file .csv.") from None
+        wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            raw = [[_cell(v) for v in row] for row in wb.worksheets[0].iter_rows(values_only=True)]
+        finally:
+            wb.close()
+    elif name.endswith(".csv") or name.endswith(".txt"):
+        text = data.decode("utf-8-sig", errors="replace")
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        raw = [[_cell(v) for v in row] for row in csv.reader(io.StringIO(text), dialect)]
+    else:
+        raise ValueError("Chỉ hỗ trợ file .csv hoặc .xlsx.")
+
+    raw = [r for r in raw if any(r)]
+    if not raw:
+        raise ValueError("File trống.")
+    header = [COLUMNS.get(_fold(h)) for h in raw[0]]
+    if "mst" not in header:
+        raise ValueError("Không tìm thấy cột 'mst' ở dòng tiêu đề.")
+    if len(raw) - 1 > MAX_ROWS:
+        raise ValueError(f"File quá lớn (tối đa {MAX_ROWS} dòng).")
+    rows = []
+    for values in raw[1:]:
+        rows.append({col: (values[i] if i < len(values) else "") for i, col in enumerate(header) if col})
+    return rows
+
+
+def _parse_forms(text: str) -> List[Tuple[str, str]]:
+    out = []
+    for part in re.split(r"[;\n]+", text):
+        part = part.strip()
+        if not part:
+            continue
+        code, sep, freq = part.rpartition(":")
+        if not sep or not code.strip() or freq.strip().lower() not in FREQUENCIES:
+            raise ValueError(f"tờ khai không hợp lệ '{part}' (dạng MA_FORM:monthly)")
+        out.append((code.strip(), freq.strip().lower()))
+    return out
+
+
+def validate(rows: Sequence[Dict[str, str]]) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[int, str]]]:
+    """
+    One pass over the sheet. Returns ({mst: {company_name, owner_username, owner_telegram_id,
+    requirements: set((form, freq))}}, [(line number, error)]). Repeated MSTs are merged.
+    """
+    companies: Dict[str, Dict[str, Any]] = {}
+    errors: List[Tuple[int, str]] = []
+    for n, row in enumerate(rows, 2):  # line 1 is the header
+        mst = row.get("mst", "").replace(" ", "")
+        if not _MST_RE.match(mst):
+            errors.append((n, f"MST không hợp lệ '{mst}'"))
+            continue
+        owner_id = row.get("owner_telegram_id", "")
+        if owner_id and not owner_id.lstrip("-").isdigit():
+            errors.append((n, f"owner_telegram_id phải là số '{owner_id}'"))
+            continue
+        reqs: Set[Tuple[str, str]] = set()
+        profile = row.get("profile", "").lower()
+        if profile:
+            if profile not in PROFILE_REQUIREMENTS:
+                errors.append((n, f"profile không hợp lệ '{profile}' (monthly/quarterly/yearly)"))
+                continue
+            reqs.update(PROFILE_REQUIREMENTS[profile])
+        try:
+            reqs.update(_parse_forms(row.get("forms", "")))
+        except ValueError as e:
+            errors.append((n, str(e)))
+            continue
+
+        item = companies.setdefault(mst, {"company_name": None, "owner_username": None, "owner_telegram_id": None, "requirements": set(), "line": n})
+        if row.get("company_name"):
+            item["company_name"] = row["company_name"]
+        if row.get("owner_username"):
+            item["owner_username"] = row["owner_username"].lstrip("@")
+        if owner_id:
+            item["owner_telegram_id"] = owner_id
+        item["requirements"] |= reqs
+    return companies, errors
+
+
+def apply_import(chat_id: int, rows: Sequence[Dict[str, str]], dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Validate `rows` and load them into the team of `chat_id` in one transaction.
+    Companies owned by another team are reported as errors and left untouched.
+    Returns the diff: companies added/updated/unchanged, requirements added/existing, errors.
+    """
+    companies, errors = validate(rows)
+    result: Dict[str, Any] = {
+        "companies_added": [], "companies_updated": [], "companies_unchanged": 0,
+        "requirements_added": 0, "requirements_existing": 0, "errors": errors, "dry_run": dry_run,
+    }
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat_id,))
+        t = cur.fetchone()
+        if not t:
+            raise ValueError("Group chưa được đăng ký làm team. Owner cần /register_team trước.")
+        team_id = t[0]
+
+        msts = sorted(companies)
+        cur.execute(
+            "SELECT company_tax_id, team_id, company_name, owner_username, owner_telegram_id FROM companies WHERE company_tax_id = ANY(%s)",
+            (msts,),
+        )
+        existing = {r[0]: r[1:] for r in cur.fetchall()}
+        cur.execute("SELECT company_tax_id, form_code, period FROM requirements WHERE company_tax_id = ANY(%s)", (msts,))
+        existing_reqs = {tuple(r) for r in cur.fetchall()}
+
+        company_rows = []
+        req_rows = []
+        for mst in msts:
+            item = companies[mst]
+            old = existing.get(mst)
+            if old and old[0] is not None and old[0] != team_id:
+                errors.append((item["line"], f"MST {mst} thuộc team khác — bỏ qua"))
+                continue
+            new = (
+                item["company_name"] or (old[1] if old else None) or mst,
+                item["owner_username"] or (old[2] if old else None),
+                item["owner_telegram_id"] or (old[3] if old else None),
+            )
+            if not old:
+                result["companies_added"].append(mst)
+            elif old[0] != team_id or tuple(old[1:]) != new:
+                result["companies_updated"].append(mst)
+            else:
+                result["companies_unchanged"] += 1
+            company_rows.append((mst, team_id) + new)
+            for form_code, freq in sorted(item["requirements"]):
+                if (mst, form_code, freq) in existing_reqs:
+                    result["requirements_existing"] += 1
+                else:
+                    req_rows.append((mst, form_code, freq))
+        result["requirements_added"] = len(req_rows)
+        errors.sort()
+
+        if dry_run:
+            conn.rollback()
+            return result
+
+        forms = sorted({(f, f) for _, f, _ in req_rows})
+        if forms:
+            execute_values(cur, "INSERT INTO forms(form_code, display_name) VALUES %s ON CONFLICT (form_code) DO NOTHING", forms)
+        if company_rows:
+            execute_values(
+                cur,
+                """INSERT INTO companies(company_tax_id, team_id, company_name, owner_username, owner_telegram_id) VALUES %s
+                   ON CONFLICT (company_tax_id) DO UPDATE SET team_id = EXCLUDED.team_id, company_name = EXCLUDED.company_name,
+                       owner_username = EXCLUDED.owner_username, owner_telegram_id = EXCLUDED.owner_telegram_id""",
+                company_rows,
+                page_size=1000,
+            )
+        if req_rows:
+            execute_values(
+                cur,
+                "INSERT INTO requirements(company_tax_id, form_code, period) VALUES %s ON CONFLICT (company_tax_id, form_code, period) DO NOTHING",
+                req_rows,
+                page_size=1000,
+            )
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def format_summary(result: Dict[str, Any]) -> str:
+    title = "🔎 Xem trước import (chưa ghi gì)" if result["dry_run"] else "📥 Kết quả import"
+    lines = [
+        f"{title}:",
+        f"• Công ty thêm mới: {len(result['companies_added'])}",
+        f"• Công ty cập nhật: {len(result['companies_updated'])}",
+        f"• Công ty không đổi: {result['companies_unchanged']}",
+        f"• Requirement thêm mới: {result['requirements_added']}",
+        f"• Requirement đã có (bỏ qua): {result['requirements_existing']}",
+    ]
+    errors = result["errors"]
+    if errors:
+        lines.append(f"⚠️ {len(errors)} dòng lỗi (không được nhập):")
+        lines += [f"  - dòng {n}: {msg}" for n, msg in errors[:MAX_ERRORS_SHOWN]]
+        if len(errors) > MAX_ERRORS_SHOWN:
+            lines.append(f"  ... và {len(errors) - MAX_ERRORS_SHOWN} dòng khác")
+    return "\n".join(lines)
@@ -0,0 +1,364 @@
+# bot/services/deadline_rules.py
+# Filing deadline rules per (form_code, frequency), compiled into precomputed deadline calendars.
+#
+# A rule puts the deadline on `due_day` (None = last day) of the month `offset_months` after the
+# last month of the period, optionally rolled forward to the next working day when it falls on
+# a weekend or holiday. Rows in the deadline_rules table override the built-in DEFAULT_RULES;
+# form_code "*" applies to every form without its own rule.
+#
+# due_many() answers many reference dates at once (simulations, date ranges); with numpy
+# installed it is vectorised (searchsorted over the deadline calendar, busday_count over the
+# holiday calendar). SCAN_NUMPY=0 forces the pure-Python path.
+import bisect
+import calendar
+import os
+import threading
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from bot.db.database import get_conn
+
+try:
+    import numpy as np
+except ImportError:  # optional: vectorised paths fall back to per-date Python
+    np = None
+
+FREQUENCIES = ("monthly", "quarterly", "yearly")
+ANY_FORM = "*"
+# years compiled around the first reference date; calendars extend themselves when needed
+HORIZON_YEARS = 2
+_ONE_DAY = timedelta(days=1)
+
+
+def numpy_enabled() -> bool:
+    return np is not None and os.getenv("SCAN_NUMPY", "1").lower() not in ("0", "false", "no")
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _datetime64(dates: Sequence[date]):
+    """date objects -> datetime64[D] array via ordinals (np.array on dates is much slower)."""
+    days = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+    return (days - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+class Rule(NamedTuple):
+    form_code: str
+    frequency: str
+    offset_months: int
+    due_day: Optional[int]  # None = last day of the month
+    roll_forward: bool
+    threshold_days: Optional[int]  # None = reminder_service.THRESHOLDS
+
+
+# monthly: 20th of the next month; quarterly: last day of the month after the quarter;
+# yearly: last day of March of the next year. Deadlines on a day off move to the next working day.
+DEFAULT_RULES = (
+    Rule(ANY_FORM, "monthly", 1, 20, True, None),
+    Rule(ANY_FORM, "quarterly", 1, None, True, None),
+    Rule(ANY_FORM, "yearly", 3, None, True, None),
+)
+
+
+class BusinessCalendar:
+    """Working-day arithmetic (weekends + holidays) over a precomputed cumulative count."""
+
+    def __init__(self, holidays: Iterable[date], start: date, end: date):
+        self.holidays: FrozenSet[date] = frozenset(holidays)
+        self._state = self._build(start, end)
+        self._busdaycal = None
+
+    def _build(self, start: date, end: date):
+        cum = []
+        n = 0
+        d = start
+        for _ in range((end - start).days + 1):
+            if d.weekday() < 5 and d not in self.holidays:
+                n += 1
+            cum.append(n)
+            d += _ONE_DAY
+        # (start, end, cum): cum[i] = working days in [start, start + i]
+        return start, end, cum
+
+    def _cover(self, a: date, b: date):
+        start, end, cum = self._state
+        if a < start or b > end:
+            self._state = self._build(min(a, start) - timedelta(days=366), max(b, end) + timedelta(days=366))
+        return self._state
+
+    def is_business_day(self, d: date) -> bool:
+        return d.weekday() < 5 and d not in self.holidays
+
+    def roll_forward(self, d: date) -> date:
+        while not self.is_business_day(d):
+            d += _ONE_DAY
+        return d
+
+    def count(self, start: date, end: date) -> int:
+        """Working days strictly after `start` up to and including `end` (same as utils.business_days_between)."""
+        if start >= end:
+            return 0
+        base, _, cum = self._cover(start, end)
+        return cum[(end - base).days] - cum[(start - base).days]
+
+    def count_many(self, starts, ends):
+        """Vectorised count() over datetime64[D] arrays (numpy only)."""
+        if self._busdaycal is None:
+            self._busdaycal = np.busdaycalendar(holidays=_datetime64(sorted(self.holidays)))
+        # busday_count counts [begin, end): shift both bounds by one day for (start, end]
+        return np.maximum(np.busday_count(starts + 1, ends + 1, busdaycal=self._busdaycal), 0)
+
+
+def _add_months(year: int, month: int, n: int) -> Tuple[int, int]:
+    y, m = divmod(year * 12 + month - 1 + n, 12)
+    return y, m + 1
+
+
+def _periods_of_year(frequency: str, year: int) -> List[Tuple[str, int, int]]:
+    """(period_str, year, last month) of every period of `frequency` in `year`."""
+    if frequency == "monthly":
+        return [(f"{m:02d}/{year}", year, m) for m in range(1, 13)]
+    if frequency == "quarterly":
+        return [(f"Q{q}/{year}", year, q * 3) for q in range(1, 5)]
+    return [(f"{year}", year, 12)]
+
+
+class DeadlineCalendar:
+    """Sorted deadlines of one rule; next_due() is a bisect."""
+
+    def __init__(self, rule: Rule, business: BusinessCalendar):
+        self.rule = rule
+        self.business = business
+        self._years: Optional[Tuple[int, int]] = None
+        self._deadlines: List[date] = []
+        self._periods: List[str] = []
+        self._np_deadlines = None
+
+    def _nominal(self, year: int, month: int) -> date:
+        y, m = _add_months(year, month, self.rule.offset_months)
+        last = calendar.monthrange(y, m)[1]
+        day = last if not self.rule.due_day else min(self.rule.due_day, last)
+        return date(y, m, day)
+
+    def _compile(self, first_year: int, last_year: int):
+        entries = []
+        for year in range(first_year, last_year + 1):
+            for period, y, m in _periods_of_year(self.rule.frequency, year):
+                deadline = self._nominal(y, m)
+                if self.rule.roll_forward:
+                    deadline = self.business.roll_forward(deadline)
+                entries.append((deadline, period))
+        entries.sort()
+        self._deadlines = [e[0] for e in entries]
+        self._periods = [e[1] for e in entries]
+        self._np_deadlines = None
+        self._years = (first_year, last_year)
+
+    def _cover(self, ref_date: date):
+        if self._years is None:
+            self._compile(ref_date.year - HORIZON_YEARS, ref_date.year + HORIZON_YEARS)
+        first_year, last_year = self._years
+        # periods end before their deadline, so the due period lies within a year or two of ref_date
+        if ref_date.year - 2 < first_year or ref_date.year + 1 > last_year:
+            self._compile(min(first_year, ref_date.year - HORIZON_YEARS), max(last_year, ref_date.year + HORIZON_YEARS))
+
+    def next_due(self, ref_date: date) -> Tuple[date, str]:
+        """First deadline on or after ref_date and its period string."""
+        self._cover(ref_date)
+        i = bisect.bisect_left(self._deadlines, ref_date)
+        return self._deadlines[i], self._periods[i]
+
+    def next_due_many(self, ref_dates) -> List[int]:
+        """Indices into the compiled deadlines of next_due() for a datetime64[D] array (numpy only)."""
+        self._cover(ref_dates.min().item())
+        self._cover(ref_dates.max().item())
+        if self._np_deadlines is None:
+            self._np_deadlines = _datetime64(self._deadlines)
+        return np.searchsorted(self._np_deadlines, ref_dates, side="left")
+
+
+class CompiledRules:
+    """Rules + holidays compiled into deadline calendars, memoised per (rule, reference date)."""
+
+    def __init__(self, rules: "DeadlineRules", holidays: Iterable[date]):
+        self.rules = rules
+        today = date.today()
+        self.business = BusinessCalendar(holidays, date(today.year - HORIZON_YEARS - 1, 1, 1), date(today.year + HORIZON_YEARS + 1, 12, 31))
+        self._calendars: Dict[Rule, DeadlineCalendar] = {}
+        self._due: Dict[Tuple[Rule, date], Tuple[date, str, int]] = {}
+        self._lock = threading.Lock()
+
+    def due(self, form_code: str, frequency: str, ref_date: date) -> Optional[Tuple[date, str, int, Optional[int]]]:
+        """(deadline, period_str, working days left incl. ref_date, threshold) or None when no rule applies."""
+        rule = self.rules.rule_for(form_code, frequency)
+        if rule is None:
+            return None
+        key = (rule, ref_date)
+        hit = self._due.get(key)
+        if hit is None:
+            with self._lock:
+                cal = self._calendars.get(rule)
+                if cal is None:
+                    cal = self._calendars[rule] = DeadlineCalendar(rule, self.business)
+                deadline, period = cal.next_due(ref_date)
+                hit = (deadline, period, self.business.count(ref_date - _ONE_DAY, deadline))
+                self._due[key] = hit
+        return hit + (rule.threshold_days,)
+
+    def due_many(self, form_code: str, frequency: str, ref_dates: Sequence[date]) -> Optional[Tuple[List[Tuple[date, str, int]], Optional[int]]]:
+        """
+        due() for many reference dates at once: ([(deadline, period_str, days_left)] aligned with
+        ref_dates, threshold), or None when no rule applies. Results are memoised like due(), so
+        later due() calls for these dates are dictionary hits.
+        """
+        rule = self.rules.rule_for(form_code, frequency)
+        if rule is None:
+            return None
+        if not numpy_enabled() or not ref_dates:
+            return [self.due(form_code, frequency, d)[:3] for d in ref_dates], rule.threshold_days
+        with self._lock:
+            cal = self._calendars.get(rule)
+            if cal is None:
+                cal = self._calendars[rule] = DeadlineCalendar(rule, self.business)
+            refs = _datetime64(ref_dates)
+            idx = cal.next_due_many(refs)
+            left = self.business.count_many(refs - 1, cal._np_deadlines[idx]).tolist()
+            deadlines, periods = cal._deadlines, cal._periods
+            hits = []
+            for d, i, n in zip(ref_dates, idx.tolist(), left):
+                hit = self._due.setdefault((rule, d), (deadlines[i], periods[i], n))
+                hits.append(hit)
+        return hits, rule.threshold_days
+
+
+class DeadlineRules:
+    """Effective rule set: DEFAULT_RULES overridden by the given rows."""
+
+    def __init__(self, overrides: Sequence[Rule] = ()):
+        self._by_key: Dict[Tuple[str, str], Rule] = {(r.form_code, r.frequency): r for r in DEFAULT_RULES}
+        self.overrides = [Rule(*r) for r in overrides]
+        for r in self.overrides:
+            self._by_key[(r.form_code, r.frequency)] = r
+        self._compiled: Dict[FrozenSet[date], CompiledRules] = {}
+
+    def rules(self) -> List[Rule]:
+        return sorted(self._by_key.values(), key=lambda r: (r.form_code != ANY_FORM, r.form_code, FREQUENCIES.index(r.frequency) if r.frequency in FREQUENCIES else 99))
+
+    def rule_for(self, form_code: Optional[str], frequency: Optional[str]) -> Optional[Rule]:
+        freq = (frequency or "").lower()
+        return self._by_key.get((form_code, freq)) or self._by_key.get((ANY_FORM, freq))
+
+    def compile(self, holidays: Iterable[date]) -> CompiledRules:
+        key = frozenset(holidays)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            # holidays only change on edits: keep just the latest compilation
+            compiled = CompiledRules(self, key)
+            self._compiled = {key: compiled}
+        return compiled
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+_rules: Optional[DeadlineRules] = None
+_rules_lock = threading.Lock()
+
+
+def load_rules(cur) -> DeadlineRules:
+    cur.execute("SELECT form_code, frequency, offset_months, due_day, roll_forward, threshold_days FROM deadline_rules")
+    return DeadlineRules([Rule(*r) for r in cur.fetchall()])
+
+
+def get_rules(cur=None) -> DeadlineRules:
+    """Cached effective rules; loaded from the database on first use and after invalidate_rules()."""
+    global _rules
+    rules = _rules
+    if rules is not None:
+        return rules
+    with _rules_lock:
+        if _rules is None:
+            if cur is not None:
+                _rules = load_rules(cur)
+            else:
+                conn = get_conn()
+                try:
+                    _rules = load_rules(conn.cursor())
+                finally:
+                    conn.close()
+        return _rules
+
+
+def invalidate_rules():
+    global _rules
+    _rules = None
+
+
+def save_rule(rule: Rule):
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO deadline_rules(form_code, frequency, offset_months, due_day, roll_forward, threshold_days, updated_at)
+               VALUES (%s, %s, %s, %s, %s, %s, NOW())
+               ON CONFLICT (form_code, frequency) DO UPDATE SET
+                   offset_months = EXCLUDED.offset_months, due_day = EXCLUDED.due_day,
+                   roll_forward = EXCLUDED.roll_forward, threshold_days = EXCLUDED.threshold_days, updated_at = NOW()""",
+            tuple(rule),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_rules()
+
+
+def delete_rule(form_code: str, frequency: str) -> bool:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM deadline_rules WHERE form_code = %s AND frequency = %s", (form_code, frequency))
+        deleted = cur.rowcount > 0
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_rules()
+    return deleted
+
+
+def parse_rule(args: Sequence[str]) -> Rule:
+    """
+    <form_code|*> <monthly|quarterly|yearly> <offset_months> <day|last> [roll|noroll] [threshold]
+    Raises ValueError on bad input.
+    """
+    if len(args) < 4:
+        raise ValueError("thiếu tham số")
+    form_code, frequency = args[0], args[1].lower()
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"tần suất không hợp lệ: {args[1]}")
+    offset_months = int(args[2])
+    if not 0 <= offset_months <= 24:
+        raise ValueError("offset_months phải trong khoảng 0..24")
+    due_day = None if args[3].lower() == "last" else int(args[3])
+    if due_day is not None and not 1 <= due_day <= 31:
+        raise ValueError("ngày phải trong khoảng 1..31 hoặc 'last'")
+    roll_forward = True
+    threshold = None
+    for a in args[4:]:
+        if a.lower() in ("roll", "noroll"):
+            roll_forward = a.lower() == "roll"
+        else:
+            threshold = int(a)
+    return Rule(form_code, frequency, offset_months, due_day, roll_forward, threshold)
+
+
+def format_rules(rules: DeadlineRules, default_thresholds: Dict[str, int]) -> str:
+    overridden = {(r.form_code, r.frequency) for r in rules.overrides}
+    lines = ["📅 Quy tắc hạn nộp:"]
+    for r in rules.rules():
+        day = "ngày cuối tháng" if not r.due_day else f"ngày {r.due_day}"
+        thr = r.threshold_days if r.threshold_days is not None else default_thresholds.get(r.frequency, default_thresholds["default"])
+        roll = ", lùi sang ngày làm việc kế tiếp" if r.roll_forward else ""
+        src = "" if (r.form_code, r.frequency) in overridden else " (mặc định)"
+        lines.append(f"• {r.form_code} {r.frequency}: {day}, {r.offset_months} tháng sau kỳ{roll}; nhắc trước {thr} ngày làm việc{src}")
+    return "\n".join(lines)
@@ -0,0 +1,160 @@
+# bot/services/export.py
+# /export: one row per (company, requirement) of a team with its latest submission and the
+# status of the period currently due, written to a CSV/XLSX file.
+#
+# Rows come from a single query read through a server-side cursor and are written straight
+# to a temporary file, so memory stays flat whatever the team size.
+import csv
+import io
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import IO, Dict, List, Optional, Tuple
+
+from bot.db.database import get_read_conn
+from bot.services.deadline_rules import ANY_FORM, FREQUENCIES, get_rules
+from bot.services.holiday_service import get_holidays
+from bot.services.reminder_service import THRESHOLDS, TIMEZONE, _submission_lookback_days
+from bot.utils import ky_thue_key
+
+FETCH_SIZE = 2000
+HEADER = [
+    "MST", "Tên công ty", "Trạng thái công ty", "Owner", "Owner Telegram ID",
+    "Tờ khai", "Tần suất", "Kỳ cần nộp", "Hạn nộp", "Còn (ngày làm việc)", "Tình trạng",
+    "Kỳ nộp gần nhất", "Thời điểm nộp gần nhất",
+]
+
+# due(form_code, frequency, period_key): currently due period per rule, passed as arrays;
+# a requirement uses its form's own rule and falls back to the "*" rule of its frequency
+_EXPORT_SQL = """
+WITH due(form_code, frequency, period_key) AS (
+    SELECT * FROM unnest(%(due_forms)s::text[], %(due_freqs)s::text[], %(due_keys)s::int[])
+)
+SELECT c.company_tax_id, c.company_name, c.status, c.owner_username, c.owner_telegram_id,
+       r.form_code, r.period, last.ky_thue, last.created_at, (cur.ok IS NOT NULL)
+FROM companies c
+LEFT JOIN requirements r ON r.company_tax_id = c.company_tax_id
+LEFT JOIN due df ON df.form_code = r.form_code AND df.frequency = lower(r.period)
+LEFT JOIN due dd ON dd.form_code = %(any_form)s AND dd.frequency = lower(r.period)
+LEFT JOIN LATERAL (
+    SELECT s.ky_thue, s.created_at FROM submissions s
+    WHERE s.company_tax_id = c.company_tax_id AND s.form_code = r.form_code AND s.created_at >= %(since)s
+    ORDER BY s.created_at DESC LIMIT 1
+) last ON TRUE
+LEFT JOIN LATERAL (
+    SELECT 1 AS ok FROM submissions s
+    WHERE s.company_tax_id = c.company_tax_id AND s.form_code = r.form_code
+      AND s.period_key = COALESCE(df.period_key, dd.period_key) AND s.created_at >= %(since)s
+    LIMIT 1
+) cur ON TRUE
+WHERE c.team_id = %(team_id)s
+ORDER BY c.company_tax_id, r.form_code, r.period
+"""
+
+
+class _Writer:
+    """Row sink for CSV (plain temp file) or XLSX (openpyxl write-only workbook)."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        if fmt == "xlsx":
+            try:
+                import openpyxl  # optional and slow to import: only loaded for .xlsx
+            except ImportError:
+                raise ValueError("Máy chủ chưa cài openpyxl nên chưa xuất được .xlsx — hãy dùng /export csv.") from None
+            self.wb = openpyxl.Workbook(write_only=True)
+            self.ws = self.wb.create_sheet("export")
+        else:
+            self.file = tempfile.TemporaryFile("w+b")
+            self.text = io.TextIOWrapper(self.file, encoding="utf-8-sig", newline="")
+            self.csv = csv.writer(self.text)
+
+    def write(self, row):
+        if self.fmt == "xlsx":
+            self.ws.append(row)
+        else:
+            self.csv.writerow(["" if v is None else v for v in row])
+
+    def close(self) -> IO[bytes]:
+        if self.fmt == "xlsx":
+            f = tempfile.TemporaryFile("w+b")
+            self.wb.save(f)
+        else:
+            self.text.flush()
+            self.text.detach()
+            f = self.file
+        f.seek(0)
+        return f
+
+
+def _due_arrays(rules, compiled, ref_date: date) -> Dict[str, List]:
+    """Period key currently due for every rule, as the array parameters of _EXPORT_SQL."""
+    forms, freqs, keys = [], [], []
+    for rule in rules.rules():
+        hit = compiled.due(rule.form_code, rule.frequency, ref_date)
+        forms.append(rule.form_code)
+        freqs.append(rule.frequency)
+        keys.append(ky_thue_key(hit[1]) if hit else None)
+    return {"due_forms": forms, "due_freqs": freqs, "due_keys": keys}
+
+
+def export_team(chat_id: int, fmt: str = "csv", ref_date: Optional[date] = None) -> Tuple[IO[bytes], Dict[str, int]]:
+    """
+    Write the export of the team of `chat_id` to a temporary file (positioned at 0).
+    Returns (file, stats) with stats = {companies, requirements, outstanding}. Blocking: run in a thread.
+    """
+    ref_date = ref_date or datetime.now(TIMEZONE).date()
+    stats = {"companies": 0, "requirements": 0, "outstanding": 0}
+    writer = _Writer(fmt)
+    conn = get_read_conn(chat_id)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM teams WHERE group_chat_id = %s", (chat_id,))
+        t = cur.fetchone()
+        if not t:
+            raise ValueError("Group chưa được đăng ký làm team. Owner cần /register_team trước.")
+        rules = get_rules(cur)
+        compiled = rules.compile(get_holidays(cur))
+        params = _due_arrays(rules, compiled, ref_date)
+        params.update(
+            team_id=t[0],
+            any_form=ANY_FORM,
+            since=ref_date - timedelta(days=_submission_lookback_days()),
+        )
+
+        writer.write(HEADER)
+        rows = conn.cursor(name="team_export")
+        rows.itersize = FETCH_SIZE
+        rows.execute(_EXPORT_SQL, params)
+        last_mst = None
+        for mst, name, status, owner_un, owner_id, form_code, period, last_ky, last_at, submitted in rows:
+            if mst != last_mst:
+                stats["companies"] += 1
+                last_mst = mst
+            if form_code is None:
+                writer.write([mst, name, status, owner_un, owner_id] + [None] * 8)
+                continue
+            stats["requirements"] += 1
+            freq = (period or "").lower()
+            hit = compiled.due(form_code, freq, ref_date) if freq in FREQUENCIES else None
+            if hit is None:
+                writer.write([mst, name, status, owner_un, owner_id, form_code, period, None, None, None, None, last_ky, last_at])
+                continue
+            deadline, due_period, days_left, thr = hit
+            if submitted:
+                state = "Đã nộp"
+            else:
+                stats["outstanding"] += 1
+                thr = thr if thr is not None else THRESHOLDS.get(freq, THRESHOLDS["default"])
+                state = "Cần nộp gấp" if days_left <= thr else "Chưa nộp"
+            writer.write([
+                mst, name, status, owner_un, owner_id, form_code, period, due_period,
+                deadline, days_left, state, last_ky, last_at,
+            ])
+        rows.close()
+    finally:
+        conn.close()
+    return writer.close(), stats
+
+
+def export_filename(fmt: str, ref_date: Optional[date] = None) -> str:
+    return f"export_{(ref_date or datetime.now(TIMEZONE).date()).strftime('%Y%m%d')}.{fmt}"
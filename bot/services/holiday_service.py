@@ -0,0 +1,150 @@
+# bot/services/holiday_service.py
+# Public holidays: loaded once into a sorted tuple of dates, refreshed after every change made
+# through this module and at least every HOLIDAY_CACHE_TTL seconds (edits made directly in SQL).
+import os
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bot.db.database import get_conn
+
+_holidays: Optional[Tuple[date, ...]] = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+# "<date> [note]" or "<date> - <date> [note]" (multi-day holidays such as Tết)
+_DATE_RE = r"(\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/-]\d{1,2}[/-]\d{4})"
+_LINE_RE = re.compile(rf"^{_DATE_RE}(?:\s*(?:-|–|đến)\s*{_DATE_RE})?\s*(.*)$")
+
+
+def cache_ttl() -> float:
+    return float(os.getenv("HOLIDAY_CACHE_TTL", "3600"))
+
+
+def load_holidays(cur) -> Tuple[date, ...]:
+    """Sorted, de-duplicated holiday dates straight from the database."""
+    cur.execute("SELECT DISTINCT date FROM holidays ORDER BY date")
+    return tuple(r[0] for r in cur.fetchall())
+
+
+def get_holidays(cur=None) -> Tuple[date, ...]:
+    """Cached holidays; reloaded after invalidate_holidays() or when the TTL expires."""
+    global _holidays, _loaded_at
+    holidays = _holidays
+    if holidays is not None and time.monotonic() - _loaded_at < cache_ttl():
+        return holidays
+    with _lock:
+        if _holidays is None or time.monotonic() - _loaded_at >= cache_ttl():
+            if cur is not None:
+                _holidays = load_holidays(cur)
+            else:
+                conn = get_conn()
+                try:
+                    _holidays = load_holidays(conn.cursor())
+                finally:
+                    conn.close()
+            _loaded_at = time.monotonic()
+        return _holidays
+
+
+def invalidate_holidays():
+    global _holidays
+    _holidays = None
+
+
+def _parse_date(text: str) -> date:
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"ngày không hợp lệ: {text}")
+
+
+def parse_holiday_lines(text: str) -> Tuple[List[Tuple[date, Optional[str]]], List[str]]:
+    """
+    Parse one holiday per line: "YYYY-MM-DD [ghi chú]", "DD/MM/YYYY [ghi chú]" or a range
+    "DD/MM/YYYY - DD/MM/YYYY [ghi chú]". Returns (entries, errors); entries are (date, note).
+    """
+    entries: Dict[date, Optional[str]] = {}
+    errors = []
+    for n, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = _LINE_RE.match(line)
+        if not m:
+            errors.append(f"dòng {n}: không đọc được ngày")
+            continue
+        try:
+            start = _parse_date(m.group(1))
+            end = _parse_date(m.group(2)) if m.group(2) else start
+        except ValueError as e:
+            errors.append(f"dòng {n}: {e}")
+            continue
+        if end < start or (end - start).days > 31:
+            errors.append(f"dòng {n}: khoảng ngày không hợp lệ")
+            continue
+        note = m.group(3).strip() or None
+        d = start
+        while d <= end:
+            entries[d] = note
+            d += timedelta(days=1)
+    return sorted(entries.items()), errors
+
+
+def import_holidays(entries: Sequence[Tuple[date, Optional[str]]], replace_year: Optional[int] = None) -> int:
+    """
+    Upsert holidays in one transaction. replace_year: delete that year's holidays first,
+    so a re-import of the official calendar also removes dates that were dropped.
+    Returns the number of dates written.
+    """
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        if replace_year is not None:
+            cur.execute("DELETE FROM holidays WHERE date >= %s AND date < %s", (date(replace_year, 1, 1), date(replace_year + 1, 1, 1)))
+        cur.executemany(
+            "INSERT INTO holidays(date, note) VALUES (%s, %s) ON CONFLICT (date) DO UPDATE SET note = EXCLUDED.note",
+            list(entries),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_holidays()
+    return len(entries)
+
+
+def clear_year(year: int) -> int:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM holidays WHERE date >= %s AND date < %s", (date(year, 1, 1), date(year + 1, 1, 1)))
+        deleted = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_holidays()
+    return deleted
+
+
+def list_year(year: int) -> List[Tuple[date, Optional[str]]]:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT date, note FROM holidays WHERE date >= %s AND date < %s ORDER BY date", (date(year, 1, 1), date(year + 1, 1, 1)))
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def format_year(year: int, rows: Sequence[Tuple[date, Optional[str]]]) -> str:
+    if not rows:
+        return f"Chưa có ngày nghỉ lễ nào cho năm {year}."
+    lines = [f"📅 Ngày nghỉ lễ năm {year} ({len(rows)} ngày):"]
+    for d, note in rows:
+        lines.append(f"• {d.strftime('%d/%m/%Y')}" + (f" — {note}" if note else ""))
+    return "\n".join(lines)
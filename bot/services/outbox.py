@@ -0,0 +1,351 @@
+# bot/services/outbox.py
+# Transactional outbox for reminder messages.
+#
+# A reminder run (daily / hourly) first writes every rendered message to reminder_outbox under
+# a run key ("daily:2026-06-18", "hourly:2026-06-18T09"), in one transaction. The dispatcher then
+# claims pending rows, sends them (chats in parallel, rows of one chat in seq order) and records
+# each outcome (state, message_id, error) in batches; the reminders_sent rows of a sent message
+# are written in the same transaction as its "sent" state, so bookkeeping happens exactly once.
+#
+# Re-running a run key never renders it again: it only drains what is still pending, so a crash
+# mid-run resumes where it stopped. Rows claimed by a sender that died before recording the
+# outcome are retried after OUTBOX_LEASE_SECONDS (at-least-once for those few rows).
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import execute_values
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter
+
+from bot.db import queries
+from bot.db.database import get_conn
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+
+# (id, state, message_id, error)
+Result = Tuple[int, str, Optional[int], Optional[str]]
+
+
+def concurrency() -> int:
+    return max(1, int(os.getenv("OUTBOX_CONCURRENCY", "8")))
+
+
+def flush_size() -> int:
+    return max(1, int(os.getenv("OUTBOX_FLUSH_SIZE", "50")))
+
+
+def max_attempts() -> int:
+    return max(1, int(os.getenv("OUTBOX_MAX_ATTEMPTS", "3")))
+
+
+def lease_seconds() -> int:
+    return int(os.getenv("OUTBOX_LEASE_SECONDS", "600"))
+
+
+def claim_batch() -> int:
+    return max(1, int(os.getenv("OUTBOX_CLAIM_BATCH", "1000")))
+
+
+def retention_days() -> int:
+    return int(os.getenv("OUTBOX_RETENTION_DAYS", "30"))
+
+
+def run_exists(run_key: str) -> bool:
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        return queries.fetchone(cur, queries.OUTBOX_RUN_EXISTS, (run_key,)) is not None
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def enqueue(run_key: str, messages: Sequence[Dict[str, Any]]) -> int:
+    """
+    Write the messages of a run in one transaction; returns the number of rows written
+    (0 when the run was already enqueued, possibly by another instance).
+    messages: [{"chat_id", "team_id", "mode", "note", "text", "parse_mode", "records": [(rid, deadline_iso)]}]
+    """
+    if not messages:
+        return 0
+    rows = [
+        (run_key, seq, m.get("team_id"), m.get("chat_id"), m["mode"], m.get("note"), m["text"], m.get("parse_mode"),
+         [rid for rid, _ in m.get("records", [])], [dl for _, dl in m.get("records", [])])
+        for seq, m in enumerate(messages)
+    ]
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        # serialise instances enqueueing the same run; the loser sees the rows and writes nothing
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (run_key,))
+        if queries.fetchone(cur, queries.OUTBOX_RUN_EXISTS, (run_key,)) is not None:
+            conn.rollback()
+            return 0
+        execute_values(
+            cur,
+            """INSERT INTO reminder_outbox(run_key, seq, team_id, chat_id, mode, note, text, parse_mode,
+                                           requirement_ids, remind_for_dates)
+               VALUES %s ON CONFLICT (run_key, seq) DO NOTHING""",
+            rows,
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::integer[], %s::date[])",
+            page_size=500,
+        )
+        conn.commit()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def claim(run_key: str, limit: int) -> List[tuple]:
+    """
+    Mark up to `limit` claimable rows of the run as sending; returns (id, seq, chat_id, text, parse_mode) by seq.
+    A row whose lease expired on each of its OUTBOX_MAX_ATTEMPTS claims (the send keeps killing the
+    worker) is marked failed by the same statement instead of being resent to the group forever.
+    """
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        rows = queries.fetchall(cur, queries.OUTBOX_CLAIM, (run_key, lease_seconds(), max_attempts(), limit))
+        conn.commit()
+        return sorted(rows, key=lambda r: r[1])
+    finally:
+        conn.close()
+
+
+def record_results(results: Sequence[Result]) -> int:
+    """
+    Store send outcomes and, for sent rows, their reminders_sent records, in one transaction.
+    Only rows still in "sending" are updated, so an outcome is never booked twice.
+    """
+    if not results:
+        return 0
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        updated = execute_values(
+            cur,
+            """UPDATE reminder_outbox o
+               SET state = v.state, message_id = v.message_id, error = v.error,
+                   sent_at = CASE WHEN v.state = 'sent' THEN NOW() END
+               FROM (VALUES %s) AS v(id, state, message_id, error)
+               WHERE o.id = v.id AND o.state = 'sending'
+               RETURNING o.id, o.state""",
+            list(results),
+            template="(%s::bigint, %s, %s::bigint, %s)",
+            page_size=len(results),
+            fetch=True,
+        )
+        sent_ids = [rid for rid, state in updated if state == SENT]
+        if sent_ids:
+            queries.execute(cur, queries.OUTBOX_RECORD_SENT, (sent_ids,))
+        conn.commit()
+        return len(updated)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def retry_failed(run_key: str) -> int:
+    """Put the failed rows of a run back to pending; returns how many."""
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        n = queries.execute(cur, queries.OUTBOX_RETRY_FAILED, (run_key,)).rowcount
+        conn.commit()
+        return n
+    finally:
+        conn.close()
+
+
+def cooldown_left(prefix: str, minutes: int) -> float:
+    """
+    Seconds until `minutes` have passed since the latest run whose key starts with prefix
+    (0 when there is none or it is older). Used to rate-limit manual runs per team.
+    """
+    if minutes <= 0:
+        return 0.0
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        row = queries.fetchone(cur, queries.OUTBOX_COOLDOWN_LEFT, (minutes, prefix + "%"))
+        return max(0.0, float(row[0])) if row and row[0] is not None else 0.0
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def run_summary(limit: int = 10) -> List[Dict[str, Any]]:
+    """State counts of the most recent runs, newest first."""
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT run_key, MIN(created_at) AS created,
+                      COUNT(*) FILTER (WHERE state = 'pending'),
+                      COUNT(*) FILTER (WHERE state = 'sending'),
+                      COUNT(*) FILTER (WHERE state = 'sent'),
+                      COUNT(*) FILTER (WHERE state = 'failed')
+               FROM reminder_outbox GROUP BY run_key ORDER BY created DESC LIMIT %s""",
+            (limit,),
+        )
+        return [
+            {"run_key": r[0], "created_at": r[1], PENDING: r[2], SENDING: r[3], SENT: r[4], FAILED: r[5]}
+            for r in cur.fetchall()
+        ]
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def purge(days: Optional[int] = None) -> int:
+    """Delete finished rows older than OUTBOX_RETENTION_DAYS; returns how many."""
+    days = retention_days() if days is None else days
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM reminder_outbox WHERE created_at < NOW() - make_interval(days => %s) AND state IN ('sent', 'failed')",
+            (days,),
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def format_summary(runs: List[Dict[str, Any]]) -> str:
+    if not runs:
+        return "Outbox trống."
+    lines = ["📬 Outbox nhắc việc (mới nhất trước):"]
+    for r in runs:
+        lines.append(f"• {r['run_key']}: đã gửi {r[SENT]}, chờ {r[PENDING]}, đang gửi {r[SENDING]}, lỗi {r[FAILED]}")
+    return "\n".join(lines)
+
+
+def _seconds(value) -> float:
+    """RetryAfter.retry_after is an int in PTB 20 and a timedelta in later releases."""
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value if value is not None else 1)
+
+
+class _FloodGate:
+    """Shared pause: a RetryAfter from Telegram holds every sender, not just the one that hit it."""
+
+    def __init__(self):
+        self.until = 0.0
+        self.hits = 0
+
+    def pause(self, seconds: float):
+        self.hits += 1
+        self.until = max(self.until, time.monotonic() + seconds)
+
+    async def wait(self):
+        while True:
+            delay = self.until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+async def _send_one(bot, row: tuple, gate: _FloodGate) -> Result:
+    row_id, _, chat_id, text, parse_mode = row
+    if not chat_id:
+        # nothing to deliver to (team without group); book the reminder like before
+        return row_id, SENT, None, None
+    error = None
+    attempts = 0
+    while attempts < max_attempts():
+        await gate.wait()
+        try:
+            msg = await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            return row_id, SENT, getattr(msg, "message_id", None), None
+        except RetryAfter as e:
+            # flood control is not a failure of this message: wait and resend, no attempt used
+            logger.warning("[outbox] flood control, pausing %ss", e.retry_after)
+            gate.pause(_seconds(e.retry_after))
+        except (Forbidden, BadRequest, ChatMigrated) as e:
+            # bot removed from the group, chat gone, bad markup: resending cannot help
+            return row_id, FAILED, None, f"{type(e).__name__}: {e}"
+        except NetworkError as e:
+            # timeouts / connection errors: back off and resend, up to OUTBOX_MAX_ATTEMPTS
+            attempts += 1
+            error = f"{type(e).__name__}: {e}"
+            if attempts < max_attempts():
+                await asyncio.sleep(min(30, 2 ** attempts))
+        except Exception as e:
+            logger.exception("[outbox] send to chat %s failed", chat_id)
+            return row_id, FAILED, None, f"{type(e).__name__}: {e}"
+    return row_id, FAILED, None, error
+
+
+async def dispatch(bot, run_key: str, min_interval: float = 0.0) -> Dict[str, int]:
+    """
+    Drain the pending rows of a run. Chats are served concurrently (OUTBOX_CONCURRENCY),
+    messages of one chat strictly in seq order; outcomes are stored every OUTBOX_FLUSH_SIZE.
+    min_interval: minimum seconds between two sends to the same chat (0 = as fast as allowed).
+    Returns counts: claimed / sent / failed / flood_waits.
+    """
+    counts = {"claimed": 0, SENT: 0, FAILED: 0, "flood_waits": 0}
+    gate = _FloodGate()
+    sem = asyncio.Semaphore(concurrency())
+    buffer: List[Result] = []
+    # flushes run as their own tasks so cancelling a chat sender never drops a batch in flight
+    flushes: List[asyncio.Future] = []
+
+    def flush(force: bool = False):
+        if buffer and (force or len(buffer) >= flush_size()):
+            batch = buffer[:]
+            del buffer[:]
+            flushes.append(asyncio.ensure_future(asyncio.to_thread(record_results, batch)))
+
+    # chat_id -> time of its latest send, kept across claim batches for min_interval
+    last_sent: Dict[Any, float] = {}
+
+    async def run_chat(rows: List[tuple]):
+        async with sem:
+            for row in rows:
+                chat_id = row[2]
+                if min_interval and chat_id in last_sent:
+                    await asyncio.sleep(max(0.0, last_sent[chat_id] + min_interval - time.monotonic()))
+                last_sent[chat_id] = time.monotonic()
+                result = await _send_one(bot, row, gate)
+                counts[result[1]] += 1
+                buffer.append(result)
+                flush()
+
+    try:
+        while True:
+            rows = await asyncio.to_thread(claim, run_key, claim_batch())
+            if not rows:
+                break
+            counts["claimed"] += len(rows)
+            by_chat: Dict[Any, List[tuple]] = {}
+            for row in rows:
+                by_chat.setdefault(row[2], []).append(row)
+            senders = [asyncio.ensure_future(run_chat(chat_rows)) for chat_rows in by_chat.values()]
+            try:
+                await asyncio.gather(*senders)
+            finally:
+                # on error / shutdown stop the other chats before booking what was sent
+                for task in senders:
+                    task.cancel()
+                await asyncio.gather(*senders, return_exceptions=True)
+    finally:
+        # outcomes already known are stored even when the run is interrupted
+        flush(force=True)
+        await asyncio.gather(*flushes)
+    counts["flood_waits"] = gate.hits
+    if counts[FAILED]:
+        logger.warning("[outbox] %s: %s message(s) failed", run_key, counts[FAILED])
+    return counts
@@ -0,0 +1,98 @@
+# bot/services/profiling.py
+# On-demand profiling of synchronous pipelines (cProfile + tracemalloc + query count).
+import cProfile
+import html
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from bot.services.tracing import start_trace, finish_trace
+
+DEFAULT_TOP_N = 15
+
+# cProfile/tracemalloc state is process-wide: run one profile at a time
+_profile_lock = threading.Lock()
+
+
+def profile_call(func: Callable[..., Any], *args, top_n: int = DEFAULT_TOP_N, **kwargs) -> Dict[str, Any]:
+    """
+    Run func(*args, **kwargs) in the calling thread under cProfile and tracemalloc.
+    Intended to be called via asyncio.to_thread. Returns:
+      {"result", "wall_s", "peak_bytes", "queries", "top": [{"function", "ncalls", "tottime", "cumtime"}]}
+    Query count comes from the "sql" spans recorded by the tracing cursor.
+    """
+    with _profile_lock:
+        return _profile_call(func, args, kwargs, top_n)
+
+
+def _profile_call(func, args, kwargs, top_n: int) -> Dict[str, Any]:
+    name = getattr(func, "__name__", "profiled")
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    trace, token = start_trace(f"profile:{name}")
+    prof = cProfile.Profile()
+    error = None
+    t0 = time.perf_counter()
+    prof.enable()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        prof.disable()
+        wall_s = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        finish_trace(trace, token, error)
+
+    return {
+        "result": result,
+        "wall_s": wall_s,
+        "peak_bytes": peak,
+        "queries": trace.count("sql"),
+        "top": _top_functions(prof, top_n),
+    }
+
+
+def _top_functions(prof: cProfile.Profile, top_n: int) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(prof)
+    rows = []
+    for (filename, lineno, funcname), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        if filename == "~":
+            # builtins: "{method 'execute' of ...}"
+            label = funcname
+        else:
+            label = f"{os.path.basename(filename)}:{lineno}({funcname})"
+        rows.append({"function": label, "ncalls": nc, "tottime": tt, "cumtime": ct})
+    # "hot" = most time spent in the function itself
+    rows.sort(key=lambda r: r["tottime"], reverse=True)
+    return rows[:top_n]
+
+
+def format_report(title: str, report: Dict[str, Any]) -> str:
+    """Render a profile report as Telegram HTML (fits in one message for the default top-N)."""
+    lines = [
+        f"{'tottime':>8} {'cumtime':>8} {'ncalls':>7}  function",
+    ]
+    for r in report["top"]:
+        fn = r["function"]
+        if len(fn) > 60:
+            fn = "…" + fn[-59:]
+        lines.append(f"{r['tottime']:8.4f} {r['cumtime']:8.4f} {r['ncalls']:7d}  {fn}")
+    result = report.get("result")
+    summary = [
+        f"<b>{html.escape(title)}</b>",
+        f"• Tổng thời gian: {report['wall_s']:.3f}s",
+        f"• Bộ nhớ đỉnh (tracemalloc): {report['peak_bytes'] / 1024 / 1024:.2f} MiB",
+        f"• Số câu SQL: {report['queries']}",
+    ]
+    if isinstance(result, dict):
+        summary.append("• Kết quả: " + html.escape(", ".join(f"{k}={v}" for k, v in result.items())))
+    return "\n".join(summary) + "\n<pre>" + html.escape("\n".join(lines)) + "</pre>"
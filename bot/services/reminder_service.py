@@ -1,17 +1,25 @@
 # bot/services/reminder_service.py
 import asyncio
 import logging
+import os
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, date, timedelta
-from bot.db.database import get_conn
-from bot.utils import compute_deadline_for_requirement, business_days_between
+from bot.db import queries
+from bot.db.database import get_conn, get_read_conn
+from bot.services import outbox
+from bot.utils import ky_thue_key
+from bot.services.deadline_rules import DeadlineRules, get_rules, np, numpy_enabled
+from bot.services.holiday_service import get_holidays
+from bot.services.scan_model import DueItem, ScanRows
 import pytz
 
 # timezone for app
 TIMEZONE = pytz.timezone("Asia/Bangkok")
 CHUNK_SIZE = 15
+# requirement rows fetched per round trip while building ScanRows
+SCAN_FETCH_SIZE = 5000
 
-# thresholds (configurable)
+# default reminder thresholds (working days) for deadline rules without their own threshold
 THRESHOLDS = {
     "monthly": 3,
     "quarterly": 3,
@@ -29,7 +37,137 @@ def _deadline_to_midnight_next_day(deadline_date: date) -> datetime:
     return datetime(deadline_date.year, deadline_date.month, deadline_date.day, 0, 0, 0, tzinfo=TIMEZONE) + timedelta(days=1)
 
 
-def _gather_reminder_payloads(ref_date: Optional[date] = None) -> List[Dict[str, Any]]:
+def _load_holidays(cur) -> List[date]:
+    """Holiday dates (sorted) from the holiday service cache."""
+    return list(get_holidays(cur))
+
+
+def _load_scan_rows(cur, team_id: Optional[int] = None) -> Tuple[List[tuple], ScanRows]:
+    """
+    Load everything the due-item scan needs in two queries:
+      teams: [(team_id, chat_id, team_name)]
+      reqs:  ScanRows of (team_id, requirement_id, company_tax_id, form_code, frequency, company_name, owner_telegram_id)
+    Requirement rows are streamed into the compact column store, SCAN_FETCH_SIZE at a time.
+    team_id: only that team (/force_remind), else every team with a group.
+    """
+    # get teams with chat id
+    if team_id is None:
+        teams = queries.fetchall(cur, queries.SCAN_TEAMS)
+        queries.execute(cur, queries.SCAN_REQUIREMENTS)
+    else:
+        teams = queries.fetchall(cur, queries.SCAN_TEAM, (team_id,))
+        queries.execute(cur, queries.SCAN_TEAM_REQUIREMENTS, (team_id,))
+    reqs = ScanRows()
+    while True:
+        chunk = cur.fetchmany(SCAN_FETCH_SIZE)
+        if not chunk:
+            break
+        reqs.extend(chunk)
+    return teams, reqs
+
+
+def _combo_due(compiled, form_code: Optional[str], freq: Optional[str], ref_date: date,
+               window: bool = True) -> Optional[tuple]:
+    """
+    (deadline, period_str, days_left) when requirements of form_code/freq are due on ref_date, else None.
+    window=False drops the reminder threshold: every deadline not yet passed counts as due.
+    """
+    if not freq:
+        return None
+    try:
+        due = compiled.due(form_code, freq, ref_date)
+    except Exception as e:
+        logger.exception("deadline computation failed for %s/%s: %s", form_code, freq, e)
+        return None
+    if not due:
+        return None
+    # days_left: business days from ref_date to the deadline, both inclusive
+    deadline, period_str, days_left, thr = due
+    if thr is None:
+        thr = THRESHOLDS.get(freq.lower(), THRESHOLDS["default"]) if isinstance(freq, str) else THRESHOLDS["default"]
+    if days_left < 0 or (window and days_left > thr):
+        return None
+    return deadline, period_str, days_left
+
+
+def _due_payloads(teams: List[tuple], reqs, holidays: List[date], ref_date: date,
+                  rules: Optional[DeadlineRules] = None, window: bool = True) -> List[Dict[str, Any]]:
+    """
+    Pure part of the scan: requirements whose deadline is within the threshold on ref_date,
+    grouped per team (same shape as _gather_reminder_payloads, submissions NOT yet excluded).
+    reqs: ScanRows, or an iterable of scan row tuples (converted).
+    rules: deadline rules (built-in defaults when None). A deadline depends only on
+    (form, frequency, ref_date), so it is computed once per distinct pair, not per requirement;
+    the rows are then filtered with a boolean mask over their pair index (numpy when available).
+    window: see _combo_due.
+    """
+    compiled = (rules or DeadlineRules()).compile(holidays)
+    rows = reqs if isinstance(reqs, ScanRows) else ScanRows(reqs)
+    due_by_combo = [_combo_due(compiled, form_code, freq, ref_date, window) for form_code, freq in rows.combos]
+    forms = [form_code for form_code, _ in rows.combos]
+    companies, owners = rows.companies, rows.owners
+    team_ids, requirement_ids, company_idx, combo_idx, owner_idx = (
+        rows.team_ids, rows.requirement_ids, rows.company_idx, rows.combo_idx, rows.owner_idx)
+
+    if numpy_enabled() and len(rows):
+        mask = np.array([due is not None for due in due_by_combo], dtype=bool)
+        selected = np.flatnonzero(mask[np.frombuffer(combo_idx, dtype=np.intc)]).tolist()
+    else:
+        selected = [i for i, k in enumerate(combo_idx) if due_by_combo[k] is not None]
+
+    by_team: Dict[int, List[DueItem]] = {}
+    for i in selected:
+        k, o = combo_idx[i], owner_idx[i]
+        team_id, rid = team_ids[i], requirement_ids[i]
+        due = due_by_combo[k]
+        cid, comp_name = companies[company_idx[i]]
+        if not cid:
+            continue
+        deadline, period_str, days_left = due
+        by_team.setdefault(team_id, []).append(DueItem(
+            rid, cid, comp_name if comp_name else cid, forms[k], period_str, deadline, days_left,
+            owners[o] if o >= 0 else None,
+        ))
+
+    payloads = []
+    for team_id, chat_id, team_name in teams:
+        items = by_team.get(team_id)
+        if items:
+            payloads.append({"team_id": team_id, "chat_id": chat_id, "team_name": team_name, "items": items})
+    return payloads
+
+
+def _drop_submitted(payloads: List[Dict[str, Any]], is_submitted) -> List[Dict[str, Any]]:
+    """Remove items for which is_submitted(company_tax, form_code, period_str) is true; drop empty teams."""
+    out = []
+    for p in payloads:
+        items = [it for it in p["items"] if not is_submitted(it["company_tax"], it["form_code"], it["period_str"])]
+        if items:
+            out.append(dict(p, items=items))
+    return out
+
+
+def _submission_lookback_days() -> int:
+    """How far back submissions are searched; bounds created_at so old partitions are pruned."""
+    return int(os.getenv("SUBMISSION_LOOKBACK_DAYS", "730"))
+
+
+def _load_submitted_keys(cur, payloads: List[Dict[str, Any]], ref_date: date) -> set:
+    """
+    One query for every (company, form, period_key) that already has a submission among the
+    candidates. Matching is on the integer period key, not on the raw ky_thue text.
+    """
+    company_ids = sorted({it.company_tax for p in payloads for it in p["items"]})
+    keys = sorted({k for k in map(ky_thue_key, {it.period_str for p in payloads for it in p["items"]}) if k is not None})
+    if not company_ids or not keys:
+        return set()
+    since = ref_date - timedelta(days=_submission_lookback_days())
+    rows = queries.fetchall(cur, queries.SUBMITTED_KEYS, (company_ids, keys, since))
+    return {(r[0], r[1], r[2]) for r in rows}
+
+
+def _gather_reminder_payloads(ref_date: Optional[date] = None, team_id: Optional[int] = None,
+                              window: bool = True) -> List[Dict[str, Any]]:
     """
     Return a list of payloads per team:
       [
@@ -37,129 +175,47 @@ def _gather_reminder_payloads(ref_date: Optional[date] = None) -> List[Dict[str,
            "team_id": int,
            "chat_id": int,
            "team_name": str,
-           "items": [
-               {"requirement_id": rid, "company_tax": cid, "company_name": name,
-                "form_code": form_code, "period_str": period_str, "deadline": dl_date (date), "days_left": int, "owner_id": owner_telegram_id}
-           ]
+           "items": [DueItem(requirement_id, company_tax, company_name, form_code, period_str,
+                             deadline (date), days_left (int), owner_id)]
          }, ...
       ]
     This function performs DB reads synchronously (but is intended to be called with asyncio.to_thread).
+    Query count is constant (teams, requirements+companies, holidays, submissions) regardless of team size.
+    team_id limits the scan to one team; window=False includes every deadline not yet passed.
     """
     if ref_date is None:
         ref_date = datetime.now(TIMEZONE).date()
 
-    conn = get_conn()
+    # read-only scan: served by the read replica when configured
+    conn = get_read_conn()
     try:
         cur = conn.cursor()
-        # get teams with chat id
-        cur.execute("SELECT id, group_chat_id, name FROM teams WHERE group_chat_id IS NOT NULL")
-        teams = cur.fetchall()
-        payloads = []
-        # load holidays if exists
-        try:
-            cur.execute("SELECT date FROM holidays")
-            rows = cur.fetchall()
-            holidays = [datetime.strptime(r[0], "%Y-%m-%d").date() for r in rows]
-        except Exception:
-            holidays = []
-
-        for t in teams:
-            team_id, chat_id, team_name = t
-            # get companies in team
-            cur.execute("SELECT company_tax_id, company_name, owner_telegram_id FROM companies WHERE team_id = %s", (team_id,))
-            comps = cur.fetchall()
-            if not comps:
-                continue
-            company_ids = [c[0] for c in comps if c and c[0]]
-            if not company_ids:
-                continue
-
-            # prepare IN placeholders for postgres
-            placeholders = ",".join(["%s"] * len(company_ids))
-            # fetch requirements for these companies
-            cur.execute(
-                f"SELECT id, company_tax_id, form_code, period FROM requirements WHERE company_tax_id IN ({placeholders})",
-                tuple(company_ids),
-            )
-            reqs = cur.fetchall()
-            items = []
-            for rid, cid, form_code, freq in reqs:
-                if not freq:
-                    continue
-                # compute deadline (date) and period_str
-                try:
-                    deadline, period_str = compute_deadline_for_requirement(freq, ref_date)
-                except Exception as e:
-                    logger.exception("compute_deadline_for_requirement failed for requirement %s: %s", rid, e)
-                    continue
-                if not deadline:
-                    continue
-                # business days left (exclusive start, inclusive end)
-                days_left = business_days_between(ref_date - timedelta(days=1), deadline, holidays)
-                # threshold: configurable mapping with default fallback
-                thr = THRESHOLDS.get(freq.lower(), THRESHOLDS["default"]) if isinstance(freq, str) else THRESHOLDS["default"]
-                if days_left <= thr and days_left >= 0:
-                    # check submission exists
-                    cur2 = conn.cursor()
-                    cur2.execute(
-                        "SELECT 1 FROM submissions WHERE company_tax_id=%s AND form_code=%s AND ky_thue=%s LIMIT 1",
-                        (cid, form_code, period_str),
-                    )
-                    if cur2.fetchone():
-                        cur2.close()
-                        continue
-                    # load company owner info
-                    cur2.execute("SELECT company_name, owner_telegram_id FROM companies WHERE company_tax_id = %s", (cid,))
-                    cr = cur2.fetchone()
-                    comp_name = cr[0] if cr and cr[0] else cid
-                    owner_id = cr[1] if cr and len(cr) > 1 else None
-                    cur2.close()
-                    items.append({
-                        "requirement_id": rid,
-                        "company_tax": cid,
-                        "company_name": comp_name,
-                        "form_code": form_code,
-                        "period_str": period_str,
-                        "deadline": deadline,
-                        "days_left": days_left,
-                        "owner_id": owner_id
-                    })
-            if items:
-                payloads.append({"team_id": team_id, "chat_id": chat_id, "team_name": team_name, "items": items})
-        return payloads
+        holidays = _load_holidays(cur)
+        teams, reqs = _load_scan_rows(cur, team_id)
+        payloads = _due_payloads(teams, reqs, holidays, ref_date, get_rules(cur), window)
+        if not payloads:
+            return []
+        submitted = _load_submitted_keys(cur, payloads, ref_date)
+        # period strings are shared by many items: parse each distinct one once
+        period_keys = {p: ky_thue_key(p) for p in {it.period_str for pl in payloads for it in pl["items"]}}
+        return _drop_submitted(payloads, lambda cid, form, period: (cid, form, period_keys[period]) in submitted)
     finally:
         conn.close()
 
 
-def _insert_reminder_sent(requirement_id: int, remind_for_date: str, mode: str, note: Optional[str] = None):
+def _build_daily_messages(payloads: List[Dict[str, Any]], ref_date: date, label: str = "tự động") -> List[Dict[str, Any]]:
     """
-    Insert a reminders_sent record. sent_at uses NOW() (Postgres).
-    This function is intended to be run in a thread via asyncio.to_thread.
+    Render gathered payloads into message batches (no I/O):
+      [{"kind": "owner"|"group", "team_id": int, "chat_id": int, "texts": [str], "parse_mode": str|None,
+        "chunk_records": [[(requirement_id, deadline_iso)]]}, ...]
+    Owner batches hold one message per owner; group batches hold CHUNK_SIZE-line chunks.
+    chunk_records[i] are the records listed in texts[i]. label names the run in the owner header.
     """
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO reminders_sent(requirement_id, remind_for_date, mode, sent_at, note) VALUES (%s, %s, %s, NOW(), %s)",
-            (requirement_id, remind_for_date, mode, note),
-        )
-        conn.commit()
-        cur.close()
-    finally:
-        conn.close()
-
-
-async def send_daily_reminders(app, ref_date: Optional[date] = None):
-    """
-    Async wrapper to gather payloads in thread, then send messages (awaiting bot API),
-    and insert reminders_sent after successful send.
-    """
-    if ref_date is None:
-        ref_date = datetime.now(TIMEZONE).date()
-    payloads = await asyncio.to_thread(_gather_reminder_payloads, ref_date)
-    bot = app.bot
-
+    batches: List[Dict[str, Any]] = []
+    # few distinct deadlines: format each once and share the string
+    iso: Dict[date, str] = {}
     for p in payloads:
+        team_id = p.get("team_id")
         chat_id = p.get("chat_id")
         team_name = p.get("team_name")
         items = p.get("items", [])
@@ -169,122 +225,297 @@ async def send_daily_reminders(app, ref_date: Optional[date] = None):
         owner_map: Dict[str, List[Tuple[int, str, str]]] = {}  # owner_id -> list of tuples (rid, line, deadline_iso)
 
         for it in items:
-            line = f"• {it['company_name']} ({it['company_tax']}) — {it['form_code']} — kỳ {it['period_str']} — hạn {it['deadline'].isoformat()} — còn {it['days_left']} ngày làm việc"
-            if it.get("owner_id"):
-                owner_map.setdefault(str(it["owner_id"]), []).append((it["requirement_id"], line, it["deadline"].isoformat()))
+            dl = iso.get(it.deadline)
+            if dl is None:
+                dl = iso[it.deadline] = it.deadline.isoformat()
+            line = f"• {it.company_name} ({it.company_tax}) — {it.form_code} — kỳ {it.period_str} — hạn {dl} — còn {it.days_left} ngày làm việc"
+            if it.owner_id:
+                owner_map.setdefault(str(it.owner_id), []).append((it.requirement_id, line, dl))
             else:
-                group_items_no_owner.append((it["requirement_id"], line, it["deadline"].isoformat()))
+                group_items_no_owner.append((it.requirement_id, line, dl))
 
-        # send owner-specific messages (each owner gets one message)
+        # owner-specific messages (each owner gets one message)
         for owner_id, owner_items in owner_map.items():
-            lines = [f"🔔 Nhắc nộp (tự động) — {ref_date.isoformat()}"]
+            lines = [f"🔔 Nhắc nộp ({label}) — {ref_date.isoformat()}"]
             for _, text_line, dl in owner_items:
                 lines.append(text_line)
             msg_text = "\n".join(lines)
-            try:
-                if owner_id and chat_id:
-                    await bot.send_message(chat_id=chat_id, text=f"<a href=\"tg://user?id={owner_id}\">Người phụ trách</a>\n{msg_text}", parse_mode="HTML")
-                else:
-                    if chat_id:
-                        await bot.send_message(chat_id=chat_id, text=msg_text)
-                # on success: insert reminders_sent records for each rid (do insert in thread)
-                for rid, _, dl in owner_items:
-                    await asyncio.to_thread(_insert_reminder_sent, rid, dl, "initial", "daily initial")
-            except Exception as e:
-                logger.exception("[send_daily_reminders] failed to send owner message for owner %s: %s", owner_id, e)
-                continue
-
-        # then send group-level messages (chunking)
+            batches.append({
+                "kind": "owner",
+                "team_id": team_id,
+                "chat_id": chat_id,
+                "texts": [f"<a href=\"tg://user?id={owner_id}\">Người phụ trách</a>\n{msg_text}"],
+                "parse_mode": "HTML",
+                "chunk_records": [[(rid, dl) for rid, _, dl in owner_items]],
+            })
+
+        # group-level messages (chunking)
         if group_items_no_owner:
             header = f"🔔 Danh sách tờ khai sắp đến hạn ({ref_date.isoformat()}) cho nhóm: {team_name}"
-            lines = [header] + [t for (_, t, _) in group_items_no_owner]
-            # chunk lines into CHUNK_SIZE
-            for i in range(0, len(lines), CHUNK_SIZE):
-                chunk = lines[i:i+CHUNK_SIZE]
-                try:
-                    await bot.send_message(chat_id=chat_id, text="\n".join(chunk))
-                except Exception as e:
-                    logger.exception("[send_daily_reminders] failed group chunk send: %s", e)
-                    continue
-            # insert reminders_sent for group-level items
-            for rid, _, dl in group_items_no_owner:
-                await asyncio.to_thread(_insert_reminder_sent, rid, dl, "initial", "daily initial")
-
-
-async def send_hourly_reminders(app, ref_date: Optional[date] = None):
+            # (line, record) pairs; the header line carries no record
+            entries = [(header, None)] + [(t, (rid, dl)) for (rid, t, dl) in group_items_no_owner]
+            chunks = [entries[i:i+CHUNK_SIZE] for i in range(0, len(entries), CHUNK_SIZE)]
+            batches.append({
+                "kind": "group",
+                "team_id": team_id,
+                "chat_id": chat_id,
+                "texts": ["\n".join(line for line, _ in chunk) for chunk in chunks],
+                "parse_mode": None,
+                "chunk_records": [[rec for _, rec in chunk if rec] for chunk in chunks],
+            })
+    return batches
+
+
+def dry_run_daily(ref_date: Optional[date] = None) -> Dict[str, Any]:
     """
-    Hourly check: find items with deadline within the next 24 hours and send urgent reminders.
-    NOTE: deadline is treated as valid THROUGH the deadline date; we compute midnight next day for comparisons.
+    Run the daily pipeline (gather + render) without sending or writing reminders_sent.
+    Synchronous on purpose so it can be profiled in a single thread.
     """
-    now = datetime.now(TIMEZONE)
     if ref_date is None:
-        ref_date = now.date()
+        ref_date = datetime.now(TIMEZONE).date()
+    payloads = _gather_reminder_payloads(ref_date)
+    batches = _build_daily_messages(payloads, ref_date)
+    return {
+        "ref_date": ref_date.isoformat(),
+        "teams": len(payloads),
+        "items": sum(len(p.get("items", [])) for p in payloads),
+        "messages": sum(len(b["texts"]) for b in batches if b["chat_id"]),
+    }
+
+
+def daily_run_key(ref_date: date) -> str:
+    return f"daily:{ref_date.isoformat()}"
+
+
+def hourly_run_key(now: datetime) -> str:
+    return f"hourly:{now.strftime('%Y-%m-%dT%H')}"
+
+
+def manual_run_key(now: datetime) -> str:
+    """Run key of a /test_daily run: a run of its own, never the scheduled daily:<date> one."""
+    return f"test:{now.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}"
+
+
+def _daily_outbox_messages(batches: List[Dict[str, Any]], mode: str = "initial",
+                           note: str = "daily initial") -> List[Dict[str, Any]]:
+    """One outbox row per message; each chunk carries only the records it lists."""
+    messages = []
+    for b in batches:
+        for text, records in zip(b["texts"], b["chunk_records"]):
+            messages.append({
+                "team_id": b.get("team_id"),
+                "chat_id": b["chat_id"],
+                "mode": mode,
+                "note": note,
+                "text": text,
+                "parse_mode": b["parse_mode"],
+                "records": records,
+            })
+    return messages
 
-    payloads = await asyncio.to_thread(_gather_reminder_payloads, ref_date)
-    bot = app.bot
 
+def _enqueue_daily(ref_date: date, run_key: str, note: str = "daily initial") -> int:
+    """Gather + render the daily run into the outbox (skipped when the run already exists)."""
+    if outbox.run_exists(run_key):
+        return 0
+    payloads = _gather_reminder_payloads(ref_date)
+    return outbox.enqueue(run_key, _daily_outbox_messages(_build_daily_messages(payloads, ref_date), note=note))
+
+
+async def send_daily_reminders(app, ref_date: Optional[date] = None, run_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Daily run through the reminder outbox: gather and render into reminder_outbox (once per
+    run key, daily_run_key(ref_date) by default), then dispatch whatever is still pending.
+    Calling it again for the same day resumes an interrupted run instead of notifying teams
+    twice; a different run_key (manual_run_key) is a separate run. Returns the dispatch counts.
+    """
+    if ref_date is None:
+        ref_date = datetime.now(TIMEZONE).date()
+    note = "daily initial" if run_key is None else "daily manual"
+    if run_key is None:
+        run_key = daily_run_key(ref_date)
+    enqueued = await asyncio.to_thread(_enqueue_daily, ref_date, run_key, note)
+    counts = await outbox.dispatch(app.bot, run_key)
+    return dict(counts, enqueued=enqueued)
+
+
+def _last_hourly_sent(candidates: List[Tuple[Any, DueItem, float]]) -> Dict[Tuple[int, date], Any]:
+    """
+    sent_at of the latest hourly reminder per (requirement_id, deadline) among the candidates
+    of _select_hourly_items, in one query; pairs never reminded are missing from the dict.
+    """
+    requirement_ids = sorted({it.requirement_id for _, it, _ in candidates})
+    if not requirement_ids:
+        return {}
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        rows = queries.fetchall(cur, queries.LAST_HOURLY_SENT, (requirement_ids,))
+        return {(rid, remind_date): sent_at for rid, remind_date, sent_at in rows}
+    finally:
+        conn.close()
+
+
+def _select_hourly_items(payloads: List[Dict[str, Any]], now: datetime) -> List[Tuple[Any, DueItem, float]]:
+    """
+    Pick items whose deadline is within the next 24 hours.
+    Returns [(chat_id, item, hours_left)].
+    """
+    selected = []
     for p in payloads:
         chat_id = p.get("chat_id")
-        items = p.get("items", [])
-        for it in items:
-            deadline_date = it["deadline"]  # a date object
+        for it in p.get("items", []):
             # midnight next day (tz-aware) — represents EXCLUSIVE end of deadline day
-            dl_dt_end = _deadline_to_midnight_next_day(deadline_date)
+            dl_dt_end = _deadline_to_midnight_next_day(it.deadline)
             hours_left = (dl_dt_end - now).total_seconds() / 3600.0
-
-            # send urgent reminders if deadline is within next 24 hours (including any time during the deadline day)
+            # urgent if deadline is within next 24 hours (including any time during the deadline day)
             if 0 <= hours_left <= 24:
-                rid = it["requirement_id"]
-
-                # check last hourly sent to avoid spamming (read DB)
-                def _last_hourly_sent(requirement_id, remind_date):
-                    conn = get_conn()
-                    try:
-                        cur = conn.cursor()
-                        cur.execute(
-                            "SELECT sent_at FROM reminders_sent WHERE requirement_id=%s AND remind_for_date=%s AND mode='hourly' ORDER BY sent_at DESC LIMIT 1",
-                            (requirement_id, remind_date),
-                        )
-                        r = cur.fetchone()
-                        cur.close()
-                        return r[0] if r else None
-                    finally:
-                        conn.close()
-
-                last_sent = await asyncio.to_thread(_last_hourly_sent, rid, deadline_date.isoformat())
-                send_allowed = False
-                if not last_sent:
-                    send_allowed = True
-                else:
-                    try:
-                        # psycopg2 returns a datetime object for TIMESTAMP columns
-                        if isinstance(last_sent, datetime):
-                            last_dt_local = last_sent.astimezone(TIMEZONE)
-                        else:
-                            # fallback: parse string
-                            last_dt_utc = datetime.strptime(last_sent, "%Y-%m-%d %H:%M:%S")
-                            last_dt_utc = last_dt_utc.replace(tzinfo=pytz.UTC)
-                            last_dt_local = last_dt_utc.astimezone(TIMEZONE)
-                        if (now - last_dt_local).total_seconds() >= 3600:
-                            send_allowed = True
-                    except Exception:
-                        logger.exception("[send_hourly_reminders] failed to parse last_sent '%s' for requirement %s", last_sent, rid)
-                        send_allowed = True
-
-                if not send_allowed:
-                    continue
-
-                approx_hours = max(0, int(hours_left))
-                text = f"⏰ [Nhắc gấp] {it['company_name']} ({it['company_tax']}) — {it['form_code']} — kỳ {it['period_str']} — hạn {deadline_date.isoformat()} (~{approx_hours} giờ còn lại). Vui lòng nộp ngay!"
-                try:
-                    owner_id = it.get("owner_id")
-                    if owner_id and chat_id:
-                        await bot.send_message(chat_id=chat_id, text=f"<a href=\"tg://user?id={owner_id}\">Người phụ trách</a>\n{text}", parse_mode="HTML")
-                    else:
-                        if chat_id:
-                            await bot.send_message(chat_id=chat_id, text=text)
-                    # record sent
-                    await asyncio.to_thread(_insert_reminder_sent, rid, deadline_date.isoformat(), "hourly", "hourly reminder")
-                except Exception as e:
-                    logger.exception("[send_hourly_reminders] failed send for requirement %s: %s", rid, e)
-                    continue
+                selected.append((chat_id, it, hours_left))
+    return selected
+
+
+def _hourly_send_allowed(last_sent, now: datetime, requirement_id: int) -> bool:
+    """At most one hourly reminder per requirement per hour."""
+    if not last_sent:
+        return True
+    try:
+        # psycopg2 returns a datetime object for TIMESTAMP columns
+        if isinstance(last_sent, datetime):
+            last_dt_local = last_sent.astimezone(TIMEZONE)
+        else:
+            # fallback: parse string
+            last_dt_utc = datetime.strptime(last_sent, "%Y-%m-%d %H:%M:%S")
+            last_dt_utc = last_dt_utc.replace(tzinfo=pytz.UTC)
+            last_dt_local = last_dt_utc.astimezone(TIMEZONE)
+        return (now - last_dt_local).total_seconds() >= 3600
+    except Exception:
+        logger.exception("[send_hourly_reminders] failed to parse last_sent '%s' for requirement %s", last_sent, requirement_id)
+        return True
+
+
+def _hourly_text(it: DueItem, hours_left: float) -> Tuple[str, Optional[str]]:
+    """Render one urgent reminder; returns (text, parse_mode)."""
+    approx_hours = max(0, int(hours_left))
+    text = f"⏰ [Nhắc gấp] {it.company_name} ({it.company_tax}) — {it.form_code} — kỳ {it.period_str} — hạn {it.deadline.isoformat()} (~{approx_hours} giờ còn lại). Vui lòng nộp ngay!"
+    owner_id = it.owner_id
+    if owner_id:
+        return f"<a href=\"tg://user?id={owner_id}\">Người phụ trách</a>\n{text}", "HTML"
+    return text, None
+
+
+def dry_run_hourly(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Run the hourly pipeline (gather, 24h window, last-sent check) without sending
+    or writing reminders_sent. Synchronous so it can be profiled in a single thread.
+    """
+    if now is None:
+        now = datetime.now(TIMEZONE)
+    payloads = _gather_reminder_payloads(now.date())
+    candidates = _select_hourly_items(payloads, now)
+    last_sent_by_item = _last_hourly_sent(candidates)
+    messages = 0
+    for chat_id, it, _ in candidates:
+        last_sent = last_sent_by_item.get((it.requirement_id, it.deadline))
+        if chat_id and _hourly_send_allowed(last_sent, now, it.requirement_id):
+            messages += 1
+    return {
+        "now": now.isoformat(),
+        "teams": len(payloads),
+        "candidates": len(candidates),
+        "messages": messages,
+    }
+
+
+def _hourly_outbox_messages(payloads: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """Urgent reminders due now (24h window, at most one per requirement per hour) as outbox rows."""
+    team_by_chat = {p.get("chat_id"): p.get("team_id") for p in payloads}
+    messages = []
+    candidates = _select_hourly_items(payloads, now)
+    last_sent_by_item = _last_hourly_sent(candidates)
+    for chat_id, it, hours_left in candidates:
+        rid = it.requirement_id
+        deadline_iso = it.deadline.isoformat()
+        # check last hourly sent to avoid spamming
+        if not _hourly_send_allowed(last_sent_by_item.get((rid, it.deadline)), now, rid):
+            continue
+        text, parse_mode = _hourly_text(it, hours_left)
+        messages.append({
+            "team_id": team_by_chat.get(chat_id),
+            "chat_id": chat_id,
+            "mode": "hourly",
+            "note": "hourly reminder",
+            "text": text,
+            "parse_mode": parse_mode,
+            "records": [(rid, deadline_iso)],
+        })
+    return messages
+
+
+def _enqueue_hourly(ref_date: date, now: datetime) -> int:
+    run_key = hourly_run_key(now)
+    if outbox.run_exists(run_key):
+        return 0
+    payloads = _gather_reminder_payloads(ref_date)
+    return outbox.enqueue(run_key, _hourly_outbox_messages(payloads, now))
+
+
+async def send_hourly_reminders(app, ref_date: Optional[date] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Hourly check: find items with deadline within the next 24 hours and send urgent reminders.
+    NOTE: deadline is treated as valid THROUGH the deadline date; we compute midnight next day for comparisons.
+    now: override the current time (tz-aware), used by benchmarks and replays.
+    Goes through the reminder outbox keyed by the hour, so a restart within the hour resumes the run.
+    """
+    if now is None:
+        now = datetime.now(TIMEZONE)
+    if ref_date is None:
+        ref_date = now.date()
+    enqueued = await asyncio.to_thread(_enqueue_hourly, ref_date, now)
+    counts = await outbox.dispatch(app.bot, hourly_run_key(now))
+    return dict(counts, enqueued=enqueued)
+
+
+def force_remind_interval() -> float:
+    """Seconds between two messages of a /force_remind run (Telegram allows ~20 per minute in a group)."""
+    return max(0.0, float(os.getenv("FORCE_REMIND_INTERVAL", "3")))
+
+
+def force_remind_cooldown_minutes() -> int:
+    """Minimum minutes between two /force_remind runs of the same team."""
+    return max(0, int(os.getenv("FORCE_REMIND_COOLDOWN_MINUTES", "10")))
+
+
+def force_run_prefix(team_id: int) -> str:
+    return f"force:{team_id}:"
+
+
+def force_run_key(team_id: int, now: datetime) -> str:
+    return f"{force_run_prefix(team_id)}{now.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}"
+
+
+def prepare_forced_run(team_id: int, now: datetime, window: bool = True, enqueue: bool = True) -> Dict[str, Any]:
+    """
+    /force_remind for one team on the daily engine: same scan (deadlines, thresholds,
+    submissions excluded) and rendering, mode "forced". window=False lists every deadline
+    not yet passed. With enqueue the messages are written to the outbox under
+    force_run_key(team_id, now); without, nothing is written (preview).
+    Returns counts: items / companies / owner_messages / group_messages / messages, and run_key / enqueued.
+    """
+    ref_date = now.date()
+    payloads = _gather_reminder_payloads(ref_date, team_id=team_id, window=window)
+    batches = _build_daily_messages(payloads, ref_date, label="thủ công")
+    messages = _daily_outbox_messages(batches, mode="forced", note="force_remind")
+    items = [it for p in payloads for it in p["items"]]
+    summary = {
+        "items": len(items),
+        "companies": len({it.company_tax for it in items}),
+        "owner_messages": sum(len(b["texts"]) for b in batches if b["kind"] == "owner"),
+        "group_messages": sum(len(b["texts"]) for b in batches if b["kind"] == "group"),
+        "messages": len(messages),
+        "run_key": None,
+        "enqueued": 0,
+    }
+    if enqueue and messages:
+        summary["run_key"] = force_run_key(team_id, now)
+        summary["enqueued"] = outbox.enqueue(summary["run_key"], messages)
+    return summary
@@ -0,0 +1,157 @@
+# bot/services/retention.py
+# Partition maintenance for the history tables (submissions, reminders_sent):
+# create upcoming monthly partitions and retire partitions older than the retention window.
+#
+#   python -m bot.services.retention            # run maintenance now
+#   python -m bot.services.retention --dry-run  # only list what would be retired
+#
+# Retention per table (months, 0 = keep forever):
+#   RETENTION_MONTHS_REMINDERS_SENT (default 12), RETENTION_MONTHS_SUBMISSIONS (default 0)
+# A retired partition is detached, archived with COPY into RETENTION_ARCHIVE_DIR
+# (default <BACKUP_DIR>/archive) and dropped. RETENTION_ARCHIVE=0 only detaches it,
+# leaving a standalone table behind.
+# Finished reminder_outbox rows older than OUTBOX_RETENTION_DAYS (default 30) are deleted.
+import argparse
+import json
+import logging
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bot.db.database import (
+    PARTITIONED_TABLES,
+    add_months,
+    detach_partition,
+    ensure_partitions,
+    get_conn,
+    list_partitions,
+    month_start,
+)
+from bot.services import outbox
+from bot.services.backup import DEFAULT_CHUNK_BYTES, _ChunkWriter, _table_columns, backup_dir, zstandard
+from bot.services.reminder_service import TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_MONTHS = {
+    "submissions": 0,
+    "reminders_sent": 12,
+}
+
+
+def retention_months(table: str) -> int:
+    return int(os.getenv(f"RETENTION_MONTHS_{table.upper()}", DEFAULT_RETENTION_MONTHS[table]))
+
+
+def archive_dir() -> Path:
+    return Path(os.getenv("RETENTION_ARCHIVE_DIR", backup_dir() / "archive"))
+
+
+def archive_enabled() -> bool:
+    return os.getenv("RETENTION_ARCHIVE", "1").lower() not in ("0", "false", "no")
+
+
+def expired_partitions(cur, table: str, today: Optional[date] = None) -> List[str]:
+    """Partitions of `table` whose whole month is older than the retention window."""
+    months = retention_months(table)
+    if months <= 0:
+        return []
+    cutoff = add_months(month_start(today or datetime.now(TIMEZONE).date()), -months)
+    return [name for name, month in list_partitions(cur, table) if add_months(month, 1) <= cutoff]
+
+
+def archive_partition(cur, table: str, partition: str, out_root: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    COPY a (detached) partition into compressed chunk files plus a manifest.json.
+    The files load back with COPY <table> (columns) FROM STDIN, like a backup chunk.
+    """
+    directory = Path(out_root or archive_dir()) / partition
+    directory.mkdir(parents=True, exist_ok=True)
+    compression = "zstd" if zstandard is not None else "gzip"
+    columns = _table_columns(cur, partition)
+    writer = _ChunkWriter(directory, partition, compression, DEFAULT_CHUNK_BYTES)
+    try:
+        cur.copy_expert(f"COPY (SELECT {', '.join(columns)} FROM {partition} ORDER BY id) TO STDOUT", writer)
+    finally:
+        chunks = writer.close()
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "table": table,
+        "partition": partition,
+        "compression": compression,
+        "columns": columns,
+        "chunks": chunks,
+        "rows": sum(c["rows"] for c in chunks),
+    }
+    with open(directory / "manifest.json", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def apply_retention(today: Optional[date] = None, dry_run: bool = False, conn_factory=get_conn) -> List[Dict[str, Any]]:
+    """
+    Retire expired partitions, one transaction per partition: detach, archive (optional), drop.
+    A failed archive rolls the detach back, so data is never dropped without its archive.
+    """
+    retired = []
+    conn = conn_factory()
+    try:
+        cur = conn.cursor()
+        for table in PARTITIONED_TABLES:
+            for partition in expired_partitions(cur, table, today):
+                if dry_run:
+                    retired.append({"table": table, "partition": partition, "action": "dry-run"})
+                    continue
+                try:
+                    detach_partition(cur, table, partition)
+                    entry = {"table": table, "partition": partition, "action": "detached"}
+                    if archive_enabled():
+                        manifest = archive_partition(cur, table, partition)
+                        cur.execute(f"DROP TABLE {partition}")
+                        entry.update(action="archived", rows=manifest["rows"])
+                    conn.commit()
+                    retired.append(entry)
+                    logger.info("retention: %s", entry)
+                except Exception:
+                    conn.rollback()
+                    logger.exception("retention failed for %s", partition)
+        conn.rollback()
+    finally:
+        conn.close()
+    return retired
+
+
+def run_maintenance(today: Optional[date] = None) -> Dict[str, Any]:
+    """Scheduler entry point: create upcoming partitions, apply retention, purge old outbox rows."""
+    conn = get_conn()
+    try:
+        created = ensure_partitions(conn, today=today)
+    finally:
+        conn.close()
+    return {"created": created, "retired": apply_retention(today), "outbox_purged": outbox.purge()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Partition maintenance for submissions / reminders_sent")
+    parser.add_argument("--dry-run", action="store_true", help="list expired partitions without touching them")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    env_path = Path(__file__).resolve().parents[2] / "config" / "config.env"
+    if env_path.exists():
+        load_dotenv(env_path)
+
+    if args.dry_run:
+        for item in apply_retention(dry_run=True):
+            print(f"would retire {item['partition']}")
+        return
+    result = run_maintenance()
+    print(f"created: {result['created'] or '-'}")
+    for item in result["retired"]:
+        print(f"{item['action']}: {item['partition']} ({item.get('rows', '?')} rows)")
+    print(f"outbox rows purged: {result['outbox_purged']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# bot/services/scan_model.py
+# Compact in-memory model of the reminder scan.
+#
+# ScanRows keeps the requirement rows column-wise in int arrays; company, form/frequency and
+# owner strings are stored once and referenced by index, so 100k requirements cost a few MB
+# instead of one tuple and four fresh strings per row. DueItem is the per-item record of the
+# scan output: __slots__ instead of a dict per item, with the strings shared from ScanRows.
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (team_id, requirement_id, company_tax_id, form_code, frequency, company_name, owner_telegram_id)
+ScanRow = Tuple[int, int, Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+class ScanRows:
+    """Requirement scan rows (SCAN_REQUIREMENTS order); iterates as ScanRow tuples."""
+
+    def __init__(self, rows: Iterable[ScanRow] = ()):
+        self.team_ids = array("i")
+        self.requirement_ids = array("i")
+        self.company_idx = array("i")
+        self.combo_idx = array("i")
+        self.owner_idx = array("i")  # -1 = no owner
+        self.companies: List[Tuple[Optional[str], Optional[str]]] = []  # (tax_id, name)
+        self.combos: List[Tuple[Optional[str], Optional[str]]] = []  # (form_code, frequency)
+        self.owners: List[str] = []
+        self._company_pos: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        self._combo_pos: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        self._owner_pos: Dict[str, int] = {}
+        self.extend(rows)
+
+    def append(self, row: ScanRow):
+        self.extend((row,))
+
+    def extend(self, rows: Iterable[ScanRow]):
+        # hot loop (one pass per scan row): bound methods and tables in locals
+        team_ids, requirement_ids = self.team_ids.append, self.requirement_ids.append
+        company_idx, combo_idx, owner_idx = self.company_idx.append, self.combo_idx.append, self.owner_idx.append
+        companies, company_pos = self.companies, self._company_pos
+        combos, combo_pos = self.combos, self._combo_pos
+        owners, owner_pos = self.owners, self._owner_pos
+        for team_id, rid, cid, form_code, freq, comp_name, owner_id in rows:
+            team_ids(team_id)
+            requirement_ids(rid)
+            key = (cid, comp_name)
+            c = company_pos.get(key)
+            if c is None:
+                c = company_pos[key] = len(companies)
+                companies.append(key)
+            company_idx(c)
+            key = (form_code, freq)
+            k = combo_pos.get(key)
+            if k is None:
+                k = combo_pos[key] = len(combos)
+                combos.append(key)
+            combo_idx(k)
+            if owner_id is None:
+                owner_idx(-1)
+            else:
+                o = owner_pos.get(owner_id)
+                if o is None:
+                    o = owner_pos[owner_id] = len(owners)
+                    owners.append(owner_id)
+                owner_idx(o)
+
+    def __len__(self) -> int:
+        return len(self.requirement_ids)
+
+    def __iter__(self) -> Iterator[ScanRow]:
+        companies, combos, owners = self.companies, self.combos, self.owners
+        for team_id, rid, c, k, o in zip(self.team_ids, self.requirement_ids, self.company_idx, self.combo_idx, self.owner_idx):
+            cid, comp_name = companies[c]
+            form_code, freq = combos[k]
+            yield team_id, rid, cid, form_code, freq, comp_name, owners[o] if o >= 0 else None
+
+    def nbytes(self) -> int:
+        """Size of the index columns (strings not included)."""
+        return sum(col.itemsize * len(col) for col in
+                   (self.team_ids, self.requirement_ids, self.company_idx, self.combo_idx, self.owner_idx))
+
+
+class DueItem:
+    """One due requirement of a team (see reminder_service._due_payloads)."""
+
+    __slots__ = ("requirement_id", "company_tax", "company_name", "form_code", "period_str", "deadline", "days_left", "owner_id")
+
+    def __init__(self, requirement_id, company_tax, company_name, form_code, period_str, deadline, days_left, owner_id):
+        self.requirement_id = requirement_id
+        self.company_tax = company_tax
+        self.company_name = company_name
+        self.form_code = form_code
+        self.period_str = period_str
+        self.deadline = deadline
+        self.days_left = days_left
+        self.owner_id = owner_id
+
+    # mapping-style access, for callers written against the old per-item dicts
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DueItem) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"DueItem({self.requirement_id}, {self.company_tax!r}, {self.form_code!r}, {self.period_str!r}, {self.deadline})"
@@ -0,0 +1,235 @@
+# bot/services/simulation.py
+# Replay the reminder logic over a date range against an in-memory snapshot (no sending, no writes).
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bot.db.database import get_conn
+from bot.utils import ky_thue_key
+from bot.services.deadline_rules import DeadlineRules, Rule, load_rules
+from bot.services.reminder_service import (
+    _load_holidays,
+    _load_scan_rows,
+    _due_payloads,
+    _drop_submitted,
+    _build_daily_messages,
+)
+from bot.services.scan_model import ScanRows
+
+# hourly job runs every 60 minutes; every run of the deadline day is inside the 24h window
+HOURLY_RUNS_PER_DAY = 24
+# Telegram limits used to estimate dispatch time of a job run
+GLOBAL_MSGS_PER_SEC = 30
+GROUP_MSGS_PER_MIN = 20
+
+
+def load_snapshot(conn=None) -> Dict[str, Any]:
+    """
+    Snapshot of everything the reminder scan reads, loaded once:
+      {"taken_at", "teams", "reqs", "holidays", "rules": DeadlineRules,
+       "submissions": {(cid, form, period_key): first created date}}
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_conn()
+    try:
+        cur = conn.cursor()
+        holidays = _load_holidays(cur)
+        teams, reqs = _load_scan_rows(cur)
+        rules = load_rules(cur)
+        cur.execute(
+            "SELECT company_tax_id, form_code, period_key, MIN(created_at) FROM submissions "
+            "WHERE period_key IS NOT NULL GROUP BY company_tax_id, form_code, period_key"
+        )
+        submissions = {}
+        for cid, form, ky, created in cur.fetchall():
+            submissions[(cid, form, ky)] = created.date() if created else None
+        cur.close()
+    finally:
+        if own_conn:
+            conn.close()
+    return {
+        "taken_at": datetime.now().isoformat(timespec="seconds"),
+        "teams": [tuple(t) for t in teams],
+        "reqs": reqs,
+        "holidays": holidays,
+        "rules": rules,
+        "submissions": submissions,
+    }
+
+
+def save_snapshot(snapshot: Dict[str, Any], path: str):
+    data = dict(snapshot)
+    data["holidays"] = [d.isoformat() for d in snapshot["holidays"]]
+    data["reqs"] = [list(r) for r in snapshot["reqs"]]
+    data["rules"] = [list(r) for r in snapshot["rules"].overrides]
+    data["submissions"] = [[cid, form, ky, d.isoformat() if d else None] for (cid, form, ky), d in snapshot["submissions"].items()]
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False)
+
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    data["teams"] = [tuple(t) for t in data["teams"]]
+    data["reqs"] = ScanRows(tuple(r) for r in data["reqs"])
+    data["holidays"] = [date.fromisoformat(d) for d in data["holidays"]]
+    data["rules"] = DeadlineRules([Rule(*r) for r in data.get("rules", [])])
+    data["submissions"] = {
+        (cid, form, ky): (date.fromisoformat(d) if d else None) for cid, form, ky, d in data["submissions"]
+    }
+    return data
+
+
+def _estimate_send_seconds(total: int, peak_per_chat: int) -> float:
+    """Lower bound on dispatch time under the global and per-group Telegram limits."""
+    return max(total / GLOBAL_MSGS_PER_SEC, peak_per_chat * 60.0 / GROUP_MSGS_PER_MIN)
+
+
+def simulate_day(snapshot: Dict[str, Any], day: date) -> Dict[str, Any]:
+    """Replay one day: the 08:30 daily run plus the hourly runs of that day."""
+    t0 = time.perf_counter()
+    submissions = snapshot["submissions"]
+
+    period_keys: Dict[str, Optional[int]] = {}
+
+    def submitted_before(cid, form, period):
+        # a submission counts if it was filed before the simulated day
+        # (None = created_at unknown, treat as already filed)
+        pk = period_keys.get(period)
+        if pk is None and period not in period_keys:
+            pk = period_keys[period] = ky_thue_key(period)
+        key = (cid, form, pk)
+        if key not in submissions:
+            return False
+        created = submissions[key]
+        return created is None or created < day
+
+    payloads = _due_payloads(snapshot["teams"], snapshot["reqs"], snapshot["holidays"], day, snapshot.get("rules"))
+    payloads = _drop_submitted(payloads, submitted_before)
+    batches = _build_daily_messages(payloads, day)
+    compute_ms = (time.perf_counter() - t0) * 1000
+
+    daily_per_chat: Dict[Any, int] = {}
+    for b in batches:
+        if b["chat_id"]:
+            daily_per_chat[b["chat_id"]] = daily_per_chat.get(b["chat_id"], 0) + len(b["texts"])
+    # hourly: items whose deadline is this day get one urgent message per hourly run
+    hourly_per_chat: Dict[Any, int] = {}
+    for p in payloads:
+        due_today = sum(1 for it in p["items"] if it.deadline == day)
+        if due_today and p["chat_id"]:
+            hourly_per_chat[p["chat_id"]] = due_today
+
+    daily_total = sum(daily_per_chat.values())
+    peak_daily = max(daily_per_chat.values(), default=0)
+    hourly_run = sum(hourly_per_chat.values())
+    peak_hourly = max(hourly_per_chat.values(), default=0)
+    return {
+        "date": day.isoformat(),
+        "items": sum(len(p["items"]) for p in payloads),
+        "daily_messages": daily_total,
+        "hourly_messages": hourly_run * HOURLY_RUNS_PER_DAY,
+        "peak_chat_daily": peak_daily,
+        "peak_chat_hourly_run": peak_hourly,
+        "compute_ms": round(compute_ms, 2),
+        "est_daily_send_s": round(_estimate_send_seconds(daily_total, peak_daily), 1),
+        "est_hourly_send_s": round(_estimate_send_seconds(hourly_run, peak_hourly), 1),
+    }
+
+
+def simulate(start: date, end: date, snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Replay the reminder engine for every day in [start, end] without sending anything.
+    Reports per-day message volume, peak per-chat bursts and job runtime (scan compute time
+    plus an estimate of dispatch time under Telegram limits).
+    """
+    if end < start:
+        raise ValueError("end must not be before start")
+    if snapshot is None:
+        snapshot = load_snapshot()
+    if not isinstance(snapshot["reqs"], ScanRows) or snapshot.get("rules") is None:
+        snapshot = dict(snapshot, reqs=ScanRows(snapshot["reqs"]), rules=snapshot.get("rules") or DeadlineRules())
+    # deadlines of every (form, frequency) pair over the whole range in one vectorised pass;
+    # the per-day scans then find them memoised
+    compiled = snapshot["rules"].compile(snapshot["holidays"])
+    dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    for form_code, freq in snapshot["reqs"].combos:
+        compiled.due_many(form_code, freq, dates)
+
+    days: List[Dict[str, Any]] = []
+    cur = start
+    while cur <= end:
+        days.append(simulate_day(snapshot, cur))
+        cur += timedelta(days=1)
+
+    busiest = sorted(days, key=lambda d: d["daily_messages"] + d["hourly_messages"], reverse=True)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "snapshot_taken_at": snapshot.get("taken_at"),
+        "requirements": len(snapshot["reqs"]),
+        "totals": {
+            "daily_messages": sum(d["daily_messages"] for d in days),
+            "hourly_messages": sum(d["hourly_messages"] for d in days),
+            "max_compute_ms": max((d["compute_ms"] for d in days), default=0),
+            "max_peak_chat_daily": max((d["peak_chat_daily"] for d in days), default=0),
+            "max_peak_chat_hourly_run": max((d["peak_chat_hourly_run"] for d in days), default=0),
+        },
+        "busiest_days": [d["date"] for d in busiest[:5] if d["daily_messages"] or d["hourly_messages"]],
+        "days": days,
+    }
+
+
+def format_summary(report: Dict[str, Any], max_days: int = 10) -> str:
+    t = report["totals"]
+    lines = [
+        f"📊 Mô phỏng nhắc nhở {report['start']} → {report['end']} ({report['requirements']} requirements)",
+        f"• Tổng tin daily: {t['daily_messages']} — hourly: {t['hourly_messages']}",
+        f"• Đỉnh / nhóm: daily {t['max_peak_chat_daily']} tin, hourly {t['max_peak_chat_hourly_run']} tin/lượt",
+        f"• Thời gian quét lớn nhất: {t['max_compute_ms']:.1f} ms",
+        "",
+        "Ngày — daily / hourly — đỉnh nhóm — ước tính gửi daily",
+    ]
+    by_date = {d["date"]: d for d in report["days"]}
+    for ds in report["busiest_days"][:max_days]:
+        d = by_date[ds]
+        lines.append(f"{ds} — {d['daily_messages']} / {d['hourly_messages']} — {d['peak_chat_daily']} — {d['est_daily_send_s']}s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate reminder volume over a date range (no sending).")
+    parser.add_argument("start", type=date.fromisoformat)
+    parser.add_argument("end", type=date.fromisoformat)
+    parser.add_argument("--snapshot", help="read the snapshot from this JSON file instead of the database")
+    parser.add_argument("--save-snapshot", help="write the loaded snapshot to this JSON file")
+    parser.add_argument("--out", help="write the full JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        snapshot = read_snapshot(args.snapshot)
+    else:
+        from dotenv import load_dotenv
+        env_path = os.path.join(os.path.dirname(__file__), "..", "..", "config", "config.env")
+        if os.path.exists(env_path):
+            load_dotenv(env_path)
+        snapshot = load_snapshot()
+    if args.save_snapshot:
+        save_snapshot(snapshot, args.save_snapshot)
+
+    report = simulate(args.start, args.end, snapshot)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        print(format_summary(report))
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# bot/services/tracing.py
+# Lightweight per-handler tracing: spans for Telegram API calls, SQL statements and parsing.
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from telegram.ext import Application, CommandHandler, MessageHandler
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# the trace of the handler currently running (copied into asyncio.to_thread workers)
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_file_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def slow_handler_ms() -> float:
+    """Handlers slower than this (TRACE_SLOW_MS, default 1000) are logged with all their spans."""
+    return _env_float("TRACE_SLOW_MS", 1000.0)
+
+
+def slow_query_ms() -> float:
+    """SQL statements slower than this (TRACE_SLOW_QUERY_MS, default 200) are logged individually."""
+    return _env_float("TRACE_SLOW_QUERY_MS", 200.0)
+
+
+def sample_rate() -> float:
+    """Fraction of traces (TRACE_SAMPLE_RATE, 0..1, default 0) written in full to TRACE_FILE."""
+    return _env_float("TRACE_SAMPLE_RATE", 0.0)
+
+
+def trace_file() -> str:
+    return os.getenv("TRACE_FILE", "traces.jsonl")
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "chat_id", "user_id", "started_at", "_t0", "spans", "_lock")
+
+    def __init__(self, name: str, chat_id: Optional[int] = None, user_id: Optional[int] = None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        # spans may be added from worker threads (asyncio.to_thread)
+        self._lock = threading.Lock()
+
+    def add_span(self, kind: str, name: str, start: float, duration_ms: float, attrs: Dict[str, Any]):
+        rec = {"kind": kind, "name": name, "offset_ms": round((start - self._t0) * 1000, 2), "duration_ms": round(duration_ms, 2)}
+        if attrs:
+            rec.update(attrs)
+        with self._lock:
+            self.spans.append(rec)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return sum(1 for s in self.spans if s["kind"] == kind)
+
+    def to_dict(self, duration_ms: Optional[float] = None) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "handler": self.name,
+            "chat_id": self.chat_id,
+            "user_id": self.user_id,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration_ms if duration_ms is not None else self.elapsed_ms(), 2),
+            "spans": spans,
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def start_trace(name: str, chat_id: Optional[int] = None, user_id: Optional[int] = None):
+    """Start a trace in the current context; returns (trace, token) for finish_trace()."""
+    trace = Trace(name, chat_id, user_id)
+    return trace, _current_trace.set(trace)
+
+
+def finish_trace(trace: Trace, token, error: Optional[str] = None) -> Dict[str, Any]:
+    """Close a trace: log it when slow, write it to TRACE_FILE when sampled."""
+    _current_trace.reset(token)
+    duration_ms = trace.elapsed_ms()
+    data = trace.to_dict(duration_ms)
+    if error:
+        data["error"] = error
+    if duration_ms >= slow_handler_ms():
+        summary = {k: v for k, v in data.items() if k != "spans"}
+        summary["event"] = "slow_handler"
+        summary["span_counts"] = _span_counts(data["spans"])
+        # keep the log line short: only the slowest spans
+        summary["top_spans"] = sorted(data["spans"], key=lambda s: s["duration_ms"], reverse=True)[:5]
+        logger.warning(json.dumps(summary, ensure_ascii=False, default=str))
+    rate = sample_rate()
+    if rate > 0 and random.random() < rate:
+        _write_trace(data)
+    return data
+
+
+def _span_counts(spans: List[Dict[str, Any]]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for s in spans:
+        out[s["kind"]] = out.get(s["kind"], 0) + 1
+    return out
+
+
+def _write_trace(data: Dict[str, Any]):
+    try:
+        line = json.dumps(data, ensure_ascii=False, default=str)
+        with _file_lock:
+            with open(trace_file(), "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+    except Exception:
+        logger.exception("failed to write sampled trace")
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """
+    Time a block and attach it to the current trace (no-op bookkeeping if there is none).
+    kind: "telegram" | "sql" | "parse" | ...
+    SQL spans slower than TRACE_SLOW_QUERY_MS are logged even outside handler traces.
+    """
+    trace = _current_trace.get()
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - t0) * 1000
+        if trace is not None:
+            trace.add_span(kind, name, t0, duration_ms, attrs)
+        if kind == "sql" and duration_ms >= slow_query_ms():
+            rec = {"event": "slow_query", "statement": name, "duration_ms": round(duration_ms, 2)}
+            rec.update(attrs)
+            if trace is not None:
+                rec["trace_id"] = trace.trace_id
+                rec["handler"] = trace.name
+            logger.warning(json.dumps(rec, ensure_ascii=False, default=str))
+
+
+# string literals ('it''s' included) and numbers that are not part of an identifier or $n
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"(?<![\w$])\d+(?:\.\d+)?(?![\w])")
+
+
+def redact_sql(query) -> str:
+    """
+    Statement text for spans and slow-query logs. Parameters bound via %s never reach the text,
+    but statements expanded client-side (execute_values, mogrify) carry their values inline:
+    string and numeric literals are replaced by ?, placeholders (%s, $1) are kept.
+    Whitespace is collapsed and long statements truncated.
+    """
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed and friends
+        query = str(query)
+    text = " ".join(query.split())
+    text = _SQL_NUMBER.sub("?", _SQL_STRING.sub("?", text))
+    return text if len(text) <= 300 else text[:297] + "..."
+
+
+def traced_handler(callback, name: Optional[str] = None):
+    """Wrap a PTB handler callback so each invocation runs inside its own trace."""
+    if getattr(callback, "__traced__", False):
+        return callback
+    handler_name = name or getattr(callback, "__name__", "handler")
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        chat = getattr(update, "effective_chat", None)
+        user = getattr(update, "effective_user", None)
+        trace, token = start_trace(handler_name, chat.id if chat else None, user.id if user else None)
+        error = None
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            finish_trace(trace, token, error)
+
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def instrument_handlers(app: Application):
+    """Wrap every CommandHandler/MessageHandler already registered on the application."""
+    count = 0
+    for handlers in app.handlers.values():
+        for h in handlers:
+            if isinstance(h, CommandHandler):
+                h.callback = traced_handler(h.callback, "/" + sorted(h.commands)[0])
+                count += 1
+            elif isinstance(h, MessageHandler):
+                h.callback = traced_handler(h.callback)
+                count += 1
+    return count
+
+
+class TracingRequest(HTTPXRequest):
+    """HTTPXRequest that records one span per Bot API call (method name only, never the token)."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        with span("telegram", api_method):
+            return await super().do_request(url, method, *args, **kwargs)
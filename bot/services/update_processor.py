@@ -0,0 +1,146 @@
+# bot/services/update_processor.py
+# Update processor that runs different chats in parallel but keeps each chat's updates in order.
+#
+# PTB's process_update() takes the base semaphore before do_process_update(); that one is only
+# an admission cap (max_pending). Inside, an update first waits for its chat's lock (FIFO, so a
+# group's uploads and commands run in arrival order) and only then for one of the
+# max_concurrent_updates running slots, so a busy chat never holds slots other chats could use.
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# recent queue delays kept for percentiles
+SAMPLE_SIZE = 1000
+
+
+def slow_queue_ms() -> float:
+    return float(os.getenv("UPDATE_QUEUE_SLOW_MS", "2000"))
+
+
+def _chat_key(update: object) -> Optional[Hashable]:
+    """Ordering key: the chat, else the user (inline queries); None = no ordering needed."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return ("user", update.effective_user.id)
+    return None
+
+
+class QueueStats:
+    """Queue delay (arrival in do_process_update -> handler start) and occupancy counters."""
+
+    def __init__(self):
+        self.processed = 0
+        self.waiting = 0
+        self.running = 0
+        self.max_delay_ms = 0.0
+        self.total_delay_ms = 0.0
+        self.slow = 0
+        self._recent = deque(maxlen=SAMPLE_SIZE)
+
+    def record(self, delay_ms: float):
+        self.processed += 1
+        self.total_delay_ms += delay_ms
+        self.max_delay_ms = max(self.max_delay_ms, delay_ms)
+        self._recent.append(delay_ms)
+
+    def percentile(self, p: float) -> float:
+        if not self._recent:
+            return 0.0
+        data = sorted(self._recent)
+        return data[min(len(data) - 1, int(p / 100 * len(data)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "waiting": self.waiting,
+            "running": self.running,
+            "avg_delay_ms": round(self.total_delay_ms / self.processed, 1) if self.processed else 0.0,
+            "p50_delay_ms": round(self.percentile(50), 1),
+            "p95_delay_ms": round(self.percentile(95), 1),
+            "max_delay_ms": round(self.max_delay_ms, 1),
+            "slow": self.slow,
+        }
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int, max_pending: Optional[int] = None):
+        self._limit = max_concurrent_updates
+        super().__init__(max_concurrent_updates)  # validates the limit
+        # the base semaphore becomes the admission cap; running slots are limited by _running
+        self._semaphore = asyncio.BoundedSemaphore(max_pending or max_concurrent_updates * 64)
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # chat key -> [lock, updates holding or waiting for it]; dropped when the count is 0
+        self._chats: Dict[Hashable, List[Any]] = {}
+        self.stats = QueueStats()
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._limit
+
+    async def do_process_update(self, update: object, coroutine: Any) -> None:
+        arrived = time.perf_counter()
+        key = _chat_key(update)
+        entry = None
+        if key is not None:
+            entry = self._chats.get(key)
+            if entry is None:
+                entry = self._chats[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+        started = False
+        self.stats.waiting += 1
+        try:
+            if entry is not None:
+                await entry[0].acquire()
+            try:
+                async with self._running:
+                    started = True
+                    self.stats.waiting -= 1
+                    self.stats.running += 1
+                    delay_ms = (time.perf_counter() - arrived) * 1000
+                    self.stats.record(delay_ms)
+                    if delay_ms >= slow_queue_ms():
+                        self.stats.slow += 1
+                        logger.warning("update for chat %s waited %.0f ms in queue", key, delay_ms)
+                    try:
+                        await coroutine
+                    finally:
+                        self.stats.running -= 1
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            if not started:
+                # cancelled while queued (shutdown): the handler coroutine never ran
+                self.stats.waiting -= 1
+                if hasattr(coroutine, "close"):
+                    coroutine.close()
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._chats.pop(key, None)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+def format_stats(stats: Dict[str, Any], limit: int) -> str:
+    return "\n".join([
+        "📊 Hàng đợi update:",
+        f"• Đã xử lý: {stats['processed']} (đang chạy {stats['running']}/{limit}, đang chờ {stats['waiting']})",
+        f"• Thời gian chờ: TB {stats['avg_delay_ms']} ms, p50 {stats['p50_delay_ms']} ms, p95 {stats['p95_delay_ms']} ms, max {stats['max_delay_ms']} ms",
+        f"• Số update chờ lâu (>= {slow_queue_ms():.0f} ms): {stats['slow']}",
+    ])
@@ -2,6 +2,8 @@
 from datetime import datetime, date, timedelta
 import pytz
 import calendar
+import re
+import unicodedata
 from typing import List, Tuple, Optional
 
 # Hard-coded timezone per your decision
@@ -130,3 +132,96 @@ def compute_deadline_for_requirement(freq: str, ref_date: date) -> Tuple[Optiona
         return candidate, period
 
     return None, None
+
+
+# ---------------------------------------------------------------------------
+# Tax periods (ky_thue)
+# ---------------------------------------------------------------------------
+# Typed form of a period: (period_type, year, index)
+#   monthly   -> ("M", 2024, 1..12)
+#   quarterly -> ("Q", 2024, 1..4)
+#   yearly    -> ("Y", 2024, 0)
+# Canonical integer key: year * 100 + slot, slot = month (1..12), 40 + quarter (41..44)
+# or 0 for the whole year, e.g. 01/2024 -> 202401, Q3/2024 -> 202443, 2024 -> 202400.
+PERIOD_MONTH = "M"
+PERIOD_QUARTER = "Q"
+PERIOD_YEAR = "Y"
+
+_RE_DATE_RANGE = re.compile(r"^(?:tu\s*)?(?:ngay\s*)?(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\s*(?:-|den|~|to)\s*(?:ngay\s*)?(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})$")
+_RE_MONTH_RANGE = re.compile(r"^(?:tu\s*)?(?:thang\s*)?(\d{1,2})[/.-](\d{4})\s*(?:-|den|~|to)\s*(?:thang\s*)?(\d{1,2})[/.-](\d{4})$")
+_RE_QUARTER = re.compile(r"^(?:q|quy)\s*([1-4])\s*(?:[/.-]|nam)?\s*(\d{4})$")
+_RE_MONTH = re.compile(r"^(?:thang\s*)?(\d{1,2})\s*(?:[/.-]|nam)\s*(\d{4})$")
+_RE_YEAR_MONTH = re.compile(r"^(\d{4})-(\d{1,2})$")
+_RE_YEAR = re.compile(r"^(?:nam\s*)?(\d{4})$")
+
+
+def _fold(text: str) -> str:
+    """Lowercase, strip Vietnamese accents and collapse whitespace."""
+    s = unicodedata.normalize("NFD", text.strip().lower()).replace("đ", "d")
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return re.sub(r"\s+", " ", s)
+
+
+def _period_from_months(y1: int, m1: int, y2: int, m2: int) -> Optional[Tuple[str, int, int]]:
+    """Typed period for the month span m1/y1..m2/y2 when it is exactly a month, quarter or year."""
+    if not (1 <= m1 <= 12 and 1 <= m2 <= 12):
+        return None
+    span = (y2 * 12 + m2) - (y1 * 12 + m1) + 1
+    if span == 1:
+        return PERIOD_MONTH, y1, m1
+    if span == 3 and m1 % 3 == 1:
+        return PERIOD_QUARTER, y1, (m1 - 1) // 3 + 1
+    if span == 12 and m1 == 1:
+        return PERIOD_YEAR, y1, 0
+    return None
+
+
+def parse_ky_thue(raw: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    """
+    Parse a free-text tax period into (period_type, year, index), or None when unrecognised.
+    Accepts the formats seen in GDT notifications and the ones compute_deadline_for_requirement
+    produces: "01/2024", "1-2024", "Tháng 01/2024", "Q1/2024", "Quý 1 năm 2024", "2024",
+    "Năm 2024", "2024-01" and explicit ranges ("01/01/2024-31/03/2024", "01/2024 - 12/2024").
+    """
+    if not raw:
+        return None
+    s = _fold(str(raw))
+    if not s:
+        return None
+
+    m = _RE_DATE_RANGE.match(s)
+    if m:
+        _, m1, y1, _, m2, y2 = (int(g) for g in m.groups())
+        return _period_from_months(y1, m1, y2, m2)
+    m = _RE_MONTH_RANGE.match(s)
+    if m:
+        m1, y1, m2, y2 = (int(g) for g in m.groups())
+        return _period_from_months(y1, m1, y2, m2)
+    m = _RE_QUARTER.match(s)
+    if m:
+        return PERIOD_QUARTER, int(m.group(2)), int(m.group(1))
+    m = _RE_MONTH.match(s)
+    if m and 1 <= int(m.group(1)) <= 12:
+        return PERIOD_MONTH, int(m.group(2)), int(m.group(1))
+    m = _RE_YEAR_MONTH.match(s)
+    if m and 1 <= int(m.group(2)) <= 12:
+        return PERIOD_MONTH, int(m.group(1)), int(m.group(2))
+    m = _RE_YEAR.match(s)
+    if m:
+        return PERIOD_YEAR, int(m.group(1)), 0
+    return None
+
+
+def period_key(period_type: str, year: int, index: int) -> int:
+    """Canonical integer key of a typed period (see the table above)."""
+    if period_type == PERIOD_MONTH:
+        return year * 100 + index
+    if period_type == PERIOD_QUARTER:
+        return year * 100 + 40 + index
+    return year * 100
+
+
+def ky_thue_key(raw: Optional[str]) -> Optional[int]:
+    """parse_ky_thue + period_key in one step; None when the text is not a recognisable period."""
+    parsed = parse_ky_thue(raw)
+    return period_key(*parsed) if parsed else None
@@ -0,0 +1,79 @@
+# tests/test_admin_cache.py
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram.error import BadRequest
+
+from bot.services import admin_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    admin_cache.clear()
+    yield
+    admin_cache.clear()
+
+
+def _member(user_id, status="administrator"):
+    return SimpleNamespace(user=SimpleNamespace(id=user_id), status=status)
+
+
+def _bot(admin_ids=(1, 2)):
+    bot = AsyncMock()
+    bot.get_chat_administrators.return_value = [_member(i) for i in admin_ids]
+    return bot
+
+
+class TestAdminCache:
+    """Test cache quyền admin nhóm"""
+
+    def test_one_api_call_per_chat(self):
+        """Một lần get_chat_administrators cho cả nhóm, không gọi get_chat_member"""
+        bot = _bot()
+
+        async def run():
+            return [await admin_cache.is_chat_admin(bot, -100, uid) for uid in (1, 2, 3, 1)]
+
+        assert asyncio.run(run()) == [True, True, False, True]
+        assert bot.get_chat_administrators.await_count == 1
+        bot.get_chat_member.assert_not_awaited()
+
+    def test_fallback_to_get_chat_member(self):
+        """Không lấy được danh sách admin thì hỏi từng người, kết quả cũng được cache"""
+        bot = AsyncMock()
+        bot.get_chat_administrators.side_effect = BadRequest("private chat")
+        bot.get_chat_member.return_value = _member(5, "creator")
+
+        async def run():
+            return [await admin_cache.is_chat_admin(bot, 5, 5) for _ in range(3)]
+
+        assert asyncio.run(run()) == [True, True, True]
+        assert bot.get_chat_member.await_count == 1
+
+    def test_chat_member_update_invalidates(self):
+        """Sự kiện ChatMemberUpdated (bị hạ quyền) có hiệu lực ngay, không chờ hết TTL"""
+        bot = _bot(admin_ids=(1, 2))
+        change = SimpleNamespace(chat=SimpleNamespace(id=-100), new_chat_member=_member(2, "member"))
+        update = SimpleNamespace(chat_member=change, my_chat_member=None)
+
+        async def run():
+            assert await admin_cache.is_chat_admin(bot, -100, 2)
+            await admin_cache.on_chat_member(update, None)
+            bot.get_chat_administrators.return_value = [_member(1)]
+            return await admin_cache.is_chat_admin(bot, -100, 2), await admin_cache.is_chat_admin(bot, -100, 1)
+
+        assert asyncio.run(run()) == (False, True)
+
+    def test_ttl(self, monkeypatch):
+        """Hết TTL thì tải lại danh sách admin"""
+        monkeypatch.setenv("ADMIN_CACHE_TTL", "0")
+        bot = _bot()
+
+        async def run():
+            await admin_cache.is_chat_admin(bot, -100, 1)
+            await admin_cache.is_chat_admin(bot, -100, 1)
+
+        asyncio.run(run())
+        assert bot.get_chat_administrators.await_count == 2
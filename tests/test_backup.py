@@ -0,0 +1,102 @@
+# tests/test_backup.py
+import os
+
+import pytest
+
+from bot.db.database import ensure_schema, get_conn
+from bot.services import backup
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    """Postgres test rỗng với vài dòng dữ liệu; trả về hàm chạy SQL"""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL chưa được đặt")
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.setenv("BACKUP_DIR", str(tmp_path))
+
+    def sql(query, params=None):
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(query, params)
+            rows = cur.fetchall() if cur.description else None
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    conn = get_conn()
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+    sql(f"TRUNCATE {', '.join(reversed(backup.TABLES))} RESTART IDENTITY CASCADE")
+    sql("INSERT INTO teams (id, group_chat_id, name) VALUES (1, -100, 'A')")
+    sql("INSERT INTO forms (form_code) VALUES ('01/GTGT')")
+    sql("INSERT INTO companies (company_tax_id, company_name, team_id) VALUES ('0100000001', 'Cty 1', 1), ('0100000002', 'Cty 2', 1)")
+    sql("INSERT INTO requirements (id, company_tax_id, form_code, period) VALUES (1, '0100000001', '01/GTGT', 'quarterly'), (2, '0100000002', '01/GTGT', 'quarterly')")
+    sql("SELECT setval('requirements_id_seq', 2)")
+    for i in range(3):
+        sql("INSERT INTO submissions (company_tax_id, form_code, ky_thue) VALUES ('0100000001', '01/GTGT', %s)", (f"Q{i + 1}/2026",))
+    sql("INSERT INTO reminders_sent (team_id, requirement_id, remind_for_date, mode) VALUES (1, 1, CURRENT_DATE, 'daily'), (1, 2, CURRENT_DATE, 'daily')")
+    return sql
+
+
+def _counts(sql):
+    return {t: sql(f"SELECT COUNT(*) FROM {t}")[0][0] for t in backup.TABLES}
+
+
+class TestBackupChain:
+    """Test backup full + incremental, kiểm tra checksum và khôi phục (cần Postgres)"""
+
+    def test_round_trip_with_late_commit(self, db):
+        """Dòng nhận id trước backup full nhưng commit sau vẫn có trong chuỗi; phần chồng lấn không bị nhân đôi"""
+        (late_id,) = db("SELECT nextval('submissions_id_seq')")[0]
+        full = backup.export_backup(compression="gzip")
+        db("INSERT INTO submissions (company_tax_id, form_code, ky_thue) VALUES ('0100000001', '01/GTGT', 'Q4/2026')")
+        # committed after the full snapshot, with an id below its watermark
+        db("INSERT INTO submissions (id, company_tax_id, form_code, ky_thue) VALUES (%s, '0100000001', '01/GTGT', 'late')", (late_id,))
+        incr = backup.export_backup(incremental=True, compression="gzip")
+
+        assert incr["kind"] == "incremental" and incr["base"] == full["_path"]
+        assert incr["overlap_since"] < full["snapshot_at"]
+        # the overlap re-exports rows the full backup already holds
+        assert incr["tables"]["submissions"]["rows"] > 2
+        assert backup.verify_backup(incr["_path"]) == []
+
+        expected = _counts(db)
+        result = backup.restore_backup(incr["_path"], workers=2, truncate=True)
+        assert result["orphans"] == {}
+        assert _counts(db) == expected
+        assert db("SELECT COUNT(*) FROM submissions WHERE id = %s", (late_id,))[0][0] == 1
+        # sequences continue after the restored ids
+        db("INSERT INTO submissions (company_tax_id, form_code) VALUES ('0100000002', '01/GTGT')")
+
+    def test_orphan_history_skipped(self, db):
+        """Công ty bị xoá giữa hai backup: lịch sử của nó trong backup full được bỏ qua khi khôi phục"""
+        backup.export_backup(compression="gzip")
+        db("DELETE FROM reminders_sent WHERE requirement_id = 2")
+        db("DELETE FROM requirements WHERE id = 2")
+        db("DELETE FROM companies WHERE company_tax_id = '0100000002'")
+        incr = backup.export_backup(incremental=True, compression="gzip")
+
+        result = backup.restore_backup(incr["_path"], truncate=True)
+        assert result["orphans"] == {"reminders_sent": 1}
+        assert db("SELECT requirement_id FROM reminders_sent") == [(1,)]
+
+    def test_tampered_chunk(self, db):
+        """Chunk bị sửa: verify báo sai checksum, restore dừng trước khi xoá dữ liệu"""
+        manifest = backup.export_backup(compression="gzip")
+        chunk = os.path.join(os.path.dirname(manifest["_path"]), manifest["tables"]["companies"]["chunks"][0]["file"])
+        with open(chunk, "r+b") as fh:
+            head = fh.read(1)
+            fh.seek(0)
+            fh.write(bytes([head[0] ^ 0xFF]))
+
+        problems = backup.verify_backup(manifest["_path"])
+        assert len(problems) == 1 and "companies: checksum mismatch" in problems[0]
+        with pytest.raises(RuntimeError):
+            backup.restore_backup(manifest["_path"], truncate=True)
+        assert db("SELECT COUNT(*) FROM companies")[0][0] == 2
@@ -0,0 +1,76 @@
+# tests/test_bulk_import.py
+import io
+
+import pytest
+
+from bot.services import bulk_import
+from bot.services.bulk_import import PROFILE_REQUIREMENTS, format_summary, read_rows, validate
+
+
+class TestReadRows:
+    """Test đọc file CSV/XLSX"""
+
+    def test_csv_header_aliases_and_delimiter(self):
+        """Tiêu đề tiếng Việt có dấu, BOM và dấu ';' của Excel"""
+        data = "﻿Mã số thuế;Tên công ty;Owner;Tần suất\n0101234567;Cty A;@an;monthly\n\n".encode("utf-8")
+        assert read_rows("ds.csv", data) == [
+            {"mst": "0101234567", "company_name": "Cty A", "owner_username": "@an", "profile": "monthly"}
+        ]
+
+    def test_xlsx_numeric_cells(self):
+        """Ô số trong Excel (MST, telegram id) được đọc thành chuỗi số nguyên"""
+        openpyxl = pytest.importorskip("openpyxl")
+        wb = openpyxl.Workbook()
+        wb.active.append(["mst", "owner_telegram_id", "forms"])
+        wb.active.append([1012345678, 123456789.0, "01/GTGT:monthly"])
+        buf = io.BytesIO()
+        wb.save(buf)
+        assert read_rows("ds.xlsx", buf.getvalue()) == [
+            {"mst": "1012345678", "owner_telegram_id": "123456789", "forms": "01/GTGT:monthly"}
+        ]
+
+    @pytest.mark.parametrize("name,data", [("ds.pdf", b"x"), ("ds.csv", b""), ("ds.csv", b"ten,owner\nA,b\n")])
+    def test_unusable_files(self, name, data):
+        """Sai định dạng, file trống hoặc thiếu cột mst"""
+        with pytest.raises(ValueError):
+            read_rows(name, data)
+
+
+class TestValidate:
+    """Test kiểm tra dữ liệu một lượt"""
+
+    def test_profile_forms_and_merge(self):
+        """Profile + forms được gộp, MST lặp lại được gộp thành một công ty"""
+        companies, errors = validate([
+            {"mst": "0101234567", "company_name": "Cty A", "profile": "yearly"},
+            {"mst": "0101234567", "owner_username": "@an", "forms": "01/GTGT:Monthly; 05/KK-TNCN:quarterly"},
+        ])
+        assert errors == []
+        item = companies["0101234567"]
+        assert (item["company_name"], item["owner_username"], item["line"]) == ("Cty A", "an", 2)
+        assert item["requirements"] == set(PROFILE_REQUIREMENTS["yearly"]) | {("01/GTGT", "monthly"), ("05/KK-TNCN", "quarterly")}
+
+    def test_error_rows(self):
+        """Dòng lỗi được báo kèm số dòng (dòng 1 là tiêu đề) và không được nhập"""
+        companies, errors = validate([
+            {"mst": "12345"},
+            {"mst": "0101234567", "profile": "weekly"},
+            {"mst": "0101234568", "forms": "01/GTGT"},
+            {"mst": "0101234569", "owner_telegram_id": "@an"},
+            {"mst": "0101234567-001"},
+        ])
+        assert [n for n, _ in errors] == [2, 3, 4, 5]
+        assert list(companies) == ["0101234567-001"]
+
+
+def test_format_summary():
+    """Tóm tắt kết quả, chỉ liệt kê tối đa MAX_ERRORS_SHOWN dòng lỗi"""
+    result = {
+        "companies_added": ["1"], "companies_updated": [], "companies_unchanged": 2,
+        "requirements_added": 5, "requirements_existing": 1, "dry_run": True,
+        "errors": [(n, "lỗi") for n in range(2, 2 + bulk_import.MAX_ERRORS_SHOWN + 3)],
+    }
+    text = format_summary(result)
+    assert text.startswith("🔎 Xem trước import")
+    assert "• Công ty thêm mới: 1" in text
+    assert "... và 3 dòng khác" in text
@@ -0,0 +1,130 @@
+# tests/test_deadline_rules.py
+from datetime import date, timedelta
+
+import pytest
+
+from bot.services.deadline_rules import BusinessCalendar, DeadlineRules, Rule, parse_rule
+from bot.services.reminder_service import _due_payloads
+from bot.utils import business_days_between, compute_deadline_for_requirement
+
+HOLIDAYS = [date(2026, 1, 1), date(2026, 4, 30), date(2026, 5, 1), date(2026, 9, 2)]
+
+
+class TestBusinessCalendar:
+    """Test đếm ngày làm việc bằng mảng cộng dồn"""
+
+    def test_count_matches_business_days_between(self):
+        """Kết quả giống utils.business_days_between, kể cả khi phải mở rộng phạm vi"""
+        cal = BusinessCalendar(HOLIDAYS, date(2026, 1, 1), date(2026, 1, 31))
+        d = date(2025, 6, 1)
+        while d < date(2027, 6, 1):
+            for span in (0, 1, 6, 45, 400):
+                assert cal.count(d, d + timedelta(days=span)) == business_days_between(d, d + timedelta(days=span), HOLIDAYS)
+            d += timedelta(days=5)
+
+    def test_roll_forward(self):
+        """Ngày nghỉ được lùi sang ngày làm việc kế tiếp"""
+        cal = BusinessCalendar(HOLIDAYS, date(2026, 1, 1), date(2026, 12, 31))
+        assert cal.roll_forward(date(2026, 4, 30)) == date(2026, 5, 4)  # 30/4, 1/5, cuối tuần
+        assert cal.roll_forward(date(2026, 5, 5)) == date(2026, 5, 5)
+
+
+class TestDeadlineCalendar:
+    """Test lịch hạn nộp biên dịch từ quy tắc"""
+
+    def test_monthly_without_roll_matches_legacy(self):
+        """Quy tắc tháng không lùi ngày cho kết quả giống compute_deadline_for_requirement"""
+        compiled = DeadlineRules([Rule("*", "monthly", 1, 20, False, None)]).compile(HOLIDAYS)
+        d = date(2025, 1, 1)
+        while d < date(2027, 1, 1):
+            assert compiled.due("01/GTGT", "monthly", d)[:2] == compute_deadline_for_requirement("monthly", d)
+            d += timedelta(days=1)
+
+    def test_previous_quarter_still_due(self):
+        """Đầu quý vẫn nhắc hạn của quý trước (31/01 rơi vào thứ Bảy -> 02/02)"""
+        compiled = DeadlineRules().compile(HOLIDAYS)
+        deadline, period, days_left, _ = compiled.due("01/GTGT", "quarterly", date(2026, 1, 27))
+        assert (deadline, period) == (date(2026, 2, 2), "Q4/2025")
+        assert days_left == 5
+
+    def test_yearly_due_before_march_31(self):
+        """Trước 31/03 hạn năm là của năm trước"""
+        compiled = DeadlineRules().compile(HOLIDAYS)
+        deadline, period, days_left, _ = compiled.due("03/TNDN", "yearly", date(2026, 3, 30))
+        assert (deadline, period, days_left) == (date(2026, 3, 31), "2025", 2)
+
+    def test_form_rule_overrides_default(self):
+        """Quy tắc riêng của form được ưu tiên hơn quy tắc '*'"""
+        rules = DeadlineRules([Rule("05/KK-TNCN", "monthly", 1, 10, False, 5)])
+        compiled = rules.compile(HOLIDAYS)
+        assert compiled.due("05/KK-TNCN", "monthly", date(2026, 6, 1)) == (date(2026, 6, 10), "05/2026", 8, 5)
+        assert compiled.due("01/GTGT", "monthly", date(2026, 6, 1))[:2] == (date(2026, 6, 22), "05/2026")
+
+    def test_unknown_frequency(self):
+        """Tần suất không có quy tắc thì bỏ qua"""
+        assert DeadlineRules().compile([]).due("01/GTGT", "weekly", date(2026, 6, 1)) is None
+
+
+class TestParseRule:
+    """Test cú pháp /set_deadline_rule"""
+
+    def test_full(self):
+        """Đủ tham số, tần suất không phân biệt hoa thường"""
+        assert parse_rule(["01/GTGT", "Monthly", "1", "20", "noroll", "4"]) == Rule("01/GTGT", "monthly", 1, 20, False, 4)
+
+    def test_last_day_defaults(self):
+        """'last' = ngày cuối tháng, mặc định lùi ngày và ngưỡng theo THRESHOLDS"""
+        assert parse_rule(["*", "quarterly", "1", "last"]) == Rule("*", "quarterly", 1, None, True, None)
+
+    @pytest.mark.parametrize("args", [[], ["*", "weekly", "1", "20"], ["*", "monthly", "x", "20"], ["*", "monthly", "1", "32"]])
+    def test_invalid(self, args):
+        """Tham số sai báo ValueError"""
+        with pytest.raises(ValueError):
+            parse_rule(args)
+
+
+class TestDuePayloadsWithRules:
+    """_due_payloads dùng ngưỡng của quy tắc, mặc định theo THRESHOLDS"""
+
+    def test_threshold_from_rule(self):
+        """Ngưỡng riêng của quy tắc thay cho ngưỡng mặc định"""
+        teams = [(1, -100, "Team A")]
+        reqs = [(1, 10, "0101", "01/GTGT", "monthly", "Cty A", None), (1, 11, "0102", "05/KK-TNCN", "monthly", "Cty B", None)]
+        rules = DeadlineRules([Rule("05/KK-TNCN", "monthly", 1, 20, True, 10)])
+
+        # 12/06/2026: còn 7 ngày làm việc tới hạn 22/06 (20/06 là thứ Bảy) -> chỉ form có ngưỡng 10 được nhắc
+        payloads = _due_payloads(teams, reqs, [], date(2026, 6, 12), rules)
+
+        assert [it["requirement_id"] for it in payloads[0]["items"]] == [11]
+
+
+class TestDueMany:
+    """Test tính hạn cho nhiều ngày tham chiếu một lần (numpy và bản Python thuần)"""
+
+    @pytest.mark.parametrize("numpy_flag", ["1", "0"])
+    def test_matches_due_per_date(self, monkeypatch, numpy_flag):
+        """due_many cho cùng kết quả với due() từng ngày, qua nhiều năm và ngày lễ"""
+        monkeypatch.setenv("SCAN_NUMPY", numpy_flag)
+        if numpy_flag == "1":
+            pytest.importorskip("numpy")
+        refs = [date(2025, 11, 1) + timedelta(days=i) for i in range(800)]
+        rules = DeadlineRules([Rule("TT200", "yearly", 3, 31, True, 10)])
+        expected = DeadlineRules([Rule("TT200", "yearly", 3, 31, True, 10)]).compile(HOLIDAYS)
+        compiled = rules.compile(HOLIDAYS)
+        for form_code, freq in (("01/GTGT", "monthly"), ("01/GTGT", "quarterly"), ("TT200", "yearly")):
+            hits, threshold = compiled.due_many(form_code, freq, refs)
+            assert threshold == expected.due(form_code, freq, refs[0])[3]
+            assert hits == [expected.due(form_code, freq, d)[:3] for d in refs]
+        assert compiled.due_many("01/GTGT", "weekly", refs) is None
+
+    def test_due_payloads_same_without_numpy(self, monkeypatch):
+        """Lọc dòng đến hạn bằng mặt nạ numpy hay vòng lặp Python đều ra cùng payload"""
+        pytest.importorskip("numpy")
+        teams = [(1, -100, "A")]
+        reqs = [(1, i, f"010{i}", form, freq, f"Cty {i}", None)
+                for i, (form, freq) in enumerate([("01/GTGT", "monthly"), ("01/GTGT", "quarterly"), ("TT200", "yearly")] * 3)]
+        for ref in (date(2026, 1, 16), date(2026, 4, 24), date(2026, 6, 18)):
+            monkeypatch.setenv("SCAN_NUMPY", "1")
+            vectorised = _due_payloads(teams, reqs, [], ref)
+            monkeypatch.setenv("SCAN_NUMPY", "0")
+            assert _due_payloads(teams, reqs, [], ref) == vectorised
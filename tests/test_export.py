@@ -0,0 +1,43 @@
+# tests/test_export.py
+import csv
+import io
+from datetime import date
+
+import pytest
+
+from bot.services.deadline_rules import DeadlineRules, Rule
+from bot.services.export import HEADER, _due_arrays, _Writer
+
+
+class TestExportWriter:
+    """Test ghi file export"""
+
+    def test_csv_roundtrip(self):
+        """CSV có BOM (Excel đọc đúng tiếng Việt), ô None thành rỗng"""
+        w = _Writer("csv")
+        w.write(HEADER)
+        w.write(["0101234567", "Công ty Á", None, date(2026, 6, 22)])
+        data = w.close().read()
+        assert data.startswith(b"\xef\xbb\xbf")
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+        assert rows == [HEADER, ["0101234567", "Công ty Á", "", "2026-06-22"]]
+
+    def test_xlsx(self):
+        """XLSX ghi ở chế độ write-only, đọc lại được"""
+        openpyxl = pytest.importorskip("openpyxl")
+        w = _Writer("xlsx")
+        w.write(HEADER)
+        w.write(["0101234567", "Công ty Á"])
+        wb = openpyxl.load_workbook(w.close())
+        assert [c.value for c in wb.active[2]][:2] == ["0101234567", "Công ty Á"]
+
+
+def test_due_arrays_cover_every_rule():
+    """Mỗi quy tắc (kể cả quy tắc riêng của form) có period_key của kỳ đang đến hạn"""
+    rules = DeadlineRules([Rule("05/KK-TNCN", "monthly", 1, 10, False, None)])
+    params = _due_arrays(rules, rules.compile([]), date(2026, 6, 15))
+    due = dict(zip(zip(params["due_forms"], params["due_freqs"]), params["due_keys"]))
+    assert due[("*", "monthly")] == 202605
+    assert due[("05/KK-TNCN", "monthly")] == 202606
+    assert due[("*", "quarterly")] == 202642  # Q2/2026: hạn 31/07
+    assert due[("*", "yearly")] == 202600  # năm 2026: hạn 31/03/2027
@@ -0,0 +1,97 @@
+# tests/test_fake_telegram.py
+import asyncio
+
+import pytest
+from telegram import Bot
+from telegram.error import Forbidden, NetworkError, RetryAfter
+
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+def _run(server: FakeTelegramServer, body):
+    """Chạy `body(bot)` với một telegram.Bot thật trỏ vào server giả."""
+    async def main():
+        url = await server.start()
+        try:
+            async with Bot("123:fake", base_url=f"{url}/bot", base_file_url=f"{url}/file/bot") as bot:
+                return await body(bot)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+class TestFakeTelegramServer:
+    """Test server Bot API giả dùng cho kiểm thử tải"""
+
+    def test_send_and_download(self):
+        """Gửi tin, tải file qua getFile như với Telegram thật"""
+        server = FakeTelegramServer()
+        file_id = server.add_file(b"<xml/>")
+
+        async def body(bot):
+            msg = await bot.send_message(-100, "xin chào", reply_to_message_id=7)
+            f = await bot.get_file(file_id)
+            return msg, bytes(await f.download_as_bytearray())
+
+        msg, data = _run(server, body)
+        assert msg.chat.id == -100 and data == b"<xml/>"
+        assert server.messages[0]["reply_to"] == 7 and server.messages[0]["text"] == "xin chào"
+        assert server.summary()["downloads"] == 1
+
+    def test_group_limit_answers_retry_after(self):
+        """Vượt giới hạn tin/phút của nhóm: trả 429 kèm retry_after, nhóm khác vẫn gửi được"""
+        server = FakeTelegramServer(group_per_minute=2)
+
+        async def body(bot):
+            await bot.send_message(-100, "1")
+            await bot.send_message(-100, "2")
+            with pytest.raises(RetryAfter) as exc:
+                await bot.send_message(-100, "3")
+            await bot.send_message(-200, "khác nhóm")
+            return exc.value.retry_after
+
+        retry_after = _run(server, body)
+        assert 1 <= retry_after <= 60
+        assert server.summary()["rate_limited"] == 1 and len(server.messages) == 3
+
+    def test_injected_errors(self):
+        """429 / 500 chèn ngẫu nhiên và nhóm đã xóa bot (403) hiện ra đúng lớp lỗi của PTB"""
+        server = FakeTelegramServer(flood_rate=1.0, flood_retry_after=3, forbidden_chats=[-300])
+
+        async def body(bot):
+            with pytest.raises(Forbidden):
+                await bot.send_message(-300, "x")
+            with pytest.raises(RetryAfter) as exc:
+                await bot.send_message(-100, "x")
+            server.flood_rate, server.error_rate = 0.0, 1.0
+            with pytest.raises(NetworkError):
+                await bot.send_message(-100, "x")
+            return exc.value.retry_after
+
+        assert _run(server, body) == 3
+        summary = server.summary()
+        assert (summary["forbidden"], summary["flood_injected"], summary["server_errors"]) == (1, 1, 1)
+        assert server.messages == []
+
+    def test_get_updates_offset(self):
+        """getUpdates trả các update đã xếp hàng; offset xác nhận và bỏ các update cũ"""
+        server = FakeTelegramServer()
+        for i in (1, 2):
+            server.push_update({"message": {"message_id": i, "date": 0, "chat": {"id": -100, "type": "supergroup"}, "text": f"/start {i}"}})
+
+        async def body(bot):
+            first = await bot.get_updates(timeout=0)
+            rest = await bot.get_updates(offset=first[0].update_id + 1, timeout=0)
+            return [u.update_id for u in first], [u.message.text for u in rest]
+
+        assert _run(server, body) == ([1, 2], ["/start 2"])
+
+    def test_application_uses_base_url(self, monkeypatch):
+        """TELEGRAM_BASE_URL trỏ Application của bot sang server khác"""
+        from bot.main import build_application
+
+        monkeypatch.setenv("TELEGRAM_BASE_URL", "http://127.0.0.1:8081/")
+        app = build_application("123:fake")
+        assert app.bot.base_url == "http://127.0.0.1:8081/bot123:fake"
+        assert app.bot.base_file_url == "http://127.0.0.1:8081/file/bot123:fake"
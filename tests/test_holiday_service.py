@@ -0,0 +1,83 @@
+# tests/test_holiday_service.py
+from datetime import date
+from unittest.mock import Mock
+
+import pytest
+
+from bot.services import holiday_service
+from bot.services.reminder_service import _load_holidays
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    holiday_service.invalidate_holidays()
+    yield
+    holiday_service.invalidate_holidays()
+
+
+def _cursor(rows):
+    cur = Mock()
+    cur.fetchall.return_value = rows
+    return cur
+
+
+class TestHolidayCache:
+    """Test cache ngày nghỉ lễ"""
+
+    def test_dates_from_psycopg2_are_kept(self):
+        """psycopg2 trả về kiểu date: không còn bị strptime làm rơi mất ngày nghỉ"""
+        cur = _cursor([(date(2026, 1, 1),), (date(2026, 4, 30),)])
+        assert _load_holidays(cur) == [date(2026, 1, 1), date(2026, 4, 30)]
+
+    def test_loaded_once_until_invalidated(self):
+        """Chỉ query một lần, invalidate thì tải lại"""
+        cur = _cursor([(date(2026, 1, 1),)])
+        holiday_service.get_holidays(cur)
+        holiday_service.get_holidays(cur)
+        assert cur.execute.call_count == 1
+
+        holiday_service.invalidate_holidays()
+        holiday_service.get_holidays(cur)
+        assert cur.execute.call_count == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Hết TTL thì tải lại (thay đổi trực tiếp trong DB)"""
+        monkeypatch.setenv("HOLIDAY_CACHE_TTL", "0")
+        cur = _cursor([(date(2026, 1, 1),)])
+        holiday_service.get_holidays(cur)
+        holiday_service.get_holidays(cur)
+        assert cur.execute.call_count == 2
+
+
+class TestParseHolidayLines:
+    """Test đọc danh sách ngày nghỉ khi import"""
+
+    def test_formats_and_ranges(self):
+        """Nhiều định dạng ngày, khoảng ngày (Tết) và ghi chú"""
+        entries, errors = holiday_service.parse_holiday_lines(
+            "2026-01-01 Tết Dương lịch\n"
+            "16/02/2026 - 18/02/2026 Tết Nguyên đán\n"
+            "# dòng ghi chú\n"
+            "\n"
+            "02-09-2026\n"
+        )
+        assert errors == []
+        assert entries == [
+            (date(2026, 1, 1), "Tết Dương lịch"),
+            (date(2026, 2, 16), "Tết Nguyên đán"),
+            (date(2026, 2, 17), "Tết Nguyên đán"),
+            (date(2026, 2, 18), "Tết Nguyên đán"),
+            (date(2026, 9, 2), None),
+        ]
+
+    def test_duplicates_collapse(self):
+        """Ngày trùng chỉ giữ một, ghi chú của dòng sau"""
+        entries, _ = holiday_service.parse_holiday_lines("01/01/2026 a\n2026-01-01 b")
+        assert entries == [(date(2026, 1, 1), "b")]
+
+    @pytest.mark.parametrize("line", ["abc", "31/02/2026", "20/02/2026 - 16/02/2026", "01/01/2026 - 01/03/2026"])
+    def test_errors(self, line):
+        """Dòng sai được báo lỗi kèm số dòng"""
+        entries, errors = holiday_service.parse_holiday_lines(line)
+        assert entries == []
+        assert errors and errors[0].startswith("dòng 1:")
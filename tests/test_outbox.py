@@ -0,0 +1,241 @@
+# tests/test_outbox.py
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from bot.services import outbox
+from bot.services import reminder_service as rs
+from bot.services.scan_model import DueItem
+
+
+def _item(rid, owner_id=None):
+    return DueItem(rid, f"01{rid:08d}", f"Cty {rid}", "01/GTGT", "05/2026", date(2026, 6, 20), 2, owner_id)
+
+
+class TestOutboxMessages:
+    """Test dựng các dòng outbox từ payload"""
+
+    def test_chunk_records_follow_chunks(self):
+        """Mỗi chunk của tin nhóm chỉ mang record của các dòng nằm trong chunk đó"""
+        items = [_item(i) for i in range(1, 31)] + [_item(99, owner_id=555)]
+        payloads = [{"team_id": 7, "chat_id": -100, "team_name": "A", "items": items}]
+        messages = rs._daily_outbox_messages(rs._build_daily_messages(payloads, date(2026, 6, 18)))
+
+        owner, *group = messages
+        assert owner["records"] == [(99, "2026-06-20")] and owner["parse_mode"] == "HTML"
+        # header + 30 dòng, CHUNK_SIZE = 15 -> 3 tin: 14 + 15 + 1 record
+        assert [len(m["records"]) for m in group] == [14, 15, 1]
+        assert [rid for m in group for rid, _ in m["records"]] == list(range(1, 31))
+        for m in group:
+            for rid, _ in m["records"]:
+                assert f"Cty {rid} " in m["text"]
+        assert {m["team_id"] for m in messages} == {7}
+        assert {m["mode"] for m in messages} == {"initial"}
+
+    def test_existing_run_not_gathered_again(self, monkeypatch):
+        """Chạy lại cùng ngày: không gom/dựng lại mà chỉ gửi phần còn chờ"""
+        monkeypatch.setattr(rs.outbox, "run_exists", lambda key: True)
+        gather = MagicMock()
+        monkeypatch.setattr(rs, "_gather_reminder_payloads", gather)
+        dispatch = AsyncMock(return_value={"claimed": 0, "sent": 0, "failed": 0, "flood_waits": 0})
+        monkeypatch.setattr(rs.outbox, "dispatch", dispatch)
+
+        counts = asyncio.run(rs.send_daily_reminders(SimpleNamespace(bot=None), date(2026, 6, 18)))
+        gather.assert_not_called()
+        assert dispatch.call_args.args[1] == "daily:2026-06-18"
+        assert counts["enqueued"] == 0
+
+    def test_manual_run_separate_from_daily(self, monkeypatch):
+        """/test_daily sau lượt hằng ngày: lượt riêng (test:<thời điểm>), vẫn gom và gửi lại"""
+        monkeypatch.setattr(rs.outbox, "run_exists", lambda key: key.startswith("daily:"))
+        gather = MagicMock(return_value=[{"team_id": 7, "chat_id": -100, "team_name": "A", "items": [_item(1)]}])
+        monkeypatch.setattr(rs, "_gather_reminder_payloads", gather)
+        enqueue = MagicMock(side_effect=lambda key, messages: len(messages))
+        monkeypatch.setattr(rs.outbox, "enqueue", enqueue)
+        dispatch = AsyncMock(return_value={"claimed": 1, "sent": 1, "failed": 0, "flood_waits": 0})
+        monkeypatch.setattr(rs.outbox, "dispatch", dispatch)
+
+        run_key = rs.manual_run_key(rs.TIMEZONE.localize(datetime(2026, 6, 18, 9, 30)))
+        counts = asyncio.run(rs.send_daily_reminders(SimpleNamespace(bot=None), date(2026, 6, 18), run_key=run_key))
+        assert run_key == "test:2026-06-18T09:30:00.000" and dispatch.call_args.args[1] == run_key
+        key, messages = enqueue.call_args.args
+        assert key == run_key and {m["note"] for m in messages} == {"daily manual"}
+        assert counts["enqueued"] == 1
+
+    def test_forced_run_preview_and_enqueue(self, monkeypatch):
+        """/force_remind: cùng bộ gom của lượt hằng ngày; xem trước không ghi outbox"""
+        items = [_item(i) for i in range(1, 21)] + [_item(99, owner_id=555)]
+        gather = MagicMock(return_value=[{"team_id": 7, "chat_id": -100, "team_name": "A", "items": items}])
+        monkeypatch.setattr(rs, "_gather_reminder_payloads", gather)
+        enqueue = MagicMock(side_effect=lambda key, messages: len(messages))
+        monkeypatch.setattr(rs.outbox, "enqueue", enqueue)
+        now = rs.TIMEZONE.localize(datetime(2026, 6, 18, 9, 30))
+
+        preview = rs.prepare_forced_run(7, now, window=False, enqueue=False)
+        enqueue.assert_not_called()
+        assert gather.call_args.kwargs == {"team_id": 7, "window": False}
+        # 20 dòng nhóm + tiêu đề, CHUNK_SIZE = 15 -> 2 tin; 1 tin cho người phụ trách
+        assert (preview["items"], preview["companies"], preview["owner_messages"], preview["group_messages"]) == (21, 21, 1, 2)
+        assert preview["run_key"] is None
+
+        summary = rs.prepare_forced_run(7, now)
+        key, messages = enqueue.call_args.args
+        assert key == summary["run_key"] == "force:7:2026-06-18T09:30:00.000" and summary["enqueued"] == 3
+        assert {(m["mode"], m["note"]) for m in messages} == {("forced", "force_remind")}
+        assert messages[0]["text"].startswith('<a href="tg://user?id=555">Người phụ trách</a>\n🔔 Nhắc nộp (thủ công)')
+
+    def test_hourly_last_sent_in_one_lookup(self, monkeypatch):
+        """Nhắc gấp: tra lần gửi gần nhất của mọi ứng viên một lần, bỏ tờ khai đã nhắc trong giờ qua"""
+        now = rs.TIMEZONE.localize(datetime(2026, 6, 20, 9, 0))
+        payloads = [{"team_id": 7, "chat_id": -100, "team_name": "A", "items": [_item(1), _item(2), _item(3)]}]
+        lookup = MagicMock(return_value={
+            (1, date(2026, 6, 20)): now - timedelta(minutes=30),
+            (2, date(2026, 6, 20)): now - timedelta(hours=2),
+        })
+        monkeypatch.setattr(rs, "_last_hourly_sent", lookup)
+
+        messages = rs._hourly_outbox_messages(payloads, now)
+        lookup.assert_called_once()
+        assert [m["records"] for m in messages] == [[(2, "2026-06-20")], [(3, "2026-06-20")]]
+
+
+class TestSendOne:
+    """Test gửi một tin của outbox"""
+
+    def _row(self, chat_id=-100):
+        return (1, 0, chat_id, "hello", None)
+
+    def test_retry_after_pauses_and_resends(self):
+        """RetryAfter: tạm dừng toàn bộ rồi gửi lại, không tính là lỗi"""
+        bot = SimpleNamespace(send_message=AsyncMock(side_effect=[RetryAfter(0), SimpleNamespace(message_id=42)]))
+        gate = outbox._FloodGate()
+        assert asyncio.run(outbox._send_one(bot, self._row(), gate)) == (1, "sent", 42, None)
+        assert gate.hits == 1
+
+    def test_forbidden_is_final(self):
+        """Bot bị xóa khỏi nhóm: đánh dấu failed ngay, không gửi lại"""
+        bot = SimpleNamespace(send_message=AsyncMock(side_effect=Forbidden("bot was kicked")))
+        row_id, state, message_id, error = asyncio.run(outbox._send_one(bot, self._row(), outbox._FloodGate()))
+        assert (state, message_id) == ("failed", None) and "kicked" in error
+        assert bot.send_message.call_count == 1
+
+    def test_network_error_retried_then_failed(self, monkeypatch):
+        """Lỗi mạng: thử lại tối đa OUTBOX_MAX_ATTEMPTS lần"""
+        monkeypatch.setenv("OUTBOX_MAX_ATTEMPTS", "2")
+        monkeypatch.setattr(outbox.asyncio, "sleep", AsyncMock())
+        bot = SimpleNamespace(send_message=AsyncMock(side_effect=TimedOut()))
+        _, state, _, error = asyncio.run(outbox._send_one(bot, self._row(), outbox._FloodGate()))
+        assert state == "failed" and error.startswith("TimedOut")
+        assert bot.send_message.call_count == 2
+
+    def test_no_chat(self):
+        """Không có chat: ghi nhận như đã gửi (giữ hành vi cũ)"""
+        bot = SimpleNamespace(send_message=AsyncMock())
+        assert asyncio.run(outbox._send_one(bot, self._row(chat_id=None), outbox._FloodGate()))[1] == "sent"
+        bot.send_message.assert_not_called()
+
+
+class TestDispatch:
+    """Test dispatcher: song song giữa các nhóm, tuần tự trong một nhóm, ghi kết quả theo lô"""
+
+    @pytest.fixture
+    def store(self, monkeypatch):
+        rows = [(i, i, -100 - (i % 3), f"msg {i}", None) for i in range(10)]
+        batches = [rows[:6], rows[6:], []]
+        recorded = []
+        monkeypatch.setattr(outbox, "claim", lambda run_key, limit: batches.pop(0))
+        monkeypatch.setattr(outbox, "record_results", lambda results: recorded.append(list(results)))
+        monkeypatch.setenv("OUTBOX_FLUSH_SIZE", "4")
+        return rows, recorded
+
+    def test_order_and_batches(self, store):
+        rows, recorded = store
+        sent = []
+
+        async def send_message(chat_id, text, parse_mode=None):
+            await asyncio.sleep(0)
+            sent.append((chat_id, text))
+            return SimpleNamespace(message_id=len(sent))
+
+        counts = asyncio.run(outbox.dispatch(SimpleNamespace(send_message=send_message), "daily:2026-06-18"))
+        assert counts["claimed"] == 10 and counts["sent"] == 10 and counts["failed"] == 0
+        for chat in (-100, -101, -102):
+            texts = [t for c, t in sent if c == chat]
+            assert texts == sorted(texts, key=lambda t: int(t.split()[1]))
+        assert all(len(batch) <= 4 for batch in recorded)
+        assert sorted(r[0] for batch in recorded for r in batch) == list(range(10))
+
+    def test_outcomes_flushed_when_interrupted(self, store):
+        """Bị hủy giữa chừng (tắt bot): kết quả đã biết vẫn được ghi"""
+        _, recorded = store
+        calls = []
+
+        async def send_message(chat_id, text, parse_mode=None):
+            calls.append(text)
+            if len(calls) == 3:
+                raise asyncio.CancelledError
+            return SimpleNamespace(message_id=len(calls))
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(outbox.dispatch(SimpleNamespace(send_message=send_message), "daily:2026-06-18"))
+        # every message that went out is booked once; the interrupted one stays "sending"
+        booked = [r for batch in recorded for r in batch]
+        assert len(booked) == len(calls) - 1 == len({r[0] for r in booked})
+        assert {r[1] for r in booked} == {"sent"}
+
+    def test_min_interval_paces_each_chat(self, store):
+        """min_interval: các tin của cùng một nhóm cách nhau ít nhất min_interval giây"""
+        rows, recorded = store
+        sent = []
+
+        async def send_message(chat_id, text, parse_mode=None):
+            sent.append((chat_id, time.monotonic()))
+            return SimpleNamespace(message_id=len(sent))
+
+        counts = asyncio.run(outbox.dispatch(SimpleNamespace(send_message=send_message), "force:7:x", min_interval=0.05))
+        assert counts["sent"] == 10
+        for chat in (-100, -101, -102):
+            times = [t for c, t in sent if c == chat]
+            assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+
+
+class TestClaim:
+    """Test nhận dòng outbox trên Postgres thật (cần TEST_DATABASE_URL)"""
+
+    def test_expired_claims_capped(self, monkeypatch):
+        """Tiến trình gửi chết mãi ở cùng một tin: nhận lại tối đa OUTBOX_MAX_ATTEMPTS lần rồi đánh dấu lỗi"""
+        import os
+
+        from bot.db.database import get_conn
+
+        url = os.getenv("TEST_DATABASE_URL")
+        if not url:
+            pytest.skip("TEST_DATABASE_URL chưa được đặt")
+        monkeypatch.setenv("DATABASE_URL", url)
+        monkeypatch.setenv("OUTBOX_MAX_ATTEMPTS", "2")
+        monkeypatch.setenv("OUTBOX_LEASE_SECONDS", "0")
+        run_key = f"test:claim:{time.time()}"
+        outbox.enqueue(run_key, [{"team_id": None, "chat_id": -100, "mode": "initial", "note": None,
+                                  "text": "x", "parse_mode": None, "records": []}])
+
+        # lease 0: each claim below finds the previous one expired (its sender "died")
+        assert len(outbox.claim(run_key, 10)) == 1
+        time.sleep(0.01)
+        assert len(outbox.claim(run_key, 10)) == 1
+        time.sleep(0.01)
+        assert outbox.claim(run_key, 10) == []
+
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT state, attempts FROM reminder_outbox WHERE run_key = %s", (run_key,))
+            assert cur.fetchall() == [("failed", 2)]
+            cur.execute("DELETE FROM reminder_outbox WHERE run_key = %s", (run_key,))
+            conn.commit()
+        finally:
+            conn.close()
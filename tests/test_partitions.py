@@ -0,0 +1,133 @@
+# tests/test_partitions.py
+import os
+from datetime import date
+
+import psycopg2
+import pytest
+
+from bot.db import database as db
+from bot.services import retention
+
+SCHEMA = "test_partitions"
+
+
+@pytest.fixture
+def connect():
+    """Schema Postgres riêng cho mỗi test (cần TEST_DATABASE_URL); trả về hàm mở kết nối vào schema đó"""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL chưa được đặt")
+
+    def factory():
+        return psycopg2.connect(url, options=f"-c search_path={SCHEMA}")
+
+    admin = psycopg2.connect(url)
+    admin.autocommit = True
+    admin.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    try:
+        yield factory
+    finally:
+        admin.cursor().execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+        admin.close()
+
+
+def _partitions(cur, table):
+    return [name for name, _ in db.list_partitions(cur, table)]
+
+
+class TestHistoryPartitions:
+    """Test partition theo tháng của submissions / reminders_sent"""
+
+    def test_legacy_table_converted_in_place(self, connect):
+        """Bảng reminders_sent thường (bản cũ) được chuyển thành bảng partition, giữ id và sequence"""
+        conn = connect()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+            CREATE TABLE reminders_sent (
+                id SERIAL PRIMARY KEY,
+                team_id INTEGER,
+                requirement_id INTEGER,
+                remind_for_date DATE NOT NULL,
+                mode TEXT NOT NULL,
+                sent_at TIMESTAMP DEFAULT NOW(),
+                message_id TEXT
+            )
+            """)
+            cur.execute("""
+            INSERT INTO reminders_sent (id, remind_for_date, mode, sent_at) VALUES
+                (5, '2025-01-31', 'daily', '2025-01-31 08:00'),
+                (9, '2025-03-01', 'hourly', '2025-03-01 10:00'),
+                (12, '2025-03-02', 'daily', NULL)
+            """)
+            conn.commit()
+
+            db.ensure_tables(conn)
+
+            assert db._relkind(cur, "reminders_sent") == "p"
+            assert {"reminders_sent_p202501", "reminders_sent_p202503"} <= set(_partitions(cur, "reminders_sent"))
+            cur.execute("SELECT id, mode, sent_at IS NOT NULL, chat_id FROM reminders_sent ORDER BY id")
+            assert cur.fetchall() == [(5, "daily", True, None), (9, "hourly", True, None), (12, "daily", True, None)]
+            cur.execute("SELECT COUNT(*) FROM reminders_sent_default")
+            assert cur.fetchone()[0] == 0
+            # new rows continue after the converted ids
+            cur.execute("INSERT INTO reminders_sent (remind_for_date, mode) VALUES (CURRENT_DATE, 'daily') RETURNING id")
+            assert cur.fetchone()[0] == 13
+        finally:
+            conn.close()
+
+    def test_default_partition_routing(self, connect):
+        """Dòng ngoài các partition hiện có rơi vào partition default; ensure_partitions tạo tháng đó và chuyển dòng sang"""
+        conn = connect()
+        try:
+            db.ensure_tables(conn)
+            cur = conn.cursor()
+            cur.execute("INSERT INTO reminders_sent (remind_for_date, mode, sent_at) VALUES ('2031-03-05', 'daily', '2031-03-05 09:00')")
+            conn.commit()
+            cur.execute("SELECT COUNT(*) FROM reminders_sent_default")
+            assert cur.fetchone()[0] == 1
+
+            created = db.ensure_partitions(conn, months_ahead=0, today=date(2026, 10, 1))
+            assert "reminders_sent_p203103" in created
+            cur.execute("SELECT COUNT(*) FROM reminders_sent_default")
+            assert cur.fetchone()[0] == 0
+            cur.execute("SELECT COUNT(*) FROM reminders_sent_p203103")
+            assert cur.fetchone()[0] == 1
+        finally:
+            conn.close()
+
+    def test_retention_archives_and_drops(self, connect, monkeypatch, tmp_path):
+        """Partition quá RETENTION_MONTHS_REMINDERS_SENT được tách, lưu trữ ra file rồi xoá; tháng còn hạn giữ nguyên"""
+        monkeypatch.setenv("RETENTION_MONTHS_REMINDERS_SENT", "12")
+        monkeypatch.setenv("RETENTION_MONTHS_SUBMISSIONS", "0")
+        monkeypatch.setenv("RETENTION_ARCHIVE_DIR", str(tmp_path))
+        conn = connect()
+        try:
+            db.ensure_tables(conn)
+            cur = conn.cursor()
+            cur.execute("""
+            INSERT INTO reminders_sent (remind_for_date, mode, sent_at) VALUES
+                ('2025-08-10', 'daily', '2025-08-10 09:00'),
+                ('2025-08-11', 'daily', '2025-08-11 09:00'),
+                ('2025-10-01', 'daily', '2025-10-01 09:00')
+            """)
+            conn.commit()
+            db.ensure_partitions(conn, months_ahead=0, today=date(2026, 10, 15))
+        finally:
+            conn.close()
+
+        today = date(2026, 10, 15)
+        assert [p["partition"] for p in retention.apply_retention(today, dry_run=True, conn_factory=connect)] == ["reminders_sent_p202508"]
+        (entry,) = retention.apply_retention(today, conn_factory=connect)
+        assert entry == {"table": "reminders_sent", "partition": "reminders_sent_p202508", "action": "archived", "rows": 2}
+        assert (tmp_path / "reminders_sent_p202508" / "manifest.json").exists()
+
+        conn = connect()
+        try:
+            cur = conn.cursor()
+            assert db._relkind(cur, "reminders_sent_p202508") is None
+            assert "reminders_sent_p202510" in _partitions(cur, "reminders_sent")
+            cur.execute("SELECT sent_at::date FROM reminders_sent")
+            assert cur.fetchall() == [(date(2025, 10, 1),)]
+        finally:
+            conn.close()
@@ -0,0 +1,75 @@
+# tests/test_period_keys.py
+from datetime import date, timedelta
+
+import pytest
+
+from bot.services.reminder_service import _drop_submitted
+from bot.utils import compute_deadline_for_requirement, ky_thue_key, parse_ky_thue, period_key
+
+
+class TestParseKyThue:
+    """Test parse_ky_thue với các định dạng kỳ thuế thường gặp"""
+
+    @pytest.mark.parametrize("raw", ["01/2024", "1/2024", "1-2024", "Tháng 01/2024", "tháng 1 năm 2024", "2024-01"])
+    def test_monthly(self, raw):
+        """Các cách viết kỳ tháng đều về ("M", 2024, 1)"""
+        assert parse_ky_thue(raw) == ("M", 2024, 1)
+
+    @pytest.mark.parametrize("raw", ["Q3/2024", "q3 2024", "Quý 3/2024", "QUÝ 3 NĂM 2024", "01/07/2024-30/09/2024"])
+    def test_quarterly(self, raw):
+        """Các cách viết kỳ quý đều về ("Q", 2024, 3)"""
+        assert parse_ky_thue(raw) == ("Q", 2024, 3)
+
+    @pytest.mark.parametrize("raw", ["2024", "Năm 2024", " 2024 ", "01/01/2024 - 31/12/2024", "Từ 01/2024 đến 12/2024"])
+    def test_yearly(self, raw):
+        """Các cách viết kỳ năm đều về ("Y", 2024, 0)"""
+        assert parse_ky_thue(raw) == ("Y", 2024, 0)
+
+    @pytest.mark.parametrize("raw", [None, "", "abc", "13/2024", "Q5/2024", "01/02/2024-30/04/2024"])
+    def test_unrecognised(self, raw):
+        """Kỳ không hợp lệ hoặc không phải tháng/quý/năm trả về None"""
+        assert parse_ky_thue(raw) is None
+        assert ky_thue_key(raw) is None
+
+
+class TestPeriodKey:
+    """Test khóa số nguyên của kỳ thuế"""
+
+    def test_key_values(self):
+        """Tháng -> yyyymm, quý -> yyyy4q, năm -> yyyy00"""
+        assert period_key("M", 2024, 1) == 202401
+        assert period_key("M", 2024, 12) == 202412
+        assert period_key("Q", 2024, 1) == 202441
+        assert period_key("Y", 2024, 0) == 202400
+
+    def test_keys_do_not_collide(self):
+        """Không có hai kỳ khác nhau trùng khóa"""
+        keys = [period_key("M", 2024, m) for m in range(1, 13)]
+        keys += [period_key("Q", 2024, q) for q in range(1, 5)]
+        keys.append(period_key("Y", 2024, 0))
+        assert len(set(keys)) == len(keys)
+
+    def test_matches_compute_deadline_periods(self):
+        """Chuỗi kỳ do compute_deadline_for_requirement sinh ra luôn parse được"""
+        d = date(2024, 1, 1)
+        while d < date(2026, 1, 1):
+            for freq in ("monthly", "quarterly", "yearly"):
+                _, period = compute_deadline_for_requirement(freq, d)
+                assert ky_thue_key(period) is not None, period
+            d += timedelta(days=9)
+
+
+class TestDropSubmittedByKey:
+    """Đối chiếu đã nộp theo khóa kỳ, không phụ thuộc cách viết ky_thue"""
+
+    def test_formatting_difference_still_matches(self):
+        """ky_thue "1/2024" trong XML khớp kỳ "01/2024" của requirement"""
+        payloads = [{"team_id": 1, "chat_id": -1, "team_name": "A", "items": [
+            {"company_tax": "0101", "form_code": "01/GTGT", "period_str": "01/2024"},
+            {"company_tax": "0101", "form_code": "01/GTGT", "period_str": "Q1/2024"},
+        ]}]
+        submitted = {("0101", "01/GTGT", ky_thue_key("1/2024"))}
+
+        out = _drop_submitted(payloads, lambda cid, form, period: (cid, form, ky_thue_key(period)) in submitted)
+
+        assert [it["period_str"] for it in out[0]["items"]] == ["Q1/2024"]
@@ -0,0 +1,71 @@
+# tests/test_queries.py
+from unittest.mock import MagicMock
+
+import pytest
+
+from bot.db import queries
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats():
+    queries.reset_stats()
+    yield
+    queries.reset_stats()
+
+
+def _cursor(prepared):
+    cur = MagicMock()
+    if prepared is None:
+        cur.connection = MagicMock(spec=[])  # không có thuộc tính prepared (replica)
+    else:
+        cur.connection.prepared = prepared
+    return cur
+
+
+class TestQueryRegistry:
+    """Test registry câu lệnh SQL"""
+
+    def test_prepare_and_execute_sql(self):
+        """%s được đánh số thành $1..$n cho PREPARE; EXECUTE truyền tham số theo thứ tự"""
+        q = queries.get(queries.DELETE_REQUIREMENT)
+        assert q.prepare_sql == (
+            "PREPARE delete_requirement AS DELETE FROM requirements WHERE company_tax_id = $1 AND form_code = $2 AND period = $3"
+        )
+        assert q.execute_sql == "EXECUTE delete_requirement (%s, %s, %s)"
+        assert queries.get(queries.FORM_CODES).execute_sql == "EXECUTE form_codes"
+
+    def test_duplicate_name(self):
+        """Tên câu lệnh phải duy nhất"""
+        with pytest.raises(ValueError):
+            queries.query("team_by_chat", "SELECT 1")
+
+    def test_prepared_once_per_connection(self):
+        """PREPARE một lần cho mỗi kết nối, các lần sau chỉ EXECUTE"""
+        prepared = set()
+        cur = _cursor(prepared)
+        for chat_id in (-1, -2, -3):
+            queries.execute(cur, queries.TEAM_BY_CHAT, (chat_id,))
+        sqls = [c.args[0] for c in cur.execute.call_args_list]
+        assert sqls[0].startswith("PREPARE team_by_chat AS")
+        assert sqls[1:] == ["EXECUTE team_by_chat (%s)"] * 3
+        assert prepared == {"team_by_chat"}
+
+        # kết nối mới: prepare lại
+        other = _cursor(set())
+        queries.execute(other, queries.TEAM_BY_CHAT, (-1,))
+        assert other.execute.call_args_list[0].args[0].startswith("PREPARE")
+
+    def test_plain_connection_runs_sql(self):
+        """Kết nối không theo dõi prepared (read replica) chạy SQL thường"""
+        cur = _cursor(None)
+        queries.execute(cur, queries.TEAM_BY_CHAT, (-1,))
+        cur.execute.assert_called_once_with("SELECT id FROM teams WHERE group_chat_id = %s", (-1,))
+
+    def test_stats(self):
+        """Bộ đếm số lần gọi / số lần prepare theo từng câu lệnh"""
+        cur = _cursor(set())
+        for _ in range(3):
+            queries.execute(cur, queries.COMPANY_TEAM, ("0101234567",))
+        (row,) = queries.stats()
+        assert (row["name"], row["calls"], row["prepares"]) == ("company_team", 3, 1)
+        assert "company_team: 3 lần" in queries.format_stats(queries.stats())
@@ -0,0 +1,161 @@
+# tests/test_query_budget.py
+import asyncio
+import os
+import re
+
+import pytest
+
+from benchmarks.query_budget import QueryCounter, count_handler, fake_context, fake_update
+from bot.services.tracing import span
+
+ADMIN = 424242
+
+
+class TestQueryCounter:
+    """Test bộ đếm câu lệnh SQL theo trace"""
+
+    def test_counts_sql_spans_only(self):
+        """Chỉ đếm span "sql"; PREPARE được ghi riêng, không tính vào ngân sách"""
+        with QueryCounter("x") as qc:
+            with span("sql", "PREPARE team_by_chat AS SELECT 1"):
+                pass
+            for _ in range(3):
+                with span("sql", "EXECUTE team_by_chat (%s)"):
+                    pass
+            with span("telegram", "sendMessage"):
+                pass
+        assert (qc.queries, qc.prepares) == (3, 1)
+        assert qc.repeated() == [("EXECUTE team_by_chat (%s)", 3)]
+
+    def test_spans_from_worker_threads(self):
+        """Câu lệnh chạy trong asyncio.to_thread vẫn thuộc về lần gọi handler"""
+        def work():
+            with span("sql", "INSERT INTO reminders_sent ..."):
+                pass
+
+        async def handler():
+            await asyncio.to_thread(work)
+
+        with QueryCounter("x") as qc:
+            asyncio.run(handler())
+        assert qc.queries == 1
+
+    def test_assert_budget_lists_statements(self):
+        """Vượt ngân sách: thông báo lỗi liệt kê câu lệnh lặp lại nhiều nhất"""
+        with QueryCounter("force_remind") as qc:
+            for _ in range(5):
+                with span("sql", "SELECT company_name FROM companies WHERE company_tax_id = %s"):
+                    pass
+        qc.assert_budget(5)
+        with pytest.raises(AssertionError, match="5x SELECT company_name"):
+            qc.assert_budget(4)
+
+
+@pytest.fixture(scope="module")
+def team_db():
+    """
+    Một team 500 công ty trong TEST_DATABASE_URL (database riêng cho test: sẽ bị TRUNCATE).
+    Trả về (url, chat_id).
+    """
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL chưa được đặt")
+    from benchmarks.datagen import DatasetSpec, generate
+    from bot.db.database import get_conn
+
+    conn = get_conn(url)
+    try:
+        generate(conn, DatasetSpec(teams=1, companies=500, reqs_per_company=3, years=1))
+        cur = conn.cursor()
+        cur.execute("SELECT group_chat_id FROM teams")
+        chat_id = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return url, chat_id
+
+
+def _scalar(url, sql, params=()):
+    from bot.db.database import get_conn
+
+    conn = get_conn(url)
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        return cur.fetchone()[0]
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+class TestHandlerBudgets:
+    """Ngân sách số câu lệnh SQL của các handler trên team 500 công ty (cần Postgres)"""
+
+    @pytest.fixture(autouse=True)
+    def env(self, team_db, monkeypatch):
+        monkeypatch.setenv("DATABASE_URL", team_db[0])
+        monkeypatch.setenv("TRACE_SLOW_MS", "1e12")
+        monkeypatch.setenv("TRACE_SLOW_QUERY_MS", "1e12")
+
+    def _run(self, team_db, handler, args=()):
+        update = fake_update(team_db[1], ADMIN)
+        context = fake_context(args, admins=[ADMIN])
+        return count_handler(handler, update, context), update, context
+
+    def test_force_remind(self, team_db, monkeypatch):
+        """force_remind: xem trước không gửi gì; chạy thật đi qua outbox, số câu lệnh không phụ thuộc số công ty"""
+        from bot.commands.admin import force_remind
+
+        monkeypatch.setenv("FORCE_REMIND_INTERVAL", "0")
+        monkeypatch.setenv("FORCE_REMIND_COOLDOWN_MINUTES", "0")
+        monkeypatch.setenv("OUTBOX_FLUSH_SIZE", "1000")
+        url = team_db[0]
+        before = _scalar(url, "SELECT COUNT(*) FROM reminders_sent WHERE mode = 'forced'")
+
+        qc, update, context = self._run(team_db, force_remind, ["preview", "all"])
+        qc.assert_budget(6)
+        preview = update.message.reply_text.call_args.args[0]
+        items = int(re.search(r"• (\d+) tờ khai", preview).group(1))
+        messages = int(re.search(r"• (\d+) tin:", preview).group(1))
+        assert preview.startswith("👀") and items > 0
+        assert context.bot.send_message.await_count == 0
+        assert _scalar(url, "SELECT COUNT(*) FROM reminders_sent WHERE mode = 'forced'") == before
+
+        qc, update, context = self._run(team_db, force_remind, ["all"])
+        qc.assert_budget(12)
+        assert update.message.reply_text.call_args.args[0].startswith("🔔 Đã xếp hàng gửi nhắc")
+        # every message of the run, then the summary
+        assert context.bot.send_message.await_count == messages + 1
+        assert context.bot.send_message.call_args.kwargs["text"] == f"✅ /force_remind xong: đã gửi {messages}/{messages} tin."
+        assert _scalar(url, "SELECT COUNT(*) FROM reminders_sent WHERE mode = 'forced'") == before + items
+
+    def test_force_remind_cooldown(self, team_db, monkeypatch):
+        """Chạy lại trong thời gian chờ: từ chối, không gom và không gửi"""
+        from bot.commands.admin import force_remind
+
+        monkeypatch.setenv("FORCE_REMIND_INTERVAL", "0")
+        self._run(team_db, force_remind, ["all"])
+        qc, update, context = self._run(team_db, force_remind, ["all"])
+        qc.assert_budget(3)
+        assert update.message.reply_text.call_args.args[0].startswith("⏳ Team vừa chạy /force_remind")
+        assert context.bot.send_message.await_count == 0
+
+    def test_quick_add(self, team_db):
+        """quick_add: một lệnh INSERT cho cả bộ tờ khai; chạy lại thì bỏ qua tất cả"""
+        from bot.commands.admin import quick_add_reqs
+
+        tax = _scalar(team_db[0], "SELECT MIN(company_tax_id) FROM companies")
+        qc, update, _ = self._run(team_db, quick_add_reqs, [tax, "quarterly"])
+        qc.assert_budget(4)
+        qc, update, _ = self._run(team_db, quick_add_reqs, [tax, "quarterly"])
+        qc.assert_budget(4)
+        reply = update.message.reply_text.call_args.args[0]
+        assert reply.startswith("Đã bỏ qua (đã tồn tại):") and "01/GTGT — quarterly" in reply
+
+    @pytest.mark.parametrize("name, budget", [("list_companies", 2), ("list_requirements", 2), ("export_team", 4)])
+    def test_listings(self, team_db, name, budget):
+        """Các lệnh liệt kê / xuất dữ liệu: số câu lệnh không phụ thuộc số công ty"""
+        from bot.commands import admin
+
+        qc, _, _ = self._run(team_db, getattr(admin, name))
+        qc.assert_budget(budget)
@@ -0,0 +1,154 @@
+# tests/test_read_replica.py
+import os
+from unittest.mock import MagicMock
+
+import psycopg2
+import pytest
+
+from bot.db import database as db
+from bot.services.tracing import finish_trace, start_trace
+
+PRIMARY = object()
+
+
+@pytest.fixture
+def env(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql:///primary")
+    monkeypatch.setenv("DATABASE_READ_URL", "postgresql:///replica")
+    monkeypatch.setattr(db, "get_conn", lambda: PRIMARY)
+    monkeypatch.setattr(db, "_chat_writes", {})
+    monkeypatch.setattr(db, "_replica_state", {"down_until": 0.0, "lag_checked": 0.0, "lag_ok": True})
+    monkeypatch.setattr(db, "_replica_pool", None)
+    replica = MagicMock()
+    replica.cursor.return_value.fetchone.return_value = (0,)
+    connect = MagicMock(return_value=replica)
+    monkeypatch.setattr(db.psycopg2, "connect", connect)
+    return replica, connect
+
+
+class TestReadReplica:
+    """Test định tuyến đọc sang read replica"""
+
+    def test_no_replica_configured(self, env, monkeypatch):
+        """Không cấu hình DATABASE_READ_URL thì đọc từ primary"""
+        monkeypatch.delenv("DATABASE_READ_URL")
+        assert db.get_read_conn() is PRIMARY
+
+    def test_replica_read_only(self, env):
+        """Có replica: kết nối read-only tới replica"""
+        replica, _ = env
+        assert db.get_read_conn(-1) is replica
+        replica.set_session.assert_called_once_with(readonly=True)
+
+    def test_read_after_write_same_chat(self, env):
+        """Commit trong handler của một nhóm: nhóm đó đọc từ primary, nhóm khác vẫn dùng replica"""
+        replica, _ = env
+        trace, token = start_trace("/add_company", chat_id=-1)
+        try:
+            db.mark_chat_write(-1)
+            assert db.get_read_conn() is PRIMARY
+            assert db.get_read_conn(-2) is replica
+        finally:
+            finish_trace(trace, token)
+
+    def test_replica_down_fallback(self, env):
+        """Replica lỗi: đọc từ primary và không thử lại ngay"""
+        _, connect = env
+        connect.side_effect = psycopg2.OperationalError("down")
+        assert db.get_read_conn(-1) is PRIMARY
+        assert db.get_read_conn(-1) is PRIMARY
+        assert connect.call_count == 1
+
+    def test_lagging_replica(self, env, monkeypatch):
+        """Replica trễ quá READ_REPLICA_MAX_LAG_SECONDS: đọc từ primary"""
+        replica, _ = env
+        monkeypatch.setenv("READ_REPLICA_MAX_LAG_SECONDS", "30")
+        replica.cursor.return_value.fetchone.return_value = (120.0,)
+        assert db.get_read_conn(-1) is PRIMARY
+        replica.close.assert_called_once()
+
+
+class TestWriteTracking:
+    """Chỉ commit có ghi dữ liệu mới chuyển nhóm sang đọc từ primary (cần Postgres)"""
+
+    def test_read_only_commit_keeps_replica(self, monkeypatch):
+        """Commit sau khi chỉ SELECT không đánh dấu nhóm; INSERT / EXECUTE một lệnh ghi thì có"""
+        url = os.getenv("TEST_DATABASE_URL")
+        if not url:
+            pytest.skip("TEST_DATABASE_URL chưa được đặt")
+        monkeypatch.setattr(db, "_chat_writes", {})
+        conn = db.get_conn(url)
+        try:
+            cur = conn.cursor()
+            cur.execute("CREATE TEMP TABLE write_probe (x INTEGER)")
+            conn.commit()
+            trace, token = start_trace("/list_companies", chat_id=-7)
+            try:
+                cur.execute("SELECT 1")
+                cur.execute("PREPARE write_probe_ins AS INSERT INTO write_probe VALUES ($1)")
+                conn.commit()
+                assert -7 not in db._chat_writes
+                cur.execute("EXECUTE write_probe_ins (%s)", (1,))
+                conn.rollback()
+                conn.commit()
+                assert -7 not in db._chat_writes
+                cur.execute("EXECUTE write_probe_ins (%s)", (1,))
+                conn.commit()
+                assert -7 in db._chat_writes
+            finally:
+                finish_trace(trace, token)
+        finally:
+            conn.close()
+
+
+class TestConnectionPool:
+    """Test pool kết nối primary (cần Postgres)"""
+
+    @pytest.fixture
+    def url(self):
+        url = os.getenv("TEST_DATABASE_URL")
+        if not url:
+            pytest.skip("TEST_DATABASE_URL chưa được đặt")
+        return url
+
+    def test_reuse_and_idle_expiry(self, url):
+        """Kết nối nhàn rỗi được dùng lại; quá max_idle thì đóng và mở kết nối mới"""
+        pool = db.ConnectionPool(url, size=2, max_idle=60)
+        try:
+            first = pool.acquire()
+            first.close()
+            assert pool.acquire() is first and (pool.opened, pool.reused) == (1, 1)
+            first.close()
+            # nhàn rỗi quá lâu (server / proxy có thể đã cắt kết nối)
+            first.idle_since -= 120
+            second = pool.acquire()
+            assert second is not first and first.closed
+            assert (pool.opened, pool.reused) == (2, 1)
+            second.close()
+        finally:
+            pool.close_all()
+
+    def test_replica_connections_pooled(self, url, monkeypatch):
+        """Kết nối replica lấy từ pool riêng, luôn read-only, được dùng lại giữa các lần đọc"""
+        monkeypatch.setenv("DATABASE_URL", url)
+        monkeypatch.setenv("DATABASE_READ_URL", url + ("&" if "?" in url else "?") + "application_name=replica")
+        monkeypatch.setattr(db, "_chat_writes", {})
+        monkeypatch.setattr(db, "_replica_state", {"down_until": 0.0, "lag_checked": 0.0, "lag_ok": True})
+        monkeypatch.setattr(db, "_replica_pool", None)
+        try:
+            first = db.get_read_conn(-1)
+            first.close()
+            second = db.get_read_conn(-1)
+            assert second is first and db._replica_pool.reused == 1
+            cur = second.cursor()
+            with pytest.raises(psycopg2.errors.ReadOnlySqlTransaction):
+                cur.execute("CREATE TEMP TABLE replica_probe (x INTEGER)")
+            second.close()
+            # the next borrower still gets a read-only session
+            third = db.get_read_conn(-1)
+            cur = third.cursor()
+            cur.execute("SHOW transaction_read_only")
+            assert third is first and cur.fetchone()[0] == "on"
+            third.close()
+        finally:
+            db._replica_pool.close_all()
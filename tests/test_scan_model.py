@@ -0,0 +1,57 @@
+# tests/test_scan_model.py
+from datetime import date
+
+import pytest
+
+from bot.services.reminder_service import _due_payloads
+from bot.services.scan_model import DueItem, ScanRows
+
+
+def _rows():
+    rows = []
+    for c in range(3):
+        for form_code, freq in (("01/GTGT", "monthly"), ("05/KK-TNCN", "monthly"), ("TT200", "yearly")):
+            # chuỗi mới cho mỗi dòng, như psycopg2 trả về
+            rows.append((c % 2 + 1, len(rows) + 1, ("010%d" % c + "!")[:-1], (form_code + "!")[:-1], freq,
+                         f"Cty {c}", str(900 + c) if c else None))
+    return rows
+
+
+class TestScanRows:
+    """Test bộ lưu dòng quét dạng cột"""
+
+    def test_round_trip(self):
+        """Duyệt lại cho đúng các dòng đã nạp, cùng thứ tự"""
+        rows = _rows()
+        assert list(ScanRows(rows)) == rows
+        assert len(ScanRows(rows)) == 9
+
+    def test_strings_shared(self):
+        """Mỗi mã số thuế / mã tờ khai chỉ giữ một bản"""
+        scan = ScanRows(_rows())
+        assert len(scan.companies) == 3 and len(scan.combos) == 3 and scan.owners == ["901", "902"]
+        first = [r[2] for r in scan if r[2] == "0100"]
+        assert len(first) == 3 and all(s is first[0] for s in first)
+
+
+class TestDueItem:
+    """Test bản ghi DueItem"""
+
+    def test_mapping_access(self):
+        """Vẫn đọc được theo kiểu dict như trước"""
+        it = DueItem(1, "0101", "Cty A", "01/GTGT", "05/2026", date(2026, 6, 22), 3, None)
+        assert it["company_tax"] == it.company_tax == "0101"
+        assert it.get("owner_id") is None and it.get("missing", 5) == 5
+        with pytest.raises(KeyError):
+            it["missing"]
+        assert not hasattr(it, "__dict__")
+
+    def test_due_payloads_same_for_tuples_and_scan_rows(self):
+        """_due_payloads cho cùng kết quả với list tuple và ScanRows"""
+        teams = [(1, -100, "A"), (2, -200, "B")]
+        rows = _rows()
+        ref = date(2026, 6, 18)
+        from_list = _due_payloads(teams, rows, [], ref)
+        from_scan = _due_payloads(teams, ScanRows(rows), [], ref)
+        assert from_list == from_scan
+        assert {it.form_code for p in from_scan for it in p["items"]} == {"01/GTGT", "05/KK-TNCN"}
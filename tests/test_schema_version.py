@@ -0,0 +1,58 @@
+# tests/test_schema_version.py
+from unittest.mock import MagicMock, patch
+
+import psycopg2.errors
+
+from bot.db import database
+from bot.db.database import SCHEMA_VERSION, current_schema_version, ensure_schema
+
+
+def _conn(*versions):
+    """Kết nối giả: mỗi lần SELECT version trả lần lượt các giá trị (Exception = lỗi)"""
+    conn = MagicMock()
+    cur = conn.cursor.return_value
+    results = iter(versions)
+
+    def execute(sql, params=None):
+        if "schema_version" in sql:
+            v = next(results)
+            if isinstance(v, Exception):
+                raise v
+            cur.fetchone.return_value = (v,)
+
+    cur.execute.side_effect = execute
+    return conn, cur
+
+
+class TestSchemaVersion:
+    """Test kiểm tra schema khi khởi động"""
+
+    def test_current_schema_one_query(self):
+        """Schema đã mới nhất: chỉ một câu SELECT, không chạy DDL"""
+        conn, cur = _conn(SCHEMA_VERSION)
+        with patch.object(database, "ensure_tables") as ensure_tables:
+            assert ensure_schema(conn) is False
+        ensure_tables.assert_not_called()
+        assert cur.execute.call_count == 1
+
+    def test_missing_table_means_version_zero(self):
+        """Database cũ chưa có bảng schema_version"""
+        conn, _ = _conn(psycopg2.errors.UndefinedTable())
+        assert current_schema_version(conn) == 0
+        conn.rollback.assert_called_once()
+
+    def test_pending_migration_under_lock(self):
+        """Có migration: chạy ensure_tables trong advisory lock rồi nhả lock"""
+        conn, cur = _conn(0, 0)
+        with patch.object(database, "ensure_tables") as ensure_tables:
+            assert ensure_schema(conn) is True
+        ensure_tables.assert_called_once_with(conn)
+        sqls = [c.args[0] for c in cur.execute.call_args_list]
+        assert "pg_advisory_lock" in sqls[1] and "pg_advisory_unlock" in sqls[-1]
+
+    def test_migrated_by_other_instance(self):
+        """Instance khác đã migrate trong lúc chờ lock: không chạy lại"""
+        conn, _ = _conn(0, SCHEMA_VERSION)
+        with patch.object(database, "ensure_tables") as ensure_tables:
+            assert ensure_schema(conn) is False
+        ensure_tables.assert_not_called()
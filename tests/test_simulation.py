@@ -0,0 +1,70 @@
+# tests/test_simulation.py
+from datetime import date
+
+from bot.services.simulation import format_summary, simulate
+from bot.utils import ky_thue_key
+
+HOLIDAYS = [date(2026, 4, 30), date(2026, 5, 1)]
+
+
+def _snapshot(holidays=()):
+    """
+    Team 1: 20 công ty nộp 01/GTGT theo quý, không có người phụ trách.
+    Team 2: 2 công ty theo quý (một có người phụ trách) và một tờ khai tháng.
+    Công ty 0 đã nộp Q2/2026 từ 01/07, công ty 1 nộp đúng 31/07.
+    """
+    reqs = [(1, i, f"01000000{i:02d}", "01/GTGT", "quarterly", f"Cty {i}", None) for i in range(20)]
+    reqs += [
+        (2, 100, "0200000001", "01/GTGT", "quarterly", "Cty B1", 555),
+        (2, 101, "0200000002", "01/GTGT", "quarterly", "Cty B2", None),
+        (2, 102, "0200000002", "05/KK-TNCN", "monthly", "Cty B2", None),
+    ]
+    return {
+        "taken_at": "2026-07-01T00:00:00",
+        "teams": [(1, -100, "A"), (2, -200, "B")],
+        "reqs": reqs,
+        "holidays": list(holidays),
+        "rules": None,
+        "submissions": {
+            ("0100000000", "01/GTGT", ky_thue_key("Q2/2026")): date(2026, 7, 1),
+            ("0100000001", "01/GTGT", ky_thue_key("Q2/2026")): date(2026, 7, 31),
+        },
+    }
+
+
+class TestSimulate:
+    """Test mô phỏng khối lượng nhắc nhở trên snapshot cố định (không cần DB)"""
+
+    def test_quarter_deadline_day(self):
+        """31/07 (hạn quý II): tin daily theo nhóm, nhắc gấp cả ngày, đỉnh theo nhóm và ước tính thời gian gửi"""
+        report = simulate(date(2026, 7, 28), date(2026, 7, 31), _snapshot())
+        days = {d["date"]: d for d in report["days"]}
+
+        # 28/07 còn 4 ngày làm việc: ngoài ngưỡng 3 ngày
+        assert days["2026-07-28"]["items"] == 0
+        assert days["2026-07-29"]["items"] == 21 and days["2026-07-29"]["hourly_messages"] == 0
+
+        d = days["2026-07-31"]
+        # team 1: 19 dòng (công ty 0 đã nộp trước đó) + tiêu đề -> 2 tin; team 2: 1 tin owner + 1 tin nhóm
+        assert (d["items"], d["daily_messages"], d["peak_chat_daily"]) == (21, 4, 2)
+        # hạn trong ngày: mỗi lượt hourly một tin / tờ khai, 24 lượt
+        assert (d["hourly_messages"], d["peak_chat_hourly_run"]) == (21 * 24, 19)
+        # giới hạn 20 tin/phút/nhóm chi phối thời gian gửi
+        assert (d["est_daily_send_s"], d["est_hourly_send_s"]) == (6.0, 57.0)
+
+        assert report["busiest_days"][0] == "2026-07-31"
+        assert report["totals"]["max_peak_chat_hourly_run"] == 19
+        assert "2026-07-31 — 4 / 504" in format_summary(report)
+
+    def test_holiday_roll_forward(self):
+        """Hạn quý I rơi vào 30/04 (nghỉ lễ) được dời sang 04/05: nhắc gấp vào 04/05, không vào 30/04"""
+        hourly = lambda snapshot: {
+            d["date"]: d["hourly_messages"] for d in simulate(date(2026, 4, 28), date(2026, 5, 4), snapshot)["days"]
+        }
+
+        rolled = hourly(_snapshot(HOLIDAYS))
+        assert rolled["2026-05-04"] == 22 * 24
+        assert all(n == 0 for ds, n in rolled.items() if ds != "2026-05-04")
+
+        plain = hourly(_snapshot())
+        assert plain["2026-04-30"] == 22 * 24 and plain["2026-05-04"] == 0
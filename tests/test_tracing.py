@@ -0,0 +1,140 @@
+# tests/test_tracing.py
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
+from telegram.request import HTTPXRequest
+
+from bot.services import tracing
+from bot.services.tracing import TracingRequest, finish_trace, instrument_handlers, redact_sql, span, start_trace, traced_handler
+
+
+class TestRedactSql:
+    """Test che giá trị trong câu lệnh SQL trước khi ghi span / log"""
+
+    def test_literals_removed(self):
+        """Chuỗi và số viết thẳng trong câu lệnh (execute_values) bị thay bằng ?"""
+        sql = "INSERT INTO reminder_outbox(run_key, chat_id, text) VALUES ('daily:2026-06-18', -1001234, 'Cty A — 0101234567'), ('x', 7, 'it''s 1.5')"
+        assert redact_sql(sql) == "INSERT INTO reminder_outbox(run_key, chat_id, text) VALUES (?, -?, ?), (?, ?, ?)"
+
+    def test_placeholders_and_identifiers_kept(self):
+        """Giữ %s, $1 và tên bảng có chữ số; gộp khoảng trắng"""
+        assert redact_sql("EXECUTE team_by_chat (%s)") == "EXECUTE team_by_chat (%s)"
+        assert redact_sql(b"SELECT *\n  FROM reminders_sent_2026_01\n WHERE id = $1") == "SELECT * FROM reminders_sent_2026_01 WHERE id = $1"
+
+    def test_truncated(self):
+        text = redact_sql("SELECT " + ", ".join(f"col{i}" for i in range(200)) + " FROM t")
+        assert len(text) == 300 and text.endswith("...")
+
+
+class TestSpans:
+    """Test span, ngưỡng log chậm và lấy mẫu trace"""
+
+    def test_spans_from_worker_threads(self):
+        """Span trong asyncio.to_thread thuộc trace của handler; lỗi được ghi vào span"""
+        def work():
+            with span("sql", "SELECT ?"):
+                pass
+            with pytest.raises(ValueError):
+                with span("parse", "xml"):
+                    raise ValueError("bad")
+
+        async def handler():
+            with span("telegram", "sendMessage"):
+                await asyncio.to_thread(work)
+
+        trace, token = start_trace("/x", chat_id=-1)
+        asyncio.run(handler())
+        data = finish_trace(trace, token)
+        assert [(s["kind"], s["name"]) for s in data["spans"]] == [("sql", "SELECT ?"), ("parse", "xml"), ("telegram", "sendMessage")]
+        assert data["spans"][1]["error"] == "ValueError"
+        assert data["chat_id"] == -1 and tracing.current_trace() is None
+
+    def test_slow_query_threshold(self, monkeypatch, caplog):
+        """Chỉ câu lệnh chậm hơn TRACE_SLOW_QUERY_MS mới được log, kể cả ngoài trace"""
+        monkeypatch.setenv("TRACE_SLOW_QUERY_MS", "1e12")
+        with caplog.at_level(logging.WARNING, logger="bot.services.tracing"):
+            with span("sql", "SELECT 1"):
+                pass
+            assert not caplog.records
+            monkeypatch.setenv("TRACE_SLOW_QUERY_MS", "0")
+            with span("sql", "SELECT ?"):
+                pass
+            with span("telegram", "sendMessage"):
+                pass
+        (record,) = caplog.records
+        assert json.loads(record.getMessage())["event"] == "slow_query"
+
+    def test_slow_handler_logged(self, monkeypatch, caplog):
+        """Handler chậm hơn TRACE_SLOW_MS: một dòng log tóm tắt kèm các span chậm nhất"""
+        monkeypatch.setenv("TRACE_SLOW_MS", "0")
+        monkeypatch.setenv("TRACE_SLOW_QUERY_MS", "1e12")
+        trace, token = start_trace("/list_companies")
+        with span("sql", "SELECT ?"):
+            pass
+        with caplog.at_level(logging.WARNING, logger="bot.services.tracing"):
+            finish_trace(trace, token)
+        summary = json.loads(caplog.records[0].getMessage())
+        assert summary["event"] == "slow_handler" and summary["span_counts"] == {"sql": 1}
+        assert "spans" not in summary and len(summary["top_spans"]) == 1
+
+    @pytest.mark.parametrize("rate, written", [("1", 1), ("0", 0)])
+    def test_sampling(self, monkeypatch, tmp_path, rate, written):
+        """TRACE_SAMPLE_RATE: trace được lấy mẫu ghi đầy đủ vào TRACE_FILE"""
+        path = tmp_path / "traces.jsonl"
+        monkeypatch.setenv("TRACE_SAMPLE_RATE", rate)
+        monkeypatch.setenv("TRACE_FILE", str(path))
+        monkeypatch.setenv("TRACE_SLOW_MS", "1e12")
+        trace, token = start_trace("/export")
+        finish_trace(trace, token)
+        lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+        assert len(lines) == written
+        if written:
+            assert json.loads(lines[0])["handler"] == "/export"
+
+
+class TestInstrumentation:
+    """Test gắn trace vào handler và request Bot API"""
+
+    def test_traced_handler(self, monkeypatch):
+        """Mỗi lần gọi handler có trace riêng (chat, user); lỗi vẫn được ném ra và ghi lại"""
+        monkeypatch.setenv("TRACE_SLOW_MS", "1e12")
+        seen = []
+
+        async def handler(update, context):
+            seen.append(tracing.current_trace())
+            if context == "fail":
+                raise RuntimeError("x")
+
+        wrapped = traced_handler(handler)
+        update = SimpleNamespace(effective_chat=SimpleNamespace(id=-5), effective_user=SimpleNamespace(id=9))
+        asyncio.run(wrapped(update, None))
+        with pytest.raises(RuntimeError):
+            asyncio.run(wrapped(update, "fail"))
+        assert (seen[0].name, seen[0].chat_id, seen[0].user_id) == ("handler", -5, 9)
+        assert seen[0] is not seen[1] and traced_handler(wrapped) is wrapped
+
+    def test_instrument_handlers(self):
+        """Bọc mọi CommandHandler / MessageHandler đã đăng ký, đặt tên theo lệnh"""
+        async def cmd(update, context):
+            pass
+
+        app = ApplicationBuilder().token("123:fake").build()
+        app.add_handler(CommandHandler("list_companies", cmd))
+        app.add_handler(MessageHandler(filters.Document.ALL, cmd))
+        assert instrument_handlers(app) == 2
+        command, message = app.handlers[0]
+        assert command.callback.__traced__ and message.callback.__traced__
+
+    def test_tracing_request_span(self, monkeypatch):
+        """Mỗi lệnh gọi Bot API là một span mang tên method, không chứa token"""
+        monkeypatch.setattr(HTTPXRequest, "do_request", AsyncMock(return_value=(200, b"{}")))
+        trace, token = start_trace("/x")
+        asyncio.run(TracingRequest().do_request("https://api.telegram.org/bot123:secret/sendMessage", "POST"))
+        data = finish_trace(trace, token)
+        assert [(s["kind"], s["name"]) for s in data["spans"]] == [("telegram", "sendMessage")]
+        assert "secret" not in json.dumps(data)
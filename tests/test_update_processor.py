@@ -0,0 +1,96 @@
+# tests/test_update_processor.py
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update
+
+from bot.services.update_processor import ChatOrderedUpdateProcessor, _chat_key
+
+_ids = iter(range(1, 10**6))
+
+
+def _update(chat_id):
+    n = next(_ids)
+    return Update(n, message=Message(n, datetime.now(), Chat(chat_id, Chat.GROUP)))
+
+
+async def _handler(log, name, delay, state=None):
+    if state is not None:
+        state["now"] += 1
+        state["peak"] = max(state["peak"], state["now"])
+    log.append(("start", name))
+    await asyncio.sleep(delay)
+    log.append(("end", name))
+    if state is not None:
+        state["now"] -= 1
+
+
+def _run_all(processor, jobs):
+    """Mô phỏng Application: mỗi update là một task riêng, tạo theo thứ tự đến"""
+    async def run():
+        tasks = [asyncio.ensure_future(processor.process_update(u, coro)) for u, coro in jobs]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+
+class TestChatOrderedUpdateProcessor:
+    """Test xử lý update song song giữa các nhóm, tuần tự trong một nhóm"""
+
+    def test_same_chat_in_order(self):
+        """Update cùng nhóm chạy lần lượt theo thứ tự đến, kể cả khi update đầu chậm"""
+        p = ChatOrderedUpdateProcessor(8)
+        log = []
+        _run_all(p, [
+            (_update(-1), _handler(log, "a1", 0.05)),
+            (_update(-1), _handler(log, "a2", 0)),
+            (_update(-1), _handler(log, "a3", 0)),
+        ])
+        assert log == [("start", "a1"), ("end", "a1"), ("start", "a2"), ("end", "a2"), ("start", "a3"), ("end", "a3")]
+        assert p._chats == {}
+
+    def test_other_chats_not_blocked(self):
+        """Nhóm khác không phải chờ upload chậm của một nhóm"""
+        p = ChatOrderedUpdateProcessor(8)
+        log = []
+        _run_all(p, [
+            (_update(-1), _handler(log, "slow", 0.1)),
+            (_update(-1), _handler(log, "a2", 0)),
+            (_update(-2), _handler(log, "b1", 0)),
+        ])
+        assert log.index(("end", "b1")) < log.index(("end", "slow"))
+        assert log.index(("start", "a2")) > log.index(("end", "slow"))
+
+    def test_global_cap_and_stats(self):
+        """Không vượt quá max_concurrent_updates; thống kê thời gian chờ"""
+        p = ChatOrderedUpdateProcessor(2)
+        log = []
+        state = {"now": 0, "peak": 0}
+        _run_all(p, [(_update(-i), _handler(log, i, 0.02, state)) for i in range(1, 7)])
+        assert state["peak"] == 2
+        stats = p.stats.snapshot()
+        assert stats["processed"] == 6
+        assert (stats["waiting"], stats["running"]) == (0, 0)
+        assert stats["max_delay_ms"] >= 30  # 3 đợt, đợt cuối chờ ~40 ms
+
+    def test_cancel_while_queued(self):
+        """Update bị huỷ khi đang chờ (shutdown) không làm kẹt khoá của nhóm"""
+        p = ChatOrderedUpdateProcessor(4)
+        log = []
+
+        async def run():
+            first = asyncio.ensure_future(p.process_update(_update(-1), _handler(log, "a1", 0.05)))
+            queued = asyncio.ensure_future(p.process_update(_update(-1), _handler(log, "a2", 0)))
+            await asyncio.sleep(0.01)
+            queued.cancel()
+            await asyncio.gather(first, queued, return_exceptions=True)
+            await p.process_update(_update(-1), _handler(log, "a3", 0))
+
+        asyncio.run(run())
+        assert [name for ev, name in log if ev == "start"] == ["a1", "a3"]
+        assert p.stats.waiting == 0 and p._chats == {}
+
+    def test_chat_key(self):
+        """Khoá theo chat; đối tượng không phải Update thì không cần thứ tự"""
+        assert _chat_key(_update(-5)) == -5
+        assert _chat_key(object()) is None
@@ -0,0 +1,80 @@
+# tests/test_xml_parser.py
+import random
+
+import pytest
+
+from benchmarks.xml_corpus import FORMS, KNOWN_CODES, generate_corpus, make_notification
+from bot.services.xml_parser import detect_form_code_from_known, parse_submission_from_bytes
+
+
+class TestParseSubmission:
+    """Test parse_submission_from_bytes trên các XML TBaoThue tổng hợp"""
+
+    @pytest.mark.parametrize("namespace", ["default", "prefixed"])
+    def test_parse_844_full(self, namespace):
+        """Thông báo 844 đầy đủ: trích đúng các trường và accepted=True"""
+        expected, data = make_notification(random.Random(1), form=FORMS[0], namespace=namespace)
+        result = parse_submission_from_bytes(data, known_codes=KNOWN_CODES)
+
+        assert result["accepted"] is True
+        assert result["company_tax_id"] == expected["company_tax_id"]
+        assert result["company_name"] == expected["company_name"]  # tên tiếng Việt có dấu
+        assert result["ky_thue"] == expected["ky_thue"]
+        assert result["form_code"] == "01/GTGT"
+        assert result["form_raw"] == result["tokhai_raw"]
+
+    def test_non_844_not_accepted(self):
+        """Mã TB khác 844 thì không được chấp nhận"""
+        _, data = make_notification(random.Random(2), ma_tb="845")
+        assert parse_submission_from_bytes(data)["accepted"] is False
+
+    def test_missing_nodes(self):
+        """Thiếu node thì trả về None, không raise"""
+        _, data = make_notification(random.Random(3), drop=("tokhai-phuluc", "kyTinhThue"))
+        result = parse_submission_from_bytes(data, known_codes=KNOWN_CODES)
+
+        assert result["accepted"] is True
+        assert result["ky_thue"] is None
+        assert result["form_code"] is None
+
+    def test_without_namespace(self):
+        """XML không có namespace GDT: không trích được trường nào"""
+        _, data = make_notification(random.Random(4), namespace="none")
+        result = parse_submission_from_bytes(data)
+
+        assert result["company_tax_id"] is None
+        assert result["accepted"] is False
+
+    def test_invalid_xml(self):
+        """Dữ liệu không phải XML"""
+        result = parse_submission_from_bytes(b"not xml at all")
+        assert result["accepted"] is False
+        assert result["company_tax_id"] is None
+
+    def test_large_signed_file(self):
+        """File lớn (chữ ký số ~64KB) vẫn parse đúng"""
+        expected, data = make_notification(random.Random(5), pad_kb=64)
+        assert len(data) > 64 * 1024
+        assert parse_submission_from_bytes(data)["company_tax_id"] == expected["company_tax_id"]
+
+    def test_corpus_matches_expected(self):
+        """Toàn bộ corpus tổng hợp khớp giá trị mong đợi"""
+        for expected, data in generate_corpus(200, seed=7):
+            result = parse_submission_from_bytes(data, known_codes=KNOWN_CODES)
+            for key, value in expected.items():
+                assert result[key] == value, key
+
+
+class TestDetectFormCode:
+    """Test detect_form_code_from_known"""
+
+    def test_detect_known_codes(self):
+        for code, desc in FORMS:
+            assert detect_form_code_from_known(desc, KNOWN_CODES) == code
+
+    def test_detect_accent_insensitive(self):
+        assert detect_form_code_from_known("tờ khai 05/kk-tncn quý 1", KNOWN_CODES) == "05/KK-TNCN"
+
+    def test_detect_unknown(self):
+        assert detect_form_code_from_known("Tờ khai không rõ mã", KNOWN_CODES) is None
+        assert detect_form_code_from_known(None, KNOWN_CODES) is None